@@ -1,6 +1,23 @@
 import pika
 from pika.exchange_type import ExchangeType
 import bson
+import sys
+import os
+import time
+# The batch writer, chunk reassembly, trace headers and the priority lane are shared by every
+# module (DockerFile/common)
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir, 'common'))
+from batch_writer import BatchWriter, FileWrite
+from chunks import ChunkAssembler
+from messaging import trace_headers
+
+# Images are written by a writer pool and messages acked once their batch is durable
+# (IMAGE_FSYNC: batch, always or none); up to PREFETCH messages are in flight
+writer = BatchWriter(writers=int(os.environ.get('IMAGE_WRITERS', 4)), fsync=os.environ.get('IMAGE_FSYNC', 'batch'))
+# Streamed images are reassembled here, keyed by PictureID, with their progress kept on disk
+chunks = ChunkAssembler(fsync=writer.fsync != 'none')
+PREFETCH = 256
+REPORT_INTERVAL = 60
 
 def consumer_connection(routing_key):
     # Establish a connection to RabbitMQ server
@@ -13,24 +30,106 @@ def consumer_connection(routing_key):
     # Declare a queue (queue names are generated based on the routing key)
     queue_name = routing_key
 
+    # Bounds the messages held by the writer pool; priority still applies within this window
+    channel.basic_qos(prefetch_count=PREFETCH)
+
     # Consume messages from the queue
-    a=channel.basic_consume(queue=queue_name, auto_ack=True,
+    a=channel.basic_consume(queue=queue_name, auto_ack=False,
         on_message_callback=on_message_received)
+    connection.call_later(REPORT_INTERVAL, lambda: report_throughput(connection))
+    # Removes the parts of streamed uploads that were abandoned
+    chunks.sweep_every(connection)
     
     print('Preprocess Starting Consuming')
     
     try:
         channel.start_consuming()
     except KeyboardInterrupt:
+        # Messages the writers still hold are unacked, so the broker redelivers them
         channel.close()
         connection.close()
 
+def report_throughput(connection):
+    print(f"Image writes: {writer.report()}")
+    connection.call_later(REPORT_INTERVAL, lambda: report_throughput(connection))
+
+def publish_stored_status(channel, body, properties, received_at):
+    # Closes the item's trace so the dashboard timeline includes the storage hop
+    status_message = {key: body[key] for key in ('ID', 'PictureID', 'FileName') if key in body}
+    status_message['Status'] = 'Stored'
+    status_message['Message'] = f"{body.get('FileName')} was written to disk"
+    channel.basic_publish(
+        exchange="Topic",
+        routing_key=".Status.",
+        body=bson.dumps(status_message),
+        properties=pika.BasicProperties(
+            headers=trace_headers(properties.headers, 'image_store', received_at, kind='status'))
+    )
+
+def finish_message(ch, method, properties, body, received_at, complete, error):
+    # Runs on the connection thread once the message's write is durable (or failed)
+    if error is not None:
+        print(f"Writing {body.get('FileName')} failed: {error}")
+        # Dead-lettered through the Image queue's DeadLetter exchange
+        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+        return
+    if complete:
+        publish_stored_status(ch, body, properties, received_at)
+    ch.basic_ack(delivery_tag=method.delivery_tag)
+    if complete and 'Chunk' in body:
+        # Only now can the last chunk no longer be redelivered
+        chunks.discard(body, 'PictureID')
+
+def chunk_stored(body, error):
+    """(True if the item is complete, error) for a chunk whose write has finished (or failed).
+
+    Runs on the writer thread, after the chunk's write is durable: only then does the chunk count
+    as received. All chunks of an item go to the same writer, so they are recorded in order.
+    """
+    if error is not None:
+        return False, error
+    try:
+        if not chunks.record(body, 'PictureID'):
+            return False, None
+        chunks.finish(body, 'PictureID', body["FileName"])
+        return True, None
+    except Exception as e:
+        return False, e
+
 def on_message_received(ch, method, properties, body):
-    body=bson.loads(body)
-    #save the image
-    with open(f'{body["FileName"]}', 'wb') as image_file:
-        image_file.write(body['Payload'])
+    received_at = time.time()
+    try:
+        body=bson.loads(body)
+        if 'Chunk' in body:
+            # Streamed upload: each chunk is written into the item's part at its offset; a chunk of
+            # an item already finished (a redelivery) has nothing left to write
+            planned = chunks.plan(body, 'PictureID')
+            writes = [] if planned is None else [FileWrite(planned[0], [planned[1]], planned[2])]
+        else:
+            #save the image
+            writes = [FileWrite(body["FileName"], [body['Payload']])]
+    except Exception as e:
+        # A malformed message fails the same way on every redelivery, so it is dead-lettered
+        # (through the Image queue's DeadLetter exchange) instead of stopping the consumer
+        print(f"Could not store message {method.delivery_tag}: {e!r}")
+        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+        return
+
+    def durable(error):
+        # Called on a writer thread; pika calls have to go back to the connection thread
+        complete = True
+        if 'Chunk' in body:
+            complete, error = chunk_stored(body, error)
+        try:
+            ch.connection.add_callback_threadsafe(
+                lambda: finish_message(ch, method, properties, body, received_at, complete, error))
+        except Exception as e:
+            # The connection is gone; the broker will redeliver the message
+            print(f"Could not ack {body.get('FileName')} on closed connection: {e}")
+
+    writer.submit(body.get('PictureID') or body["FileName"], writes, durable)
 
     
 
-consumer_connection('Image')
\ No newline at end of file
+# Pass a shard queue (e.g. Image-2) to consume one shard when main_server shards Image
+consumer_connection(sys.argv[1] if len(sys.argv) > 1 else 'Image')
\ No newline at end of file
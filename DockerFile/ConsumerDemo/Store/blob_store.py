@@ -0,0 +1,164 @@
+import hashlib
+import os
+import secrets
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir, 'common'))
+from batch_writer import FileWrite
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    refcount INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    job_id TEXT NOT NULL,
+    content_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    PRIMARY KEY (job_id, content_id, kind)
+);
+CREATE INDEX IF NOT EXISTS files_content_id ON files (content_id);
+CREATE INDEX IF NOT EXISTS files_digest ON files (digest);
+"""
+
+
+def blob_path(root, digest):
+    # Two levels of 256 directories keep each one small even with hundreds of millions of blobs
+    return os.path.join(root, 'blobs', digest[:2], digest[2:4], digest)
+
+
+class BlobStore:
+    """Content-addressed file storage with a SQLite index of which job and item each file belongs to.
+
+    Layout under `root`:
+      blobs/ab/cd/<sha256>
+          one file per distinct payload, written once however often it is stored
+      jobs/<job ID>/<content ID>/<name>
+          each item's files under their own names, as hard links to the blobs
+      index.sqlite
+          files (job, content id, kind) -> blob, and blobs with their reference counts
+
+    The store only plans writes; a BatchWriter carries them out, and calls `record` with the rows of
+    each durable batch, so the index commits one transaction per batch and never names a blob that
+    is not on disk.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.index_path = os.path.join(root, 'index.sqlite')
+        # Shared by the writer threads, one at a time
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.index_path, check_same_thread=False, isolation_level=None)
+        # WAL, so the dashboard can read the index while batches are committed
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def job_directory(self, job_id):
+        # basename, so an id can never point outside the store root
+        return os.path.join(self.root, 'jobs', os.path.basename(str(job_id or 'unknown')))
+
+    def plan(self, job_id, content_id, kind, name, data):
+        """(FileWrite, index row) storing `data` as file `name` of an item.
+
+        A payload already in the store is only linked into the job's directory; otherwise it is
+        written under a temporary name and renamed to its blob once durable. Each item gets its own
+        directory in the job's, as items of one job may share a file name.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        target = blob_path(self.root, digest)
+        link = os.path.join(self.job_directory(job_id), os.path.basename(str(content_id)),
+                            os.path.basename(name))
+        if os.path.exists(target):
+            write = FileWrite(target, None, link_to=link)
+        else:
+            # Unique, as two messages with the same payload may be written at once
+            write = FileWrite(f'{target}.{secrets.token_hex(4)}.tmp', [data], rename_to=target, link_to=link)
+        return write, (str(job_id), str(content_id), kind, os.path.basename(name), digest, len(data))
+
+    def record(self, batch):
+        """Index the rows of a batch of messages (a list of row lists) in one transaction.
+
+        A row already indexed with the same blob (a redelivery) changes nothing; one that now names
+        another blob moves its reference, leaving the old blob to `collect`.
+        """
+        now = time.time()
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                for rows in batch:
+                    for job_id, content_id, kind, name, digest, size in rows:
+                        previous = self.db.execute(
+                            'SELECT digest FROM files WHERE job_id = ? AND content_id = ? AND kind = ?',
+                            (job_id, content_id, kind)).fetchone()
+                        if previous and previous[0] == digest:
+                            continue
+                        if previous:
+                            self.db.execute('UPDATE blobs SET refcount = refcount - 1 WHERE digest = ?', previous)
+                        self.db.execute(
+                            'INSERT OR REPLACE INTO files (job_id, content_id, kind, name, digest, stored_at) '
+                            'VALUES (?, ?, ?, ?, ?, ?)', (job_id, content_id, kind, name, digest, now))
+                        self.db.execute(
+                            'INSERT INTO blobs (digest, size, refcount) VALUES (?, ?, 1) '
+                            'ON CONFLICT (digest) DO UPDATE SET refcount = refcount + 1', (digest, size))
+                self.db.execute('COMMIT')
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+
+    def lookup(self, job_id=None, content_id=None, digest=None, limit=100):
+        """Indexed files of a job, an item or a blob, newest first, with their blob paths and sizes."""
+        conditions = [(column, value) for column, value in
+                      (('f.job_id', job_id), ('f.content_id', content_id), ('f.digest', digest)) if value is not None]
+        if not conditions:
+            raise ValueError('lookup needs a job_id, content_id or digest')
+        where = ' AND '.join(f'{column} = ?' for column, _ in conditions)
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT f.job_id, f.content_id, f.kind, f.name, f.digest, f.stored_at, b.size, b.refcount '
+                f'FROM files f JOIN blobs b ON b.digest = f.digest WHERE {where} '
+                'ORDER BY f.stored_at DESC LIMIT ?', [value for _, value in conditions] + [limit]).fetchall()
+        return [{'job_id': row[0], 'content_id': row[1], 'kind': row[2], 'name': row[3], 'digest': row[4],
+                 'stored_at': row[5], 'size': row[6], 'refcount': row[7],
+                 'path': blob_path(self.root, row[4])} for row in rows]
+
+    def remove_job(self, job_id):
+        """Drop a job's files from the index and its directory; returns how many files were indexed."""
+        job_id = str(job_id)
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                digests = self.db.execute('SELECT digest FROM files WHERE job_id = ?', (job_id,)).fetchall()
+                self.db.execute('DELETE FROM files WHERE job_id = ?', (job_id,))
+                self.db.executemany('UPDATE blobs SET refcount = refcount - 1 WHERE digest = ?', digests)
+                self.db.execute('COMMIT')
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+        shutil.rmtree(self.job_directory(job_id), ignore_errors=True)
+        return len(digests)
+
+    def collect(self):
+        """Delete blobs no file refers to any more; returns (blobs, bytes) freed."""
+        with self.lock:
+            unused = self.db.execute('SELECT digest, size FROM blobs WHERE refcount <= 0').fetchall()
+            self.db.executemany('DELETE FROM blobs WHERE digest = ? AND refcount <= 0',
+                                [(digest,) for digest, _ in unused])
+        for digest, _ in unused:
+            try:
+                os.remove(blob_path(self.root, digest))
+            except FileNotFoundError:
+                pass
+        return len(unused), sum(size for _, size in unused)
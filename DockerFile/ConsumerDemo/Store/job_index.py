@@ -0,0 +1,88 @@
+import collections
+import hashlib
+import time
+from array import array
+
+
+def _key(job_id):
+    # Job ids are sha256 hex digests; keeping their 32 raw bytes halves the key size
+    job_id = str(job_id)
+    try:
+        return bytes.fromhex(job_id) if len(job_id) == 64 else job_id
+    except ValueError:
+        return job_id
+
+
+def _digest(content_id):
+    return int.from_bytes(hashlib.blake2b(str(content_id).encode(), digest_size=8).digest(), 'big')
+
+
+class _Job:
+    __slots__ = ('expected', 'last_seen', 'stored')
+
+    def __init__(self, expected, now):
+        self.expected = expected
+        self.last_seen = now
+        # 64-bit digests of the content ids stored so far, so redeliveries are not counted twice
+        self.stored = array('Q')
+
+
+class JobIndex:
+    """Completion state of the jobs being stored, compact enough for tens of thousands of open jobs.
+
+    Each open job is one slotted record holding its expected item count, when it last saw an item
+    and an array of 64-bit content id digests (8 bytes per stored item). Records are kept in order
+    of last activity, so finding stragglers only looks at the oldest ones. Finished jobs are
+    remembered in a bounded set, so a late redelivery does not reopen them.
+    """
+
+    def __init__(self, timeout=300, remember_finished=100000, clock=time.monotonic):
+        self.timeout = timeout
+        self.remember_finished = remember_finished
+        self.clock = clock
+        self.jobs = collections.OrderedDict()
+        self.finished = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def add(self, job_id, content_id, expected):
+        """Record a stored item; returns the number of items stored once this completes the job, else None.
+
+        `expected` is the job's item count for this stage (None if the publisher did not say).
+        """
+        key = _key(job_id)
+        if key in self.finished or not expected:
+            return None
+        now = self.clock()
+        job = self.jobs.get(key)
+        if job is None:
+            job = self.jobs[key] = _Job(expected, now)
+        else:
+            job.last_seen = now
+            self.jobs.move_to_end(key)
+        digest = _digest(content_id)
+        if digest not in job.stored:
+            job.stored.append(digest)
+        if len(job.stored) < job.expected:
+            return None
+        self._finish(key)
+        return len(job.stored)
+
+    def expire(self):
+        """Drop jobs with no item for `timeout` seconds; returns (job_id, stored, expected) for each."""
+        deadline = self.clock() - self.timeout
+        expired = []
+        while self.jobs:
+            key, job = next(iter(self.jobs.items()))
+            if job.last_seen > deadline:
+                break
+            self._finish(key)
+            expired.append((key.hex() if isinstance(key, bytes) else key, len(job.stored), job.expected))
+        return expired
+
+    def _finish(self, key):
+        self.jobs.pop(key, None)
+        self.finished[key] = None
+        if len(self.finished) > self.remember_finished:
+            self.finished.popitem(last=False)
@@ -1,6 +1,31 @@
 import pika
 from pika.exchange_type import ExchangeType
 import bson
+import os
+import sys
+import time
+# The batch writer, trace headers and the priority lane are shared by every module (DockerFile/common)
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir, 'common'))
+from batch_writer import BatchWriter
+from messaging import trace_headers
+from blob_store import BlobStore
+from job_index import JobIndex
+
+# Files are stored once per distinct payload under STORE_ROOT/blobs/, indexed in STORE_ROOT/index.sqlite
+# and linked into STORE_ROOT/jobs/<job ID>/<content ID>/
+STORE_ROOT = os.environ.get('STORE_ROOT', 'store')
+store = BlobStore(STORE_ROOT)
+# A job still missing documents this many seconds after its last one is reported incomplete
+JOB_TIMEOUT = 300
+SWEEP_INTERVAL = 30
+job_index = JobIndex(timeout=JOB_TIMEOUT)
+# Files are written by a writer pool and messages acked once their batch is durable
+# (STORE_FSYNC: batch, always or none); up to PREFETCH messages are in flight
+# The index rows of each batch are committed in one transaction, before its messages are acked
+writer = BatchWriter(writers=int(os.environ.get('STORE_WRITERS', 4)), fsync=os.environ.get('STORE_FSYNC', 'batch'),
+                     on_batch=store.record)
+PREFETCH = 256
+REPORT_INTERVAL = 60
 
 def consumer_connection(routing_key):
     # Establish a connection to RabbitMQ server
@@ -13,37 +38,114 @@ def consumer_connection(routing_key):
     # Declare a queue (queue names are generated based on the routing key)
     queue_name = routing_key
 
+    # Bounds the messages held by the writer pool; priority still applies within this window
+    channel.basic_qos(prefetch_count=PREFETCH)
+
     # Consume messages from the queue
-    a=channel.basic_consume(queue=queue_name, auto_ack=True,
+    a=channel.basic_consume(queue=queue_name, auto_ack=False,
         on_message_callback=on_message_received)
+    connection.call_later(SWEEP_INTERVAL, lambda: sweep_stragglers(connection, channel))
+    connection.call_later(REPORT_INTERVAL, lambda: report_throughput(connection))
     
     print('Preprocess Starting Consuming')
     
     try:
         channel.start_consuming()
     except KeyboardInterrupt:
+        # Messages the writers still hold are unacked, so the broker redelivers them
         channel.close()
         connection.close()
 
-def on_message_received(ch, method, properties, body):
-    body=bson.loads(body)
+def report_throughput(connection):
+    print(f"Store writes: {writer.report()}")
+    connection.call_later(REPORT_INTERVAL, lambda: report_throughput(connection))
+
+def publish_stored_status(channel, body, properties, received_at):
+    # Closes the item's trace so the dashboard timeline includes the storage hop
+    status_message = {key: body[key] for key in ('ID', 'DocumentId', 'FileName') if key in body}
+    status_message['Status'] = 'Stored'
+    status_message['Message'] = f"{body.get('FileName')} was written to disk"
+    channel.basic_publish(
+        exchange="Topic",
+        routing_key=".Status.",
+        body=bson.dumps(status_message),
+        properties=pika.BasicProperties(
+            headers=trace_headers(properties.headers, 'store', received_at, kind='status'))
+    )
+
+def publish_job_status(channel, job_id, status, message, properties=None, received_at=None):
+    # One event per job, once all of its documents are stored or it has timed out
+    channel.basic_publish(
+        exchange="Topic",
+        routing_key=".Status.",
+        body=bson.dumps({'ID': job_id, 'Status': status, 'Message': message, 'Directory': job_directory(job_id)}),
+        properties=pika.BasicProperties(
+            headers=trace_headers(properties.headers if properties else None, 'store', received_at, kind='status'))
+    )
+
+def sweep_stragglers(connection, channel):
+    for job_id, stored, expected in job_index.expire():
+        publish_job_status(channel, job_id, 'Job Incomplete',
+                           f"Only {stored} of {expected} documents arrived within {JOB_TIMEOUT} s")
+    connection.call_later(SWEEP_INTERVAL, lambda: sweep_stragglers(connection, channel))
+
+def job_directory(job_id):
+    return store.job_directory(job_id)
+
+def finish_message(ch, method, properties, body, received_at, error):
+    # Runs on the connection thread once the message's files are durable (or failed to write)
+    if error is not None:
+        print(f"Writing {body.get('FileName')} failed: {error}")
+        # Dead-lettered through the Store queue's DeadLetter exchange
+        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+        return
+    publish_stored_status(ch, body, properties, received_at)
+    # The job's document count travels with each item (NumberOfDocuments, set by the upload client)
+    stored = job_index.add(body.get('ID'), body.get('DocumentId'), body.get('NumberOfDocuments'))
+    if stored:
+        publish_job_status(ch, body['ID'], 'Job Stored',
+                           f"All {stored} documents of the job were stored in {job_directory(body['ID'])}",
+                           properties, received_at)
+    ch.basic_ack(delivery_tag=method.delivery_tag)
+
+def plan_writes(body):
+    file_name = os.path.basename(body["FileName"])
     # Strip .pdf from FileName and replace with .txt
-    base_file_name = body["FileName"].replace('.pdf', '.txt')
-    
-    #save the image
-    with open(f'{body["FileName"]}', 'wb') as file:
-        file.write(body['Payload'])
-    # Save the 'Meta' data to a new file with .txt extension
-    with open(f'{base_file_name} Meta.txt', 'wb') as file:
-        file.write(body['Meta'])
-
-    # Save the 'Summary' data to a new file with .txt extension
-    with open(f'{base_file_name} Summary.txt', 'wb') as file:
-        file.write(body['Summary'])
-
-    # Save the 'Keywords' data to a new file with .txt extension
-    with open(f'{base_file_name} Keywords.txt', 'wb') as file:
-        file.write(body['Keywords'])
+    base_file_name = file_name.replace('.pdf', '.txt')
+
+    # The document, then its 'Meta', 'Summary' and 'Keywords' data as .txt files
+    writes, rows = [], []
+    for kind, name, data in (('document', file_name, body['Payload']),
+                             ('meta', f'{base_file_name} Meta.txt', body['Meta']),
+                             ('summary', f'{base_file_name} Summary.txt', body['Summary']),
+                             ('keywords', f'{base_file_name} Keywords.txt', body['Keywords'])):
+        write, row = store.plan(body.get('ID'), body.get('DocumentId') or file_name, kind, name, data)
+        writes.append(write)
+        rows.append(row)
+    return writes, rows
+
+def on_message_received(ch, method, properties, body):
+    received_at = time.time()
+    try:
+        body=bson.loads(body)
+        writes, rows = plan_writes(body)
+    except Exception as e:
+        # A malformed message fails the same way on every redelivery, so it is dead-lettered
+        # (through the Store queue's DeadLetter exchange) instead of stopping the consumer
+        print(f"Could not store message {method.delivery_tag}: {e!r}")
+        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+        return
+
+    def durable(error):
+        # Called on a writer thread; pika calls have to go back to the connection thread
+        try:
+            ch.connection.add_callback_threadsafe(
+                lambda: finish_message(ch, method, properties, body, received_at, error))
+        except Exception as e:
+            # The connection is gone; the broker will redeliver the message
+            print(f"Could not ack {body.get('FileName')} on closed connection: {e}")
+
+    writer.submit(body.get('ID'), writes, durable, rows)
     
 
 consumer_connection('Store')
\ No newline at end of file
@@ -0,0 +1,129 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from blob_store import BlobStore, blob_path
+from batch_writer import BatchWriter
+
+
+class TestBlobStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = BlobStore(self.directory.name)
+        self.writer = BatchWriter(writers=2, on_batch=self.store.record)
+
+    def tearDown(self):
+        self.writer.close()
+        self.store.close()
+        self.directory.cleanup()
+
+    def store_item(self, job_id, content_id, files):
+        # Plans and writes one message's files, returning once the batch is durable and indexed
+        writes, rows = [], []
+        for kind, name, data in files:
+            write, row = self.store.plan(job_id, content_id, kind, name, data)
+            writes.append(write)
+            rows.append(row)
+        done, errors = threading.Event(), []
+
+        def durable(error):
+            errors.append(error)
+            done.set()
+        self.writer.submit(job_id, writes, durable, rows)
+        self.assertTrue(done.wait(10))
+        self.assertEqual(errors, [None])
+
+    '''
+        purpose: To verify that identical payloads are stored once and linked into each job's directory.
+        process: Stores the same document in two jobs, with a Meta file that differs between them.
+        validation: Ensures the blob sits under its hash prefix, both job files are hard links to it, and refcounts are 2 and 1.
+    '''
+    def test_identical_payloads_are_stored_once(self):
+        self.store_item('job1', 'doc1', [('document', 'a.pdf', b'%PDF-same'), ('meta', 'a.txt Meta.txt', b'one')])
+        self.store_item('job2', 'doc2', [('document', 'a.pdf', b'%PDF-same'), ('meta', 'a.txt Meta.txt', b'two')])
+
+        files = self.store.lookup(content_id='doc2')
+        document = next(f for f in files if f['kind'] == 'document')
+        digest = document['digest']
+        self.assertEqual(document['path'], os.path.join(self.directory.name, 'blobs', digest[:2], digest[2:4], digest))
+        self.assertEqual(document['refcount'], 2)
+        self.assertEqual(next(f for f in files if f['kind'] == 'meta')['refcount'], 1)
+        first = os.path.join(self.store.job_directory('job1'), 'doc1', 'a.pdf')
+        second = os.path.join(self.store.job_directory('job2'), 'doc2', 'a.pdf')
+        self.assertTrue(os.path.samefile(first, document['path']))
+        self.assertTrue(os.path.samefile(second, document['path']))
+        with open(second, 'rb') as f:
+            self.assertEqual(f.read(), b'%PDF-same')
+        blob_files = [name for _, _, names in os.walk(os.path.join(self.directory.name, 'blobs')) for name in names]
+        self.assertEqual(len(blob_files), 3)
+
+    '''
+        purpose: To verify that a redelivered item does not add references, and a changed one moves its reference.
+        process: Stores an item twice with the same payload, then again with a new payload.
+        validation: Ensures the index has one row for the item, pointing to the new blob, and the old blob is left for collect.
+    '''
+    def test_redelivery_is_idempotent(self):
+        self.store_item('job1', 'doc1', [('document', 'a.pdf', b'v1')])
+        self.store_item('job1', 'doc1', [('document', 'a.pdf', b'v1')])
+        self.assertEqual(self.store.lookup(job_id='job1')[0]['refcount'], 1)
+
+        self.store_item('job1', 'doc1', [('document', 'a.pdf', b'v2')])
+        files = self.store.lookup(job_id='job1')
+        self.assertEqual(len(files), 1)
+        with open(files[0]['path'], 'rb') as f:
+            self.assertEqual(f.read(), b'v2')
+        self.assertEqual(self.store.collect(), (1, 2))
+
+    '''
+        purpose: To verify that removing a job releases its blobs only once no other job refers to them.
+        process: Stores a shared and an unshared payload in one job and the shared one in another, then removes the first job and collects.
+        validation: Ensures only the unshared blob is deleted and the other job still finds its file.
+    '''
+    def test_remove_job_collects_unshared_blobs(self):
+        self.store_item('job1', 'doc1', [('document', 'a.pdf', b'shared'), ('meta', 'a Meta.txt', b'only job1')])
+        self.store_item('job2', 'doc2', [('document', 'b.pdf', b'shared')])
+        only_job1 = self.store.lookup(job_id='job1', content_id='doc1')
+        meta_path = next(f['path'] for f in only_job1 if f['kind'] == 'meta')
+
+        self.assertEqual(self.store.remove_job('job1'), 2)
+        self.assertFalse(os.path.exists(self.store.job_directory('job1')))
+        self.assertEqual(self.store.collect(), (1, len(b'only job1')))
+        self.assertFalse(os.path.exists(meta_path))
+        remaining = self.store.lookup(job_id='job2')
+        self.assertEqual(remaining[0]['refcount'], 1)
+        self.assertTrue(os.path.exists(remaining[0]['path']))
+        with self.assertRaises(ValueError):
+            self.store.lookup()
+
+    '''
+        purpose: To verify that a payload already in the store is only linked, not written again.
+        process: Plans the same payload before and after it has been stored.
+        validation: Ensures the second plan has no buffers and links the existing blob.
+    '''
+    def test_existing_blob_is_only_linked(self):
+        write, _ = self.store.plan('job1', 'doc1', 'document', 'a.pdf', b'data')
+        self.assertEqual(write.rename_to, blob_path(self.directory.name, write.rename_to[-64:]))
+        self.store_item('job1', 'doc1', [('document', 'a.pdf', b'data')])
+        write, row = self.store.plan('job2', 'doc2', 'document', '../a.pdf', b'data')
+        self.assertIsNone(write.buffers)
+        self.assertEqual(write.path, blob_path(self.directory.name, row[4]))
+        self.assertEqual(write.link_to, os.path.join(self.store.job_directory('job2'), 'doc2', 'a.pdf'))
+
+    '''
+        purpose: To verify that items of one job sharing a file name keep their own files.
+        process: Stores two items of one job, both named Project_4.pdf, with different payloads.
+        validation: Ensures each item's directory holds its own payload and the index lists both.
+    '''
+    def test_items_with_the_same_name_do_not_collide(self):
+        self.store_item('job1', 'doc1', [('document', 'Project_4.pdf', b'first')])
+        self.store_item('job1', 'doc2', [('document', 'Project_4.pdf', b'second')])
+        for content_id, payload in (('doc1', b'first'), ('doc2', b'second')):
+            with open(os.path.join(self.store.job_directory('job1'), content_id, 'Project_4.pdf'), 'rb') as f:
+                self.assertEqual(f.read(), payload)
+        self.assertEqual(len(self.store.lookup(job_id='job1')), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import hashlib
+import os
+import sys
+import tracemalloc
+import unittest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from job_index import JobIndex
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestJobIndex(unittest.TestCase):
+    '''
+        purpose: To verify that a job completes exactly once, when its last expected item is stored.
+        process: Adds three documents of a job, one of them twice, then a late redelivery after completion.
+        validation: Ensures only the third distinct item reports completion and the late item is ignored.
+    '''
+    def test_completes_once(self):
+        index = JobIndex()
+        job_id = hashlib.sha256(b'job').hexdigest()
+        self.assertIsNone(index.add(job_id, 'doc1', 3))
+        self.assertIsNone(index.add(job_id, 'doc1', 3))
+        self.assertIsNone(index.add(job_id, 'doc2', 3))
+        self.assertEqual(index.add(job_id, 'doc3', 3), 3)
+        self.assertIsNone(index.add(job_id, 'doc3', 3))
+        self.assertEqual(len(index), 0)
+
+    '''
+        purpose: To verify that jobs missing items are expired after the timeout since their last item.
+        process: Opens two jobs at different times and advances a fake clock past the first one's timeout.
+        validation: Ensures only the idle job is expired with its stored and expected counts, and is not reopened.
+    '''
+    def test_stragglers_expire(self):
+        clock = Clock()
+        index = JobIndex(timeout=10, clock=clock)
+        index.add('job1', 'a', 2)
+        clock.now = 5
+        index.add('job2', 'b', 2)
+        clock.now = 12
+        self.assertEqual(index.expire(), [('job1', 1, 2)])
+        self.assertIsNone(index.add('job1', 'c', 2))
+        self.assertEqual(len(index), 1)
+        clock.now = 16
+        self.assertEqual(index.expire(), [('job2', 1, 2)])
+
+    '''
+        purpose: To verify that items without an expected count are not tracked.
+        process: Adds an item whose publisher gave no job count.
+        validation: Ensures nothing is recorded, so the job can never time out.
+    '''
+    def test_untracked_items(self):
+        index = JobIndex()
+        self.assertIsNone(index.add('job1', 'a', None))
+        self.assertEqual(len(index), 0)
+
+    '''
+        purpose: To verify that the index stays compact with tens of thousands of open jobs.
+        process: Opens 20,000 jobs (sha256 ids) with two of four documents stored each.
+        validation: Ensures the index uses under 500 bytes per open job.
+    '''
+    def test_memory_per_job(self):
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        index = JobIndex()
+        for i in range(20000):
+            job_id = hashlib.sha256(str(i).encode()).hexdigest()
+            index.add(job_id, f'{i}-a', 4)
+            index.add(job_id, f'{i}-b', 4)
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        self.assertEqual(len(index), 20000)
+        self.assertLess(used / 20000, 500)
+
+
+if __name__ == '__main__':
+    unittest.main()
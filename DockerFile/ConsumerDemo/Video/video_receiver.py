@@ -1,6 +1,14 @@
 import pika
 from pika.exchange_type import ExchangeType
 import bson
+import sys
+import os
+# Chunk reassembly is shared by every module (DockerFile/common)
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir, 'common'))
+from chunks import ChunkAssembler
+
+# Streamed files are reassembled here, keyed by content ID, with their progress kept on disk
+chunks = ChunkAssembler()
 
 def consumer_connection(routing_key):
     # Establish a connection to RabbitMQ server
@@ -16,6 +24,8 @@ def consumer_connection(routing_key):
     # Consume messages from the queue
     a=channel.basic_consume(queue=queue_name, auto_ack=True,
         on_message_callback=on_message_received)
+    # Removes the parts of streamed uploads that were abandoned
+    chunks.sweep_every(connection)
     
     print('Preprocess Starting Consuming')
     
@@ -27,9 +37,18 @@ def consumer_connection(routing_key):
 
 def on_message_received(ch, method, properties, body):
     body=bson.loads(body)
-    #save the image
-    with open(f'{body["FileName"]}', 'wb') as image_file:
-        image_file.write(body['Payload'])
+    if 'Chunk' in body:
+        # Streamed upload: the file is complete once its last chunk is written
+        if not chunks.write(body, 'VideoID'):
+            return
+        chunks.finish(body, 'VideoID', body["FileName"])
+        # Acked on delivery, so the last chunk cannot come back
+        chunks.discard(body, 'VideoID')
+    else:
+        #save the image
+        with open(f'{body["FileName"]}', 'wb') as image_file:
+            image_file.write(body['Payload'])
     
 
-consumer_connection('Video')
\ No newline at end of file
+# Pass a shard queue (e.g. Video-2) to consume one shard when main_server shards Video
+consumer_connection(sys.argv[1] if len(sys.argv) > 1 else 'Video')
\ No newline at end of file
@@ -9,13 +9,21 @@ from PIL import Image
 import fitz
 import pika
 import bson
+import sys
 import json
 import datetime
 import random
 import hashlib
+import time
 from copy import deepcopy  # Import deepcopy if you need a deep copy
+# Trace headers, the priority lane and chunk reassembly are shared by every module (DockerFile/common)
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'common'))
+from messaging import trace_headers, message_priority
+from chunks import ChunkAssembler, rechunk
 
 FilePath = os.path.dirname(__file__)
+# Streamed documents are reassembled here, keyed by DocumentId, with their progress kept on disk
+chunks = ChunkAssembler(FilePath)
 
 def openFile(the_file):
     # Pass file to Meta and Convert file to Text
@@ -144,7 +152,12 @@ def remove_files():
         os.remove(FilePath + "/images/" + file)
     
 # Function to publish messages to RabbitMQ
-def publish_to_rabbitmq(routing_key, message):
+def publish_to_rabbitmq(routing_key, message, trace=None):
+    # trace is (headers, received_at) of the consumed message this one derives from
+    parent, received_at = trace or (None, None)
+    item_headers = trace_headers(parent, 'document_module', received_at)
+    status_headers = trace_headers(parent, 'document_module', received_at, kind='status')
+
     # Establish a connection to the RabbitMQ server
     connection_parameters = pika.ConnectionParameters('localhost')
     connection = pika.BlockingConnection(connection_parameters)
@@ -178,6 +191,7 @@ def publish_to_rabbitmq(routing_key, message):
         '''
     status_message=bson.dumps(status_message)
     
+    priority = message_priority(message)
     # Serialize the message to BSON
     message = bson.dumps(message)
     
@@ -185,20 +199,88 @@ def publish_to_rabbitmq(routing_key, message):
     channel.basic_publish(
         exchange="Topic",
         routing_key=routing_key,
-        body=message
+        body=message,
+        properties=pika.BasicProperties(headers=item_headers, priority=priority)
     )
 
     #publish status message to dashboard
     channel.basic_publish(
         exchange="Topic",
         routing_key=".Status.",
-        body=status_message
+        body=status_message,
+        properties=pika.BasicProperties(headers=status_headers)
     )
 
     # Close the connection to RabbitMQ
     connection.close()
 
+# Failed messages wait in the delay queues <queue>.retry.1..RETRY_ATTEMPTS declared by
+# Exchange_Set_Up/topology.json ("retry" of the Document queue), then return to <queue>
+RETRY_ATTEMPTS = 3
+RETRY_HEADER = 'x-retry-attempt'
+# Queue being consumed (Document, or a shard such as Document-2); set by consumer_connection
+consumed_queue = 'Document'
+
+def retry_or_dead_letter(ch, properties, bodies, error):
+    """Send a failed delivery to the delay queue of its next attempt, or to the DeadLetter exchange
+    once every retry has failed; returns (status, what happened) for the status message.
+
+    `bodies` are the messages that make up the item again: the delivery itself, or the chunks of a
+    streamed document. The original delivery is acked by the caller once this has published, so
+    the consumer moves on to the next message at once and the delay runs in the broker. Only a
+    dead-lettered item is reported as failed, as the dashboard counts every failed status against
+    the job.
+    """
+    headers = dict(properties.headers or {})
+    attempt = headers.get(RETRY_HEADER, 0) + 1
+    headers[RETRY_HEADER] = attempt
+    headers['x-last-error'] = str(error)[:1000]
+    if attempt <= RETRY_ATTEMPTS:
+        exchange, routing_key = '', f"{consumed_queue}.retry.{attempt}"
+        status, outcome = 'Retrying', f"retry {attempt} of {RETRY_ATTEMPTS} scheduled"
+    else:
+        # Where dead_letters.py replays it to
+        headers.update({'x-original-exchange': '', 'x-original-routing-key': consumed_queue,
+                        'x-original-queue': consumed_queue})
+        exchange, routing_key = 'DeadLetter', consumed_queue
+        status, outcome = 'Processing Failed', f"moved to the dead-letter queue after {RETRY_ATTEMPTS} retries"
+    for body in bodies:
+        ch.basic_publish(
+            exchange=exchange,
+            routing_key=routing_key,
+            body=body,
+            properties=pika.BasicProperties(delivery_mode=2, headers=headers, priority=properties.priority)
+        )
+    return status, outcome
+
+def handle_failure(ch, method, properties, bodies, message, error, trace):
+    # bodies are the messages to retry; message the decoded item, if it could be decoded.
+    # Returns False if the delivery was requeued instead of acked
+    try:
+        status, outcome = retry_or_dead_letter(ch, properties, bodies, error)
+    except Exception as e:
+        # No copy was published, so the broker has to deliver it again
+        print(f"Could not schedule a retry: {e}")
+        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+        return False
+    ch.basic_ack(delivery_tag=method.delivery_tag)
+    #send the error message to the dashboard
+    if isinstance(message, dict):
+        status_message = {key: value for key, value in message.items()
+                          if key not in ('Payload', 'Chunk', 'Meta', 'Summary', 'Keywords')}
+        status_message['Status'] = status
+        status_message['Message'] = f"{error} ({outcome})"
+        ch.basic_publish(
+            exchange="Topic",
+            routing_key=".Status.",
+            body=bson.dumps(status_message),
+            properties=pika.BasicProperties(
+                headers=trace_headers(trace[0], 'document_module', trace[1], kind='status'))
+        )
+    return True
+
 def consumer_connection(routing_key):
+    global consumed_queue
     # Establish a connection to RabbitMQ server
     connection_parameters = pika.ConnectionParameters('localhost')
     connection = pika.BlockingConnection(connection_parameters)
@@ -208,10 +290,18 @@ def consumer_connection(routing_key):
 
     # Declare a queue (queue names are generated based on the routing key)
     queue_name = routing_key
+    consumed_queue = queue_name
+
+    # One unacked message at a time, so the broker hands out the priority lane first
+    channel.basic_qos(prefetch_count=1)
+    # Publishes wait for the broker's confirm, so a failed message is acked only once its retry copy is safe
+    channel.confirm_delivery()
 
     # Consume messages from the queue
-    a=channel.basic_consume(queue=queue_name, auto_ack=True,
+    a=channel.basic_consume(queue=queue_name, auto_ack=False,
         on_message_callback=on_message_received)
+    # Removes the parts of streamed uploads that were abandoned
+    chunks.sweep_every(connection)
     
     print('Preprocess Starting Consuming')
     
@@ -236,6 +326,12 @@ def compute_unique_id(data_object):
     return unique_id
 
 def on_message_received(ch, method, properties, body):
+    # Trace context of this delivery, continued by everything published for it
+    trace = (properties.headers, time.time())
+    # The delivery as received, which is what a retry sends again
+    raw_body = body
+    # Chunk header of a reassembled streamed document
+    chunk = None
     try:
         #load the bson object
         body=bson.loads(body)
@@ -251,9 +347,20 @@ def on_message_received(ch, method, properties, body):
             }
         '''
 
-        #save the payload to a file
-        with open(FilePath + "/" + body['FileName'], 'wb') as f:
-            f.write(body['Payload'])
+        if 'Chunk' in body:
+            # Streamed upload: process the document once its last chunk has been written. Earlier
+            # chunks are acked once written and recorded next to the part, so they survive a restart
+            if not chunks.write(body, 'DocumentId'):
+                ch.basic_ack(delivery_tag=method.delivery_tag)
+                return
+            chunks.finish(body, 'DocumentId', FilePath + "/" + body['FileName'])
+            chunk = body.pop('Chunk')
+            with open(FilePath + "/" + body['FileName'], 'rb') as f:
+                body['Payload'] = f.read()
+        else:
+            #save the payload to a file
+            with open(FilePath + "/" + body['FileName'], 'wb') as f:
+                f.write(body['Payload'])
 
         #open the file and convert it to text
         Meta_file, Text_Summerizer, Keyword = openFile(FilePath + "/" + body['FileName'])
@@ -275,7 +382,7 @@ def on_message_received(ch, method, properties, body):
                     }
                     image['PictureID'] = compute_unique_id(image)
                     #send the image to the next module
-                    publish_to_rabbitmq('.Image.', image)
+                    publish_to_rabbitmq('.Image.', image, trace)
         else:
             print('No images found in the document')
 
@@ -307,7 +414,7 @@ def on_message_received(ch, method, properties, body):
         '''
     
         #send the document to the next module
-        publish_to_rabbitmq('.Store.', body)
+        publish_to_rabbitmq('.Store.', body, trace)
     
         #remove the files
         remove_files()
@@ -315,15 +422,24 @@ def on_message_received(ch, method, properties, body):
         os.remove(FilePath + "/" + body['FileName'])
     except Exception as e:
         print(e)
-        #send the error message to the dashboard
-        status_message= body.copy()
-        del status_message['Payload']
-        status_message['Status'] = 'Processing Failed'
-        status_message['Message'] = e
-        status_message=bson.dumps(status_message)
-        publish_to_rabbitmq(".Status.", status_message)
+        if chunk is None:
+            bodies = [raw_body]
+        else:
+            # The earlier chunks were acked, so a retry sends the reassembled document again, in
+            # chunks: as one message it could exceed the broker's maximum message size
+            bodies = (bson.dumps(part) for part in
+                      rechunk({**body, 'Chunk': chunk}, FilePath + "/" + body['FileName']))
+        # A streamed document is forgotten only once its last chunk is acked; a requeued chunk
+        # finds it finished and is processed again
+        if handle_failure(ch, method, properties, bodies, body, e, trace) and chunk is not None:
+            chunks.discard(body, 'DocumentId')
+        return
+    ch.basic_ack(delivery_tag=method.delivery_tag)
+    if chunk is not None:
+        chunks.discard(body, 'DocumentId')
 
 if __name__ == "__main__":
     # Start consuming messages from the queue
-    consumer_connection('Document')
+    # Pass a shard queue (e.g. Document-2) to consume one shard when main_server shards Document
+    consumer_connection(sys.argv[1] if len(sys.argv) > 1 else 'Document')
     
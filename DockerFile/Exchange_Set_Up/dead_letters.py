@@ -0,0 +1,151 @@
+"""Inspect, replay or purge the DeadLetter queue.
+
+Messages land there after their last retry (with x-retry-attempt, x-last-error and the
+x-original-* headers saying where they came from), or when the broker dead-letters them itself,
+e.g. on overflow (with an x-death header). Every command works on the messages present when it
+starts, optionally filtered by the queue they came from; messages a command does not take are
+left in the queue in their original order.
+"""
+import argparse
+import collections
+import os
+import sys
+
+import pika
+
+DEAD_LETTER_QUEUE = 'DeadLetter'
+# Headers describing a failed delivery, dropped when it is replayed
+RETRY_HEADERS = ('x-retry-attempt', 'x-last-error', 'x-original-exchange', 'x-original-routing-key',
+                 'x-original-queue', 'x-death', 'x-first-death-exchange', 'x-first-death-queue',
+                 'x-first-death-reason', 'x-last-death-exchange', 'x-last-death-queue', 'x-last-death-reason')
+
+
+def _text(value):
+    return value.decode(errors='replace') if isinstance(value, bytes) else value
+
+
+def origin(headers):
+    """(queue, exchange, routing key) a dead-lettered message came from, or Nones if unknown."""
+    headers = headers or {}
+    if 'x-original-routing-key' in headers:
+        return (_text(headers.get('x-original-queue')), _text(headers.get('x-original-exchange', '')),
+                _text(headers['x-original-routing-key']))
+    deaths = headers.get('x-death') or []
+    if deaths:
+        death = deaths[0]
+        keys = death.get('routing-keys') or [death.get('queue')]
+        return _text(death.get('queue')), _text(death.get('exchange', '')), _text(keys[0])
+    return None, None, None
+
+
+def describe(headers):
+    headers = headers or {}
+    reason = headers.get('x-last-error')
+    if reason is None and headers.get('x-death'):
+        reason = f"dead-lettered by the broker ({_text(headers['x-death'][0].get('reason'))})"
+    return _text(reason) or 'unknown'
+
+
+def fetch(channel, queue=None, limit=None):
+    """(method, properties, body) of the messages now in the dead-letter queue that came from `queue`.
+
+    Nothing is acked here; whatever the caller does not ack goes back to the queue when the channel
+    closes. The count is taken up front, so replayed messages that fail again are not fetched twice.
+    """
+    available = channel.queue_declare(queue=DEAD_LETTER_QUEUE, passive=True).method.message_count
+    taken = 0
+    for _ in range(available):
+        if limit is not None and taken >= limit:
+            return
+        method, properties, body = channel.basic_get(queue=DEAD_LETTER_QUEUE, auto_ack=False)
+        if method is None:
+            return
+        if queue is None or origin(properties.headers)[0] == queue:
+            taken += 1
+            yield method, properties, body
+
+
+def inspect(channel, queue=None, limit=None, out=sys.stdout):
+    """Print each message and a summary per source queue and error; returns the number of messages."""
+    summary = collections.Counter()
+    count = 0
+    for method, properties, body in fetch(channel, queue, limit):
+        headers = properties.headers or {}
+        source = origin(headers)[0] or '?'
+        reason = describe(headers)
+        summary[source, reason] += 1
+        count += 1
+        print(f"{method.delivery_tag:6}  {source:12} attempts={headers.get('x-retry-attempt', '-')}  "
+              f"{len(body):>10} B  trace={_text(headers.get('trace_id', '-'))}  {reason}", file=out)
+    for (source, reason), total in summary.most_common():
+        print(f"{total:6} x {source}: {reason}", file=out)
+    return count
+
+
+def replay(channel, queue=None, limit=None):
+    """Publish messages back to where they came from, with their retry count reset; returns (replayed, failed)."""
+    channel.confirm_delivery()
+    replayed = failed = 0
+    for method, properties, body in fetch(channel, queue, limit):
+        _, exchange, routing_key = origin(properties.headers)
+        if routing_key is None:
+            failed += 1
+            continue
+        headers = {key: value for key, value in (properties.headers or {}).items() if key not in RETRY_HEADERS}
+        try:
+            channel.basic_publish(
+                exchange=exchange,
+                routing_key=routing_key,
+                body=body,
+                properties=pika.BasicProperties(delivery_mode=2, headers=headers, priority=properties.priority),
+                mandatory=True
+            )
+        except (pika.exceptions.UnroutableError, pika.exceptions.NackError) as e:
+            # Left unacked, so it stays in the dead-letter queue
+            print(f"Could not replay message {method.delivery_tag} to {routing_key}: {e}")
+            failed += 1
+            continue
+        # Acked only once the broker has confirmed the replayed copy
+        channel.basic_ack(delivery_tag=method.delivery_tag)
+        replayed += 1
+    return replayed, failed
+
+
+def purge(channel, queue=None, limit=None):
+    """Delete messages; returns how many."""
+    if queue is None and limit is None:
+        return channel.queue_purge(queue=DEAD_LETTER_QUEUE).method.message_count
+    purged = 0
+    for method, _, _ in fetch(channel, queue, limit):
+        channel.basic_ack(delivery_tag=method.delivery_tag)
+        purged += 1
+    return purged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=('inspect', 'replay', 'purge'))
+    parser.add_argument('--queue', help='only messages that came from this queue, e.g. Document')
+    parser.add_argument('--limit', type=int, help='at most this many messages')
+    parser.add_argument('--host', default=os.environ.get('RABBITMQ_HOST', 'localhost'))
+    args = parser.parse_args()
+
+    connection = pika.BlockingConnection(pika.ConnectionParameters(args.host))
+    try:
+        channel = connection.channel()
+        if args.command == 'inspect':
+            print(f"{inspect(channel, args.queue, args.limit)} dead-lettered messages")
+        elif args.command == 'replay':
+            replayed, failed = replay(channel, args.queue, args.limit)
+            print(f"Replayed {replayed} messages, {failed} left in {DEAD_LETTER_QUEUE}")
+            return 1 if failed else 0
+        else:
+            print(f"Purged {purge(channel, args.queue, args.limit)} messages")
+    finally:
+        # Closing requeues every message that was fetched but not acked
+        connection.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,35 +1,192 @@
+"""Apply the broker topology in topology.json: exchanges, queues with their arguments, and bindings.
+
+Every declaration is idempotent, so the script can be re-run at any time. A queue that already
+exists with different arguments is reported and left alone (the broker refuses to change them in
+place); with --recreate it is deleted and declared again, but only if it is empty.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
 import pika
-from pika.exchange_type import ExchangeType
-
-# Establish a connection to RabbitMQ server
-connection_parameters = pika.ConnectionParameters('rabbitmq_tshark')
-connection = pika.BlockingConnection(connection_parameters)
-
-# Create a channel
-channel = connection.channel()
-
-routing_keys = [
-    "#.Document.#",
-    "#.Store.#",
-    "#.Image.#",
-    "#.Audio.#",
-    "#.Video.#",
-]
-channel.exchange_declare(exchange='Topic', exchange_type=ExchangeType.topic, durable=True)
-
-channel.queue_declare(queue='Dashboard', durable=True)
-
-# Declare queues
-for key in routing_keys:
-    if key not in ["#.Audio.#", "#.Video.#"]:
-        channel.queue_declare(queue=key[2:-2], durable=True)
-    else:
-        # make it a lazy queue
-        channel.queue_declare(queue=key[2:-2], durable=True, arguments={"x-queue-mode": "lazy"})
-    #bind queues to exchange
-    channel.queue_bind(exchange='Topic', queue=key[2:-2], routing_key=key)
-
-channel.queue_bind(exchange='Topic', queue='Dashboard', routing_key='#.Status.#')
-
-# Close the connection
-connection.close()
+
+DEFAULT_TOPOLOGY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'topology.json')
+# Queue spec field -> broker argument
+QUEUE_ARGUMENTS = {
+    'max_length': 'x-max-length',
+    'max_length_bytes': 'x-max-length-bytes',
+    'overflow': 'x-overflow',
+    'dead_letter_exchange': 'x-dead-letter-exchange',
+    'dead_letter_routing_key': 'x-dead-letter-routing-key',
+    'message_ttl': 'x-message-ttl',
+    'max_priority': 'x-max-priority',
+    'delivery_limit': 'x-delivery-limit'
+}
+# Features quorum queues do not support
+CLASSIC_ONLY = ('max_priority', 'lazy')
+PRECONDITION_FAILED = 406
+
+
+class TopologyError(Exception):
+    pass
+
+
+def load_topology(path=DEFAULT_TOPOLOGY):
+    with open(path, encoding='utf-8') as f:
+        topology = json.load(f)
+    for spec in topology.get('queues', []):
+        if spec.get('type') == 'quorum':
+            unsupported = [field for field in CLASSIC_ONLY if spec.get(field)]
+            if unsupported:
+                raise TopologyError(f"Quorum queue {spec['name']} cannot use {', '.join(unsupported)}")
+        unknown = set(spec) - set(QUEUE_ARGUMENTS) - {'name', 'type', 'lazy', 'shards', 'bindings', 'retry'}
+        if unknown:
+            raise TopologyError(f"Queue {spec['name']} has unknown fields: {', '.join(sorted(unknown))}")
+    return topology
+
+
+def queue_arguments(spec):
+    """Broker arguments for a queue spec."""
+    arguments = {argument: spec[field] for field, argument in QUEUE_ARGUMENTS.items() if field in spec}
+    if spec.get('type') == 'quorum':
+        arguments['x-queue-type'] = 'quorum'
+    if spec.get('lazy'):
+        arguments['x-queue-mode'] = 'lazy'
+    return arguments
+
+
+def retry_queues(name, retry):
+    """(name, arguments) of the delay queues <name>.retry.1..n of a queue with a "retry" spec.
+
+    A consumer that fails on a message publishes it to the delay queue of its attempt and acks it.
+    The delay queue's TTL grows by `multiplier` per attempt, and expired messages are dead-lettered
+    through the default exchange straight back to <name>, so waiting never blocks the consumer.
+    """
+    for attempt in range(1, retry['attempts'] + 1):
+        yield f"{name}.retry.{attempt}", {
+            'x-message-ttl': int(retry['delay_ms'] * retry.get('multiplier', 2) ** (attempt - 1)),
+            'x-dead-letter-exchange': '',
+            'x-dead-letter-routing-key': name
+        }
+
+
+def expand_queues(topology):
+    """(name, arguments, bindings) for every queue, with a queue of "shards": n expanded to name-0..n-1.
+
+    Binding keys may contain {name}, which is replaced by the (shard) queue's own name. Each (shard)
+    queue with a "retry" spec is followed by its delay queues, which are not bound to any exchange.
+    """
+    for spec in topology.get('queues', []):
+        shards = spec.get('shards') or 0
+        names = [f"{spec['name']}-{index}" for index in range(shards)] if shards > 1 else [spec['name']]
+        for name in names:
+            bindings = [(binding['exchange'], binding['routing_key'].format(name=name))
+                        for binding in spec.get('bindings', [])]
+            yield name, queue_arguments(spec), bindings
+            if spec.get('retry'):
+                for retry_name, arguments in retry_queues(name, spec['retry']):
+                    yield retry_name, arguments, []
+
+
+class TopologyApplier:
+    """Declares a topology on one connection, reopening the channel whenever the broker closes it."""
+
+    def __init__(self, connection, recreate=False):
+        self.connection = connection
+        self.recreate = recreate
+        self.channel = connection.channel()
+        self.mismatched = []
+
+    def _reopen(self):
+        if self.channel.is_closed:
+            self.channel = self.connection.channel()
+
+    def declare_exchange(self, spec):
+        try:
+            self.channel.exchange_declare(exchange=spec['name'], exchange_type=spec.get('type', 'topic'),
+                                          durable=spec.get('durable', True))
+            print(f"Exchange {spec['name']} ({spec.get('type', 'topic')}) ok")
+        except pika.exceptions.ChannelClosedByBroker as e:
+            self._reopen()
+            self.mismatched.append(spec['name'])
+            print(f"Exchange {spec['name']} exists with different settings: {e.reply_text}")
+
+    def declare_queue(self, name, arguments):
+        try:
+            self.channel.queue_declare(queue=name, durable=True, arguments=arguments)
+            print(f"Queue {name} ok {arguments or ''}")
+            return True
+        except pika.exceptions.ChannelClosedByBroker as e:
+            self._reopen()
+            if e.reply_code != PRECONDITION_FAILED:
+                raise
+            if not self.recreate:
+                self.mismatched.append(name)
+                print(f"Queue {name} exists with different arguments, left unchanged: {e.reply_text}")
+                return False
+        try:
+            # if_empty, so recreating a queue never drops messages
+            self.channel.queue_delete(queue=name, if_empty=True)
+        except pika.exceptions.ChannelClosedByBroker as e:
+            self._reopen()
+            self.mismatched.append(name)
+            print(f"Queue {name} is not empty, not recreated: {e.reply_text}")
+            return False
+        self.channel.queue_declare(queue=name, durable=True, arguments=arguments)
+        print(f"Queue {name} recreated {arguments}")
+        return True
+
+    def apply(self, topology):
+        for spec in topology.get('exchanges', []):
+            self.declare_exchange(spec)
+        for name, arguments, bindings in expand_queues(topology):
+            self.declare_queue(name, arguments)
+            # Bindings are added even to a mismatched queue, as the queue itself still exists
+            for exchange, key in bindings:
+                self.channel.queue_bind(exchange=exchange, queue=name, routing_key=key)
+        return self.mismatched
+
+
+def connect(host, retries, delay=3):
+    # The broker container may still be starting when this one runs
+    for attempt in range(1, retries + 1):
+        try:
+            return pika.BlockingConnection(pika.ConnectionParameters(host))
+        except pika.exceptions.AMQPConnectionError as e:
+            if attempt == retries:
+                raise
+            print(f"RabbitMQ not reachable at {host} ({e!r}), retrying in {delay}s")
+            time.sleep(delay)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--topology', default=DEFAULT_TOPOLOGY, help='topology file to apply')
+    parser.add_argument('--host', default=os.environ.get('RABBITMQ_HOST', 'rabbitmq_tshark'))
+    parser.add_argument('--recreate', action='store_true',
+                        help='delete and redeclare empty queues whose arguments differ from the file')
+    parser.add_argument('--dry-run', action='store_true', help='print the queues and arguments without connecting')
+    parser.add_argument('--retries', type=int, default=20, help='connection attempts before giving up')
+    args = parser.parse_args()
+
+    topology = load_topology(args.topology)
+    if args.dry_run:
+        for name, arguments, bindings in expand_queues(topology):
+            print(f"{name} {arguments} {bindings}")
+        return 0
+
+    connection = connect(args.host, args.retries)
+    try:
+        mismatched = TopologyApplier(connection, args.recreate).apply(topology)
+    finally:
+        connection.close()
+    if mismatched:
+        print(f"Not applied: {', '.join(mismatched)} (empty them and re-run with --recreate)")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
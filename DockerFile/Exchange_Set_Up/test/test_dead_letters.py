@@ -0,0 +1,91 @@
+import io
+import os
+import sys
+import unittest
+import unittest.mock
+import pika
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from dead_letters import inspect, origin, purge, replay
+
+
+def dead_letter_channel(messages):
+    '''A mocked channel whose DeadLetter queue holds `messages` ((headers, body) pairs).'''
+    channel = unittest.mock.MagicMock()
+    channel.queue_declare.return_value.method.message_count = len(messages)
+    deliveries = [(unittest.mock.Mock(delivery_tag=tag), pika.BasicProperties(headers=headers), body)
+                  for tag, (headers, body) in enumerate(messages, 1)]
+    channel.basic_get.side_effect = deliveries + [(None, None, None)]
+    return channel
+
+
+RETRIED = {'trace_id': 't1', 'x-retry-attempt': 4, 'x-last-error': 'bad pdf', 'x-original-exchange': '',
+           'x-original-routing-key': 'Document', 'x-original-queue': 'Document'}
+OVERFLOWED = {'x-death': [{'queue': 'Video', 'exchange': 'Topic', 'routing-keys': ['.Video.'], 'reason': 'maxlen'}]}
+
+
+class TestDeadLetters(unittest.TestCase):
+    '''
+        purpose: To verify that the source of a dead letter is found for both retried and broker dead-lettered messages.
+        process: Reads the origin of a message with x-original-* headers and of one with only x-death.
+        validation: Ensures the queue, exchange and routing key come from whichever headers are present.
+    '''
+    def test_origin(self):
+        self.assertEqual(origin(RETRIED), ('Document', '', 'Document'))
+        self.assertEqual(origin(OVERFLOWED), ('Video', 'Topic', '.Video.'))
+        self.assertEqual(origin({}), (None, None, None))
+
+    '''
+        purpose: To verify that inspect reports messages without removing them.
+        process: Inspects a queue holding a retried document and an overflowed video.
+        validation: Ensures both are listed with their reason and nothing is acked.
+    '''
+    def test_inspect_leaves_messages(self):
+        channel = dead_letter_channel([(RETRIED, b'doc'), (OVERFLOWED, b'video')])
+        out = io.StringIO()
+        self.assertEqual(inspect(channel, out=out), 2)
+        self.assertIn('bad pdf', out.getvalue())
+        self.assertIn('maxlen', out.getvalue())
+        channel.basic_ack.assert_not_called()
+
+    '''
+        purpose: To verify that replay republishes only the selected queue's messages with a fresh retry count.
+        process: Replays the Document messages from a queue also holding an overflowed video.
+        validation: Ensures the document goes back to the Document queue without retry headers and only it is acked.
+    '''
+    def test_replay_filters_and_resets(self):
+        channel = dead_letter_channel([(OVERFLOWED, b'video'), (RETRIED, b'doc')])
+        self.assertEqual(replay(channel, queue='Document'), (1, 0))
+        channel.confirm_delivery.assert_called_once()
+        published = channel.basic_publish.call_args.kwargs
+        self.assertEqual((published['exchange'], published['routing_key'], published['body']), ('', 'Document', b'doc'))
+        self.assertEqual(published['properties'].headers, {'trace_id': 't1'})
+        channel.basic_ack.assert_called_once_with(delivery_tag=2)
+
+    '''
+        purpose: To verify that a replay the broker cannot route stays in the dead-letter queue.
+        process: Makes the confirmed publish raise UnroutableError.
+        validation: Ensures the message is counted as failed and not acked.
+    '''
+    def test_unroutable_replay_is_kept(self):
+        channel = dead_letter_channel([(RETRIED, b'doc')])
+        channel.basic_publish.side_effect = pika.exceptions.UnroutableError([])
+        self.assertEqual(replay(channel), (0, 1))
+        channel.basic_ack.assert_not_called()
+
+    '''
+        purpose: To verify that purge empties the whole queue at once, or acks only the selected messages.
+        process: Purges without a filter, then purges the Video messages from a mixed queue.
+        validation: Ensures queue_purge is used in the first case and only the video is acked in the second.
+    '''
+    def test_purge(self):
+        channel = dead_letter_channel([])
+        channel.queue_purge.return_value.method.message_count = 7
+        self.assertEqual(purge(channel), 7)
+        channel = dead_letter_channel([(RETRIED, b'doc'), (OVERFLOWED, b'video')])
+        self.assertEqual(purge(channel, queue='Video'), 1)
+        channel.basic_ack.assert_called_once_with(delivery_tag=2)
+        channel.queue_purge.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+import unittest.mock
+import pika
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from setup import TopologyApplier, TopologyError, expand_queues, load_topology
+
+
+def write_topology(topology):
+    f = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False)
+    json.dump(topology, f)
+    f.close()
+    return f.name
+
+
+class TestTopology(unittest.TestCase):
+    '''
+        purpose: To verify that the shipped topology keeps the queues and routing keys the modules rely on.
+        process: Loads topology.json and expands its queues.
+        validation: Ensures every module queue is bound with its key, content queues have a priority lane and Dashboard is quorum.
+    '''
+    def test_shipped_topology(self):
+        queues = {name: (arguments, bindings) for name, arguments, bindings in expand_queues(load_topology())}
+        for name in ('Document', 'Store', 'Image', 'Audio', 'Video'):
+            self.assertIn(('Topic', f'#.{name}.#'), queues[name][1])
+            self.assertEqual(queues[name][0]['x-max-priority'], 2)
+        self.assertEqual(queues['Dashboard'][1], [('Topic', '#.Status.#')])
+        self.assertEqual(queues['Dashboard'][0]['x-queue-type'], 'quorum')
+        self.assertEqual(queues['Video'][0]['x-queue-mode'], 'lazy')
+
+    '''
+        purpose: To verify that a queue with a retry spec gets delay queues with exponentially growing TTLs.
+        process: Expands the shipped topology and reads the Document delay queues.
+        validation: Ensures three unbound delay queues whose TTLs grow by five and which dead-letter back to Document.
+    '''
+    def test_retry_queues(self):
+        queues = {name: (arguments, bindings) for name, arguments, bindings in expand_queues(load_topology())}
+        delays = [queues[f'Document.retry.{attempt}'][0]['x-message-ttl'] for attempt in (1, 2, 3)]
+        self.assertEqual(delays, [1000, 5000, 25000])
+        self.assertEqual(queues['Document.retry.1'], ({'x-message-ttl': 1000, 'x-dead-letter-exchange': '',
+                                                       'x-dead-letter-routing-key': 'Document'}, []))
+        self.assertNotIn('Document.retry.4', queues)
+
+    '''
+        purpose: To verify that a sharded queue expands to numbered queues, each bound with its own name.
+        process: Expands a Document queue spec with three shards.
+        validation: Ensures Document-0..2 are produced with the same arguments and per-shard binding keys.
+    '''
+    def test_shards_expand(self):
+        path = write_topology({'queues': [{'name': 'Document', 'shards': 3, 'max_priority': 2,
+                                           'bindings': [{'exchange': 'Topic', 'routing_key': '#.{name}.#'}]}]})
+        try:
+            queues = list(expand_queues(load_topology(path)))
+        finally:
+            os.remove(path)
+        self.assertEqual([name for name, _, _ in queues], ['Document-0', 'Document-1', 'Document-2'])
+        self.assertEqual(queues[1], ('Document-1', {'x-max-priority': 2}, [('Topic', '#.Document-1.#')]))
+
+    '''
+        purpose: To verify that invalid queue specs are rejected before anything is declared.
+        process: Loads a quorum queue with a priority and a queue with a misspelt field.
+        validation: Ensures both raise TopologyError.
+    '''
+    def test_invalid_specs_rejected(self):
+        for spec in ({'name': 'Dashboard', 'type': 'quorum', 'max_priority': 2}, {'name': 'Document', 'max_lenght': 5}):
+            path = write_topology({'queues': [spec]})
+            try:
+                with self.assertRaises(TopologyError):
+                    load_topology(path)
+            finally:
+                os.remove(path)
+
+
+class TestTopologyApplier(unittest.TestCase):
+    def declare_mismatch(self, queue, durable=False, arguments=None):
+        if queue == 'Dashboard':
+            raise pika.exceptions.ChannelClosedByBroker(406, 'PRECONDITION_FAILED - inequivalent arg')
+
+    '''
+        purpose: To verify that a queue declared with other arguments is reported and the rest still applied.
+        process: Applies the shipped topology while the broker refuses the Dashboard declare.
+        validation: Ensures Dashboard is reported, the channel is reopened and every binding is still made.
+    '''
+    def test_mismatch_is_reported(self):
+        connection = unittest.mock.MagicMock()
+        channel = connection.channel.return_value
+        channel.is_closed = False
+        channel.queue_declare.side_effect = self.declare_mismatch
+        mismatched = TopologyApplier(connection).apply(load_topology())
+        self.assertEqual(mismatched, ['Dashboard'])
+        channel.queue_delete.assert_not_called()
+        self.assertEqual(channel.queue_bind.call_count, 7)
+
+    '''
+        purpose: To verify that --recreate only replaces a mismatched queue when it is empty.
+        process: Applies the topology with recreate while the Dashboard declare first fails.
+        validation: Ensures the queue is deleted with if_empty and declared again with the file's arguments.
+    '''
+    def test_recreate_empty_queue(self):
+        connection = unittest.mock.MagicMock()
+        channel = connection.channel.return_value
+        channel.is_closed = False
+        declares = []
+
+        def declare(queue, durable=False, arguments=None):
+            declares.append(queue)
+            if declares.count('Dashboard') == 1:
+                self.declare_mismatch(queue)
+
+        channel.queue_declare.side_effect = declare
+        self.assertEqual(TopologyApplier(connection, recreate=True).apply(load_topology()), [])
+        channel.queue_delete.assert_called_once_with(queue='Dashboard', if_empty=True)
+        dashboard = [call.kwargs for call in channel.queue_declare.call_args_list if call.kwargs['queue'] == 'Dashboard']
+        self.assertEqual(len(dashboard), 2)
+        self.assertEqual(dashboard[1]['arguments']['x-queue-type'], 'quorum')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,226 @@
+"""Bulk ingest: send every file under a directory tree, or listed in a CSV/JSONL manifest, as jobs."""
+import argparse
+import csv
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from main_server import id_generator
+from upload_client import CHUNK_SIZE, COUNT_FIELDS, UploadClient, parse_shards
+
+# Job list key -> (id field, type field, file extensions)
+CONTENT_KINDS = {
+    'Documents': ('DocumentId', 'DocumentType', {'pdf', 'txt', 'doc', 'docx', 'rtf', 'odt'}),
+    'Images': ('PictureID', 'PictureType', {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tif', 'tiff', 'webp'}),
+    'Audio': ('AudioID', 'AudioType', {'mp3', 'wav', 'flac', 'ogg', 'm4a', 'aac'}),
+    'Video': ('VideoID', 'VideoType', {'mp4', 'avi', 'mov', 'mkv', 'webm'})
+}
+# Manifest 'type' values accepted for each job list key
+TYPE_NAMES = {'document': 'Documents', 'image': 'Images', 'picture': 'Images', 'audio': 'Audio', 'video': 'Video'}
+DEFAULT_CHECKPOINT = '.bulk_ingest_checkpoint'
+
+
+def classify(path, declared_type=None):
+    """Job list key for a file, from a manifest type if given, else its extension; None if unsupported."""
+    if declared_type:
+        return TYPE_NAMES.get(declared_type.strip().lower().rstrip('s'))
+    extension = os.path.splitext(path)[1][1:].lower()
+    for key, (_, _, extensions) in CONTENT_KINDS.items():
+        if extension in extensions:
+            return key
+    return None
+
+
+def walk_directory(root):
+    """(path, declared type, job group) for every file under `root`, in a stable order."""
+    # Absolute paths, so the checkpoint matches whatever directory a resumed run starts from
+    root = os.path.abspath(root)
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories.sort()
+        for name in sorted(files):
+            yield os.path.join(directory, name), None, None
+
+
+def read_manifest(manifest):
+    """Entries from a CSV (header row) or JSONL manifest with 'path' and optional 'type' and 'job' fields.
+
+    Relative paths are resolved against the manifest's directory.
+    """
+    base = os.path.dirname(os.path.abspath(manifest))
+    with open(manifest, newline='', encoding='utf-8') as f:
+        if manifest.endswith('.jsonl'):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for row in rows:
+            path = os.path.join(base, row['path'])
+            yield path, row.get('type') or None, row.get('job') or None
+
+
+def make_item(path, key):
+    id_field, type_field, _ = CONTENT_KINDS[key]
+    return {
+        'ID': 'ObjectID',
+        id_field: 'ObjectID',
+        type_field: os.path.splitext(path)[1][1:].lower(),
+        'FileName': os.path.basename(path),
+        # Read (or streamed) by the upload client when the item is sent
+        'Path': path,
+        'Size': os.path.getsize(path)
+    }
+
+
+def group_jobs(entries, job_size, done=frozenset(), stats=None):
+    """Jobs of up to `job_size` files, as (job, paths); manifest rows naming a job are grouped by it instead.
+
+    Files already in `done` (the checkpoint) and unsupported files are skipped; the unsupported ones
+    are counted in `stats['skipped_files']` as they are met, so the count holds however the run ends.
+    """
+    pending, grouped = [], {}
+    stats = stats if stats is not None else {}
+    stats.setdefault('skipped_files', 0)
+
+    def build(paths_and_keys):
+        job = {'ID': 'ObjectID', **{COUNT_FIELDS[key]: 0 for key in CONTENT_KINDS},
+               **{key: [] for key in CONTENT_KINDS}}
+        for path, key in paths_and_keys:
+            job[key].append(make_item(path, key))
+            job[COUNT_FIELDS[key]] += 1
+        return job, [path for path, _ in paths_and_keys]
+
+    for path, declared_type, group in entries:
+        if path in done:
+            continue
+        key = classify(path, declared_type)
+        if key is None or not os.path.isfile(path):
+            logging.warning(f"Skipping {path}: {'not a file' if key else 'unsupported type'}")
+            stats['skipped_files'] += 1
+            continue
+        batch = grouped.setdefault(group, []) if group else pending
+        batch.append((path, key))
+        if not group and len(pending) >= job_size:
+            yield build(pending)
+            pending = []
+    if pending:
+        yield build(pending)
+    for batch in grouped.values():
+        yield build(batch)
+
+
+class Checkpoint:
+    """Paths of files whose job was sent, appended to a local file so an interrupted run can resume."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.done = {line.rstrip('\n') for line in f if line.strip()}
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def record(self, paths):
+        with self.lock:
+            self.file.write(''.join(f"{path}\n" for path in paths))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.done.update(paths)
+
+    def close(self):
+        self.file.close()
+
+
+def ingest(jobs, checkpoint, publishers=4, client_factory=UploadClient, stats=None):
+    """Send `jobs` ((job, paths) pairs) with `publishers` concurrent clients; returns the run's counters.
+
+    `stats` is the dict group_jobs counts skipped files in, so all counters end up together. Each
+    publisher thread owns its client, as pika connections are not thread-safe.
+    """
+    pending = queue.Queue(maxsize=publishers * 2)
+    stats = stats if stats is not None else {}
+    stats.update({'jobs': 0, 'files': 0, 'bytes': 0, 'failed_jobs': 0})
+    stats.setdefault('skipped_files', 0)
+    stats_lock = threading.Lock()
+
+    def publisher():
+        client = client_factory()
+        try:
+            while True:
+                entry = pending.get()
+                if entry is None:
+                    return
+                job, paths = entry
+                size = sum(item['Size'] for key in CONTENT_KINDS for item in job[key])
+                try:
+                    client.send_job(id_generator(job))
+                except Exception as e:
+                    logging.error(f"Job of {len(paths)} files starting at {paths[0]} failed: {e}")
+                    with stats_lock:
+                        stats['failed_jobs'] += 1
+                    continue
+                checkpoint.record(paths)
+                with stats_lock:
+                    stats['jobs'] += 1
+                    stats['files'] += len(paths)
+                    stats['bytes'] += size
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=publisher, daemon=True) for _ in range(publishers)]
+    for thread in threads:
+        thread.start()
+    try:
+        for entry in jobs:
+            pending.put(entry)
+    finally:
+        for _ in threads:
+            pending.put(None)
+        for thread in threads:
+            thread.join()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--dir', help='directory tree to ingest')
+    source.add_argument('--manifest', help='CSV or .jsonl manifest with path[, type, job] fields')
+    parser.add_argument('--job-size', type=int, default=50, help='files per job (manifest job groups excepted)')
+    parser.add_argument('--publishers', type=int, default=4, help='concurrent publisher connections')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT, help='file recording sent files, for resuming')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--stream', action='store_true', help='stream files in chunks instead of one message per file')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE // (1024 * 1024), help='chunk size in MB')
+    parser.add_argument('--shard', action='append', metavar='QUEUE=N',
+                        help='spread a content queue over N queues by job, e.g. Document=4')
+    args = parser.parse_args()
+
+    checkpoint = Checkpoint(args.checkpoint)
+    if checkpoint.done:
+        logging.info(f"Resuming: {len(checkpoint.done)} files already sent according to {args.checkpoint}")
+    entries = walk_directory(args.dir) if args.dir else read_manifest(args.manifest)
+    chunk_size = args.chunk_size * 1024 * 1024 if args.stream else None
+    shards = parse_shards(args.shard)
+
+    stats = {}
+    start = time.perf_counter()
+    try:
+        ingest(group_jobs(entries, args.job_size, checkpoint.done, stats), checkpoint, args.publishers,
+               lambda: UploadClient(args.host, chunk_size=chunk_size, shards=shards), stats)
+    finally:
+        checkpoint.close()
+    elapsed = max(time.perf_counter() - start, 1e-9)
+
+    logging.info(
+        f"Sent {stats['files']} files in {stats['jobs']} jobs in {elapsed:.1f} s: "
+        f"{stats['files'] / elapsed:.1f} files/s, {stats['bytes'] / 2 ** 20 / elapsed:.1f} MB/s "
+        f"({stats['skipped_files']} skipped, {stats['failed_jobs']} jobs failed)"
+    )
+    return 1 if stats['failed_jobs'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
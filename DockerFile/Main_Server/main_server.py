@@ -1,3 +1,5 @@
+import argparse
+import os
 import socket
 from pymongo import MongoClient
 from bson import BSON, ObjectId
@@ -5,13 +7,15 @@ import hashlib
 import datetime
 import random
 import logging
-import pika
 import time
+from upload_client import CHUNK_SIZE, UploadClient, parse_shards
 
 MAX_MESSAGE_SIZE = 100 * 1024 * 1024  # 100 MB
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+_client = None
+
 def compute_unique_id(data_object):
     data_str = str(BSON.encode(data_object))
     current_time = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
@@ -22,80 +26,17 @@ def compute_unique_id(data_object):
 def split_payload(payload):
     return [payload[i:i+MAX_MESSAGE_SIZE] for i in range(0, len(payload), MAX_MESSAGE_SIZE)]
 
-def send_bson_obj(job):
+def default_client():
+    """Upload client shared by every send_bson_obj call in this process, so the connection stays warm."""
+    global _client
+    if _client is None:
+        _client = UploadClient()
+    return _client
+
+def send_bson_obj(job, client=None):
     try:
-        connection = pika.BlockingConnection(pika.ConnectionParameters('localhost'))
-        channel = connection.channel()
-        
-        # Dictionary mapping content types to queue names
-        queues = {
-            'Documents': 'Document',
-            'Images': 'Image',
-            'Audio': 'Audio',
-            'Video': 'Video',
-            'Dashboard': 'Dashboard'
-        }
-        
-        # Declare queues passively (don't create or modify if they exist)
-        for queue_name in queues.values():
-            try:
-                channel.queue_declare(queue=queue_name, passive=True)
-            except pika.exceptions.ChannelClosedByBroker:
-                # Reconnect if channel was closed
-                connection = pika.BlockingConnection(pika.ConnectionParameters('localhost'))
-                channel = connection.channel()
-                # Create queue if it doesn't exist
-                channel.queue_declare(queue=queue_name, durable=True)
-
-        def get_content_type(key, item):
-            if key == 'Documents':
-                return 'Document'
-            elif key == 'Images':
-                return 'Image'
-            elif key == 'Audio':
-                return 'Audio'
-            elif key == 'Video':
-                return 'Video'
-            return 'Unknown'
-
-        for key in ['Documents', 'Images', 'Audio', 'Video']:
-            if key in job and len(job[key]) > 0:
-                for item in job[key]:
-                    try:
-                        # Prepare dashboard message
-                        dashboard_message = {
-                            'time': datetime.datetime.now().strftime('%m/%d/%Y, %I:%M:%S %p'),
-                            'job_id': item['ID'],
-                            'content_id': item.get('DocumentId') or item.get('PictureID') or item.get('AudioID') or item.get('VideoID'),
-                            'content_type': get_content_type(key, item),
-                            'file_name': item['FileName'],
-                            'status': 'Processed',
-                            'message': f"{get_content_type(key, item)} file '{item['FileName']}' successfully sent to {key} queue"
-                        }
-
-                        # Send to dashboard queue
-                        channel.basic_publish(
-                            exchange='',
-                            routing_key='Dashboard',
-                            body=BSON.encode(dashboard_message),
-                            properties=pika.BasicProperties(delivery_mode=2)
-                        )
-
-                        # Send to content-specific queue
-                        channel.basic_publish(
-                            exchange='',
-                            routing_key=queues[key],
-                            body=BSON.encode(item),
-                            properties=pika.BasicProperties(delivery_mode=2)
-                        )
-
-                        logging.info(f"Successfully sent {key}: ID={item.get('ID')}, FileName={item.get('FileName')} to {queues[key]}")
-                    except Exception as e:
-                        logging.error(f"Failed to send {key}: {e}")
-                        raise
-
-        logging.info("All messages processed and sent to respective RabbitMQ queues")
-        connection.close()
+        sent = (client or default_client()).send_job(job)
+        logging.info(f"All {sent} content items of job {job.get('ID')} sent to their RabbitMQ queues")
 
     except Exception as e:
         logging.error(f"Failed to send message to RabbitMQ: {e}")
@@ -124,88 +65,67 @@ def id_generator(job):
     return job
 
 if __name__ == '__main__':
-    num_messages = 10  # You can change this to any number you want
-    split_jobs = False  # Set to True for multiple jobs, False for one job
-
-    base_job = { 
-        "ID": "ObjectID",  
-        "NumberOfDocuments": 1,
-        "NumberOfImages": 2,
-        "NumberOfAudio": 2,
-        "Documents": [
-            {
-                "ID": "ObjectID",  
-                "DocumentId": "ObjectID",
-                "DocumentType": "String",
-                "FileName": "String",
-                "Payload": b"Binary"
-            }
-        ],
-        "Images": [
-            {
-                "ID": "ObjectID", 
-                "PictureID": "ObjectID",
-                "PictureType": "String",
-                "FileName": "String",
-                "Payload": b"Binary"
-            }
-        ],
-        "Audio": [
-            {
-                "ID": "ObjectID", 
-                "AudioID": "ObjectID",
-                "AudioType": "String",
-                "FileName": "String",
-                "Payload": b"Binary"
-            },
-            {
-                "ID": "ObjectID", 
-                "AudioID": "ObjectID",
-                "AudioType": "String",
-                "FileName": "String",
-                "Payload": b"Binary2"
-            }
-        ],
-    }
-
+    parser = argparse.ArgumentParser(description='Send the sample files as one job, or as one job per message.')
+    parser.add_argument('--messages', type=int, default=10, help='number of copies of each sample file to send')
+    parser.add_argument('--split-jobs', action='store_true', help='send one job per message instead of one job')
+    parser.add_argument('--stream', action='store_true', help='stream files in chunks instead of one message per file')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE // (1024 * 1024), help='chunk size in MB')
+    parser.add_argument('--shard', action='append', metavar='QUEUE=N',
+                        help='spread a content queue over N queues by job, e.g. Document=4')
+    args = parser.parse_args()
+    num_messages = args.messages
+
+    # Items refer to the sample files by path; each is read (or streamed) only while it is sent,
+    # so the number of copies in a job does not change memory use
+    samples = {}
     try:
-        with open('Project_4.pdf', 'rb') as f:
-            base_job['Documents'][0]['Payload'] = f.read()
-            base_job['Documents'][0]["DocumentType"] = "pdf"
-            base_job['Documents'][0]["FileName"] = f.name
-        with open('x.png', 'rb') as f:
-            base_job['Images'][0]['Payload'] = f.read()
-            base_job['Images'][0]["PictureType"] = "png"
-            base_job['Images'][0]["FileName"] = f.name
-        with open('audio.mp3', 'rb') as f:
-            base_job['Audio'][0]['Payload'] = f.read()
-            base_job['Audio'][0]["AudioType"] = "mp3"
-            base_job['Audio'][0]["FileName"] = f.name
-        with open('audio2.mp3', 'rb') as f:
-            base_job['Audio'][1]['Payload'] = f.read()
-            base_job['Audio'][1]["AudioType"] = "mp3"
-            base_job['Audio'][1]["FileName"] = f.name
+        for name in ('Project_4.pdf', 'x.png', 'audio.mp3', 'audio2.mp3'):
+            samples[name] = {"FileName": name, "Path": name, "Size": os.path.getsize(name)}
     except FileNotFoundError as e:
         logging.error(f"File not found: {e}")
         exit(1)
 
-    if split_jobs:
+    def document():
+        return {"ID": "ObjectID", "DocumentId": "ObjectID", "DocumentType": "pdf", **samples['Project_4.pdf']}
+
+    def image():
+        return {"ID": "ObjectID", "PictureID": "ObjectID", "PictureType": "png", **samples['x.png']}
+
+    def audio(name='audio.mp3'):
+        return {"ID": "ObjectID", "AudioID": "ObjectID", "AudioType": "mp3", **samples[name]}
+
+    client = UploadClient(chunk_size=args.chunk_size * 1024 * 1024 if args.stream else None,
+                          shards=parse_shards(args.shard))
+
+    if args.split_jobs:
         for i in range(num_messages):
-            job = base_job.copy()
+            job = {
+                "ID": "ObjectID",
+                "NumberOfDocuments": 1,
+                "NumberOfImages": 1,
+                "NumberOfAudio": 2,
+                "Documents": [document()],
+                "Images": [image()],
+                "Audio": [audio(), audio('audio2.mp3')],
+            }
             job = id_generator(job)  # Generate unique IDs for job and content
 
             logging.info(f"Sending job {i+1}/{num_messages} - Job ID: {job['ID']}")
-            send_bson_obj(job)
+            send_bson_obj(job, client)
             time.sleep(0.1)  # Optional delay between messages
     else:
-        full_job = base_job.copy()
-        full_job['NumberOfDocuments'] = num_messages
-        full_job['Documents'] = [base_job['Documents'][0].copy() for _ in range(num_messages)]
-        full_job['NumberOfImages'] = num_messages * 2
-        full_job['Images'] = [base_job['Images'][0].copy() for _ in range(num_messages * 2)]
-        full_job['NumberOfAudio'] = num_messages * 2
-        full_job['Audio'] = [base_job['Audio'][0].copy() for _ in range(num_messages * 2)]
+        full_job = {
+            "ID": "ObjectID",
+            "NumberOfDocuments": num_messages,
+            "Documents": [document() for _ in range(num_messages)],
+            "NumberOfImages": num_messages * 2,
+            "Images": [image() for _ in range(num_messages * 2)],
+            "NumberOfAudio": num_messages * 2,
+            "Audio": [audio() for _ in range(num_messages * 2)],
+        }
 
         full_job = id_generator(full_job)  # Generate unique IDs for the full job
         logging.info(f"Sending one large job with {num_messages} content items - Job ID: {full_job['ID']}")
-        send_bson_obj(full_job)
+        send_bson_obj(full_job, client)
+
+    client.close()
@@ -6,8 +6,11 @@ import datetime
 import json
 import random
 from pathlib import Path
-import pika
 import logging
+import os
+import queue
+import threading
+from upload_client import CHUNK_SIZE, UploadClient, UploadCancelled
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -34,14 +37,13 @@ class FileUploaderGUI:
             "Video": [],
         }
 
-        # Queue configuration
-        self.queues = {
-            'Documents': 'Document',
-            'Images': 'Image',
-            'Audio': 'Audio',
-            'Video': 'Video',
-            'Dashboard': 'Dashboard'
-        }
+        # One warm connection for every upload made from this window; only the upload worker uses it
+        # Files are streamed in fixed-size chunks, so memory use does not grow with file size
+        self.client = UploadClient(chunk_size=CHUNK_SIZE)
+        self.worker = None
+        self.cancel_event = threading.Event()
+        # Progress and results posted by the worker, drained on the Tk thread
+        self.upload_events = queue.Queue()
 
         self.create_widgets()
 
@@ -102,12 +104,18 @@ class FileUploaderGUI:
         # Upload Button
         style = ttk.Style()
         style.configure("Upload.TButton", font=("Arial", 11))
-        upload_btn = ttk.Button(main_frame, text="Upload Files", command=self.upload_files, style="Upload.TButton")
-        upload_btn.grid(row=5, column=1, columnspan=3, pady=20, sticky="ew")
+        self.upload_btn = ttk.Button(main_frame, text="Upload Files", command=self.upload_files, style="Upload.TButton")
+        self.upload_btn.grid(row=5, column=1, columnspan=2, pady=20, sticky="ew")
+        self.cancel_btn = ttk.Button(main_frame, text="Cancel", command=self.cancel_upload, state="disabled")
+        self.cancel_btn.grid(row=5, column=3, pady=20, padx=(5, 0), sticky="ew")
+
+        # Progress bar, driven by the bytes sent
+        self.progress = ttk.Progressbar(main_frame, mode="determinate")
+        self.progress.grid(row=6, column=0, columnspan=5, pady=5, sticky="ew")
 
         # Status Label
         self.status_label = ttk.Label(main_frame, text="")
-        self.status_label.grid(row=6, column=0, columnspan=5, pady=5)
+        self.status_label.grid(row=7, column=0, columnspan=5, pady=5)
 
     def update_audio_list(self):
         for widget in self.audio_frame.winfo_children():
@@ -161,50 +169,52 @@ class FileUploaderGUI:
 
         filename = filedialog.askopenfilename(filetypes=filetypes[file_type])
         if filename:
+            # Only the path and size are kept; the file is read in chunks by the upload worker
+            name, suffix, size = Path(filename).name, Path(filename).suffix[1:], os.path.getsize(filename)
             if file_type == "document":
-                self.doc_label.config(text=Path(filename).name)
-                with open(filename, "rb") as f:
-                    self.job["Documents"] = [{
-                        "ID": "ObjectID",
-                        "DocumentId": "ObjectID",
-                        "DocumentType": Path(filename).suffix[1:],
-                        "FileName": Path(filename).name,
-                        "Payload": f.read(),
-                    }]
-                    self.job["NumberOfDocuments"] = 1
+                self.doc_label.config(text=name)
+                self.job["Documents"] = [{
+                    "ID": "ObjectID",
+                    "DocumentId": "ObjectID",
+                    "DocumentType": suffix,
+                    "FileName": name,
+                    "Path": filename,
+                    "Size": size,
+                }]
+                self.job["NumberOfDocuments"] = 1
             elif file_type == "image":
-                self.img_label.config(text=Path(filename).name)
-                with open(filename, "rb") as f:
-                    self.job["Images"] = [{
-                        "ID": "ObjectID",
-                        "PictureID": "ObjectID",
-                        "PictureType": Path(filename).suffix[1:],
-                        "FileName": Path(filename).name,
-                        "Payload": f.read(),
-                    }]
-                    self.job["NumberOfImages"] = 1
+                self.img_label.config(text=name)
+                self.job["Images"] = [{
+                    "ID": "ObjectID",
+                    "PictureID": "ObjectID",
+                    "PictureType": suffix,
+                    "FileName": name,
+                    "Path": filename,
+                    "Size": size,
+                }]
+                self.job["NumberOfImages"] = 1
             elif file_type == "audio":
-                with open(filename, "rb") as f:
-                    self.job["Audio"].append({
-                        "ID": "ObjectID",
-                        "AudioID": "ObjectID",
-                        "AudioType": Path(filename).suffix[1:],
-                        "FileName": Path(filename).name,
-                        "Payload": f.read(),
-                    })
-                    self.job["NumberOfAudio"] = len(self.job["Audio"])
+                self.job["Audio"].append({
+                    "ID": "ObjectID",
+                    "AudioID": "ObjectID",
+                    "AudioType": suffix,
+                    "FileName": name,
+                    "Path": filename,
+                    "Size": size,
+                })
+                self.job["NumberOfAudio"] = len(self.job["Audio"])
                 self.update_audio_list()
             elif file_type == "video":
-                self.video_label.config(text=Path(filename).name)
-                with open(filename, "rb") as f:
-                    self.job["Video"] = [{
-                        "ID": "ObjectID",
-                        "VideoID": "ObjectID",
-                        "VideoType": Path(filename).suffix[1:],
-                        "FileName": Path(filename).name,
-                        "Payload": f.read(),
-                    }]
-                    self.job["NumberOfVideo"] = 1
+                self.video_label.config(text=name)
+                self.job["Video"] = [{
+                    "ID": "ObjectID",
+                    "VideoID": "ObjectID",
+                    "VideoType": suffix,
+                    "FileName": name,
+                    "Path": filename,
+                    "Size": size,
+                }]
+                self.job["NumberOfVideo"] = 1
 
     def compute_unique_id(self, data_object):
         data_str = str(BSON.encode(data_object))
@@ -233,74 +243,22 @@ class FileUploaderGUI:
         return job
 
     def send_bson_obj(self, job):
+        # Runs on the upload worker thread; results go back to the Tk thread through upload_events
         try:
-            connection = pika.BlockingConnection(pika.ConnectionParameters('localhost'))
-            channel = connection.channel()
-
-            # Declare queues passively (don't create or modify if they exist)
-            for queue_name in self.queues.values():
-                try:
-                    channel.queue_declare(queue=queue_name, passive=True)
-                except pika.exceptions.ChannelClosedByBroker:
-                    # Reconnect if channel was closed
-                    connection = pika.BlockingConnection(pika.ConnectionParameters('localhost'))
-                    channel = connection.channel()
-                    # Create queue if it doesn't exist
-                    channel.queue_declare(queue=queue_name, durable=True)
-
-            def get_content_type(key, item):
-                if key == 'Documents':
-                    return 'Document'
-                elif key == 'Images':
-                    return 'Image'
-                elif key == 'Audio':
-                    return 'Audio'
-                elif key == 'Video':
-                    return 'Video'
-                return 'Unknown'
-
-            for key in ['Documents', 'Images', 'Audio', 'Video']:
-                if key in job and len(job[key]) > 0:
-                    for item in job[key]:
-                        try:
-                            # Prepare dashboard message
-                            dashboard_message = {
-                                'time': datetime.datetime.now().strftime('%m/%d/%Y, %I:%M:%S %p'),
-                                'job_id': item['ID'],
-                                'content_id': item.get('DocumentId') or item.get('PictureID') or item.get('AudioID') or item.get('VideoID'),
-                                'content_type': get_content_type(key, item),
-                                'file_name': item['FileName'],
-                                'status': 'Processed',
-                                'message': f"{get_content_type(key, item)} file '{item['FileName']}' successfully sent to {key} queue"
-                            }
-
-                            # Send to dashboard queue
-                            channel.basic_publish(
-                                exchange='',
-                                routing_key='Dashboard',
-                                body=BSON.encode(dashboard_message),
-                                properties=pika.BasicProperties(delivery_mode=2)
-                            )
-
-                            # Send to content-specific queue
-                            channel.basic_publish(
-                                exchange='',
-                                routing_key=self.queues[key],
-                                body=BSON.encode(item),
-                                properties=pika.BasicProperties(delivery_mode=2)
-                            )
-
-                            logging.info(f"Successfully sent {key}: ID={item.get('ID')}, FileName={item.get('FileName')} to {self.queues[key]}")
-                        except Exception as e:
-                            logging.error(f"Failed to send {key}: {e}")
-                            raise
-
-            connection.close()
-            return True
-
+            sent = self.client.send_job(
+                job,
+                progress=lambda size: self.upload_events.put(("progress", size)),
+                cancelled=self.cancel_event
+            )
+            logging.info(f"All {sent} content items of job {job.get('ID')} sent to their RabbitMQ queues")
+            self.upload_events.put(("done", sent))
+
+        except UploadCancelled:
+            logging.info(f"Upload of job {job.get('ID')} cancelled")
+            self.upload_events.put(("cancelled", None))
         except Exception as e:
             logging.error(f"Failed to send message to RabbitMQ: {e}")
-            return str(e)
+            self.upload_events.put(("error", str(e)))
 
     def upload_files(self):
         # Check if at least one file is selected
@@ -312,34 +270,71 @@ class FileUploaderGUI:
         ) == 0:
             messagebox.showwarning("Warning", "Please select at least one file to upload")
             return
+        if self.worker is not None and self.worker.is_alive():
+            return
 
-        # Generate IDs and send data
-        self.status_label.config(text="Processing...")
-        self.root.update()
-
-        try:
-            processed_job = self.id_generator(self.job)
-            result = self.send_bson_obj(processed_job)
-
-            if result is True:
+        # Generate IDs, then read and send on a worker so the window stays responsive; the worker gets
+        # its own item lists so files selected or cleared meanwhile do not change the job being sent
+        job = {key: list(value) if isinstance(value, list) else value for key, value in self.job.items()}
+        processed_job = self.id_generator(job)
+        total = sum(item.get("Size", 0) for key in ("Documents", "Images", "Audio", "Video")
+                    for item in processed_job[key])
+        self.progress.config(maximum=max(total, 1), value=0)
+        self.status_label.config(text="Uploading...")
+        self.upload_btn.config(state="disabled")
+        self.cancel_btn.config(state="normal")
+        self.cancel_event.clear()
+        self.worker = threading.Thread(target=self.send_bson_obj, args=(processed_job,), daemon=True)
+        self.worker.start()
+        self.root.after(100, self.poll_upload)
+
+    def cancel_upload(self):
+        self.cancel_event.set()
+        self.cancel_btn.config(state="disabled")
+        self.status_label.config(text="Cancelling...")
+
+    def poll_upload(self):
+        while True:
+            try:
+                event, value = self.upload_events.get_nowait()
+            except queue.Empty:
+                break
+            if event == "progress":
+                self.progress.step(value)
+                continue
+
+            self.upload_btn.config(state="normal")
+            self.cancel_btn.config(state="disabled")
+            if event == "done":
+                self.progress.config(value=self.progress.cget("maximum"))
                 self.status_label.config(text="Files uploaded successfully!")
                 messagebox.showinfo("Success", "Files have been uploaded successfully!")
                 # Clear all files after successful upload
-                self.clear_file("Document")
-                self.clear_file("Image")
-                self.clear_file("Audio")
-                self.clear_file("Video")
+                self.clear_file("document")
+                self.clear_file("image")
+                self.clear_file("audio")
+                self.clear_file("video")
+            elif event == "cancelled":
+                self.status_label.config(text="Upload cancelled; files already sent were not recalled")
             else:
-                self.status_label.config(text=f"Upload failed: {result}")
-                messagebox.showerror("Error", f"Upload failed: {result}")
-        except Exception as e:
-            self.status_label.config(text=f"Error: {str(e)}")
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+                self.status_label.config(text=f"Upload failed: {value}")
+                messagebox.showerror("Error", f"Upload failed: {value}")
+            return
+        self.root.after(100, self.poll_upload)
+
+    def close(self):
+        # Stop an upload in progress at its next chunk before closing the connection
+        self.cancel_event.set()
+        if self.worker is not None:
+            self.worker.join()
+        self.client.close()
+        self.root.destroy()
 
 
 def main():
     root = tk.Tk()
     app = FileUploaderGUI(root)
+    root.protocol("WM_DELETE_WINDOW", app.close)
     root.mainloop()
 
 
@@ -0,0 +1,43 @@
+import argparse
+import os
+import sys
+import tempfile
+import tracemalloc
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from upload_client import CHUNK_SIZE, job_messages
+
+
+def make_job(path, size, copies):
+    # The same file referenced by many items, as main_server's sample job does
+    return {
+        'ID': 'job',
+        'Documents': [{'ID': 'job', 'DocumentId': f'doc{i}', 'FileName': f'{i}.bin', 'Path': path, 'Size': size}
+                      for i in range(copies)]
+    }
+
+
+def peak_bytes(job, chunk_size):
+    # Encodes every message without a broker; the peak is what the uploader must hold at once
+    tracemalloc.start()
+    sent = sum(len(body) for _, body, _, _ in job_messages(job, chunk_size=chunk_size))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return sent, peak
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare peak memory of whole-file and streamed uploads.')
+    parser.add_argument('--file-mb', type=int, default=64)
+    parser.add_argument('--copies', type=int, default=4)
+    parser.add_argument('--chunk-mb', type=int, default=CHUNK_SIZE // (1024 * 1024))
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile() as f:
+        for _ in range(args.file_mb):
+            f.write(os.urandom(1024 * 1024))
+        f.flush()
+        job = make_job(f.name, args.file_mb * 1024 * 1024, args.copies)
+
+        for label, chunk_size in (('whole file per message', None), ('streamed', args.chunk_mb * 1024 * 1024)):
+            sent, peak = peak_bytes(job, chunk_size)
+            print(f"{label:24} sent {sent / 2 ** 20:8.1f} MB  peak {peak / 2 ** 20:8.1f} MB")
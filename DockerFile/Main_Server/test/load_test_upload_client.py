@@ -0,0 +1,62 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+import pika
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from main_server import id_generator
+from upload_client import AsyncUploadClient, UploadClient, job_messages
+
+
+def make_job(i):
+    # One small document per job, the common case for interactive uploads
+    return id_generator({
+        'ID': 'ObjectID',
+        'NumberOfDocuments': 1,
+        'Documents': [{'ID': 'ObjectID', 'DocumentId': 'ObjectID', 'DocumentType': 'txt',
+                       'FileName': f'load_test_{i}.txt', 'Payload': b'x' * 1024}]
+    })
+
+
+def legacy_send(job, host):
+    # What send_bson_obj did before the upload client: a connection and five queue checks per job
+    connection = pika.BlockingConnection(pika.ConnectionParameters(host))
+    channel = connection.channel()
+    for queue_name in ('Document', 'Image', 'Audio', 'Video', 'Dashboard'):
+        channel.queue_declare(queue=queue_name, passive=True)
+    for queue, body, headers, priority in job_messages(job):
+        channel.basic_publish(exchange='', routing_key=queue, body=body,
+                              properties=pika.BasicProperties(delivery_mode=2, headers=headers))
+    connection.close()
+
+
+def report(label, jobs, seconds):
+    print(f"{label:32} {jobs} jobs in {seconds:7.2f} s  ({jobs / seconds:8.1f} jobs/s)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Send small jobs through each upload path and compare job rates.')
+    parser.add_argument('--jobs', type=int, default=1000)
+    parser.add_argument('--host', default='localhost')
+    args = parser.parse_args()
+    jobs = [make_job(i) for i in range(args.jobs)]
+
+    start = time.perf_counter()
+    for job in jobs:
+        legacy_send(job, args.host)
+    report('connection per job', len(jobs), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with UploadClient(args.host) as client:
+        for job in jobs:
+            client.send_job(job)
+    report('UploadClient', len(jobs), time.perf_counter() - start)
+
+    async def send_async():
+        async with AsyncUploadClient(args.host) as client:
+            await asyncio.gather(*(client.send_job(job) for job in jobs))
+
+    start = time.perf_counter()
+    asyncio.run(send_async())
+    report('AsyncUploadClient', len(jobs), time.perf_counter() - start)
@@ -0,0 +1,103 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import unittest.mock
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from bulk_ingest import Checkpoint, classify, group_jobs, ingest, read_manifest, walk_directory
+from upload_client import UnroutableMessages
+
+
+def make_tree(root, names):
+    for name in names:
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'x' * 100)
+
+
+class TestBulkIngest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    '''
+        purpose: To verify that files are classified by extension, or by a manifest type when given.
+        process: Classifies paths of each content type, an unknown extension and a declared type.
+        validation: Ensures each maps to its job list key and unsupported files map to None.
+    '''
+    def test_classify(self):
+        self.assertEqual(classify('a/report.PDF'), 'Documents')
+        self.assertEqual(classify('photo.jpeg'), 'Images')
+        self.assertEqual(classify('song.wav'), 'Audio')
+        self.assertEqual(classify('clip.mov'), 'Video')
+        self.assertIsNone(classify('archive.zip'))
+        self.assertEqual(classify('scan.bin', 'Image'), 'Images')
+
+    '''
+        purpose: To verify that a directory walk is grouped into jobs of the configured size.
+        process: Walks a tree of five supported files and one unsupported file with a job size of two.
+        validation: Ensures three jobs of 2, 2 and 1 files with matching counts, and the unsupported file skipped.
+    '''
+    def test_directory_grouped_into_jobs(self):
+        make_tree(self.root, ['a.pdf', 'b.png', 'sub/c.mp3', 'sub/d.mp4', 'sub/e.txt', 'notes.zip'])
+        stats = {}
+        jobs = group_jobs(walk_directory(self.root), 2, stats=stats)
+        grouped = list(jobs)
+        self.assertEqual([len(paths) for _, paths in grouped], [2, 2, 1])
+        self.assertEqual(stats['skipped_files'], 1)
+        first_job = grouped[0][0]
+        self.assertEqual(first_job['NumberOfDocuments'], 1)
+        self.assertEqual(first_job['Images'][0]['FileName'], 'b.png')
+        self.assertEqual(first_job['Images'][0]['Size'], 100)
+
+    '''
+        purpose: To verify that CSV and JSONL manifests are read and their job column respected.
+        process: Writes both manifest forms with relative paths, declared types and job names.
+        validation: Ensures paths resolve against the manifest and rows naming a job are grouped together.
+    '''
+    def test_manifests(self):
+        make_tree(self.root, ['a.pdf', 'b.bin', 'c.png'])
+        with open(os.path.join(self.root, 'files.csv'), 'w') as f:
+            f.write('path,type,job\na.pdf,,job1\nb.bin,image,job2\nc.png,,job1\n')
+        with open(os.path.join(self.root, 'files.jsonl'), 'w') as f:
+            for name in ('a.pdf', 'c.png'):
+                f.write(json.dumps({'path': name}) + '\n')
+
+        grouped = list(group_jobs(read_manifest(os.path.join(self.root, 'files.csv')), 10))
+        self.assertEqual(sorted(len(paths) for _, paths in grouped), [1, 2])
+        self.assertEqual([os.path.basename(path) for path, _, _ in
+                          read_manifest(os.path.join(self.root, 'files.jsonl'))], ['a.pdf', 'c.png'])
+
+    '''
+        purpose: To verify that an interrupted ingest resumes without resending completed files, and counts skipped files.
+        process: Ingests a tree with a mocked upload client whose second job the broker returns, then re-runs from the checkpoint.
+        validation: Ensures the first run records only sent files and counts the unsupported ones, and the second run sends just the rest.
+    '''
+    def test_resume_from_checkpoint(self):
+        make_tree(self.root, [f'{i}.pdf' for i in range(6)] + ['notes.zip'])
+        checkpoint_path = os.path.join(self.root, 'checkpoint')
+        client = unittest.mock.MagicMock()
+        client.send_job.side_effect = [2, UnroutableMessages('1 messages of job 2 were not routed'), 2]
+
+        checkpoint = Checkpoint(checkpoint_path)
+        stats = {}
+        ingest(group_jobs(walk_directory(self.root), 2, checkpoint.done, stats), checkpoint, 1, lambda: client, stats)
+        checkpoint.close()
+        # notes.zip and the checkpoint file itself are skipped
+        self.assertEqual((stats['files'], stats['failed_jobs'], stats['bytes'], stats['skipped_files']), (4, 1, 400, 2))
+
+        client.send_job.side_effect = None
+        checkpoint = Checkpoint(checkpoint_path)
+        self.assertEqual(len(checkpoint.done), 4)
+        stats = ingest(group_jobs(walk_directory(self.root), 2, checkpoint.done), checkpoint, 2, lambda: client)
+        checkpoint.close()
+        self.assertEqual((stats['jobs'], stats['files']), (1, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,297 @@
+import asyncio
+import tempfile
+import threading
+import unittest
+import unittest.mock
+import os
+import sys
+import pika
+from bson import BSON
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from upload_client import (UploadClient, AsyncUploadClient, MissingQueue, UnroutableMessages, UploadCancelled,
+                           job_messages, shard_index)
+from messaging import SMALL_ITEM_BYTES, SMALL_ITEM_PRIORITY
+
+
+def make_job(job_id='job1', documents=1, images=1):
+    return {
+        'ID': job_id,
+        'processingTime': 0.01,
+        'Documents': [{'ID': job_id, 'DocumentId': f'doc{i}', 'FileName': f'{i}.pdf', 'Payload': b'%PDF'}
+                      for i in range(documents)],
+        'Images': [{'ID': job_id, 'PictureID': f'pic{i}', 'FileName': f'{i}.png', 'Payload': b'PNG'}
+                   for i in range(images)]
+    }
+
+
+class TestUploadClient(unittest.TestCase):
+    '''
+        purpose: To verify that every item is sent with its dashboard status and trace headers.
+        process: Builds the messages for a job with one document and two images.
+        validation: Ensures a status precedes each item, expected counts are attached to both and both share a trace.
+    '''
+    def test_job_messages(self):
+        messages = list(job_messages(make_job(images=2)))
+        self.assertEqual([queue for queue, _, _, _ in messages],
+                         ['Dashboard', 'Document', 'Dashboard', 'Image', 'Dashboard', 'Image'])
+        status_headers, item_headers = messages[0][2], messages[1][2]
+        self.assertEqual(status_headers['trace_id'], item_headers['trace_id'])
+        self.assertAlmostEqual(item_headers['hops'][0]['prepare_ms'], 10)
+        image = BSON(messages[3][1]).decode()
+        self.assertEqual((image['NumberOfDocuments'], image['NumberOfImages'], image['NumberOfAudio']), (1, 2, 0))
+
+    '''
+        purpose: To verify that the connection and queue checks are reused across jobs.
+        process: Sends three jobs through one client with pika's BlockingConnection mocked.
+        validation: Ensures one connection, one passive declare per queue plus one round trip per job, and every message published.
+    '''
+    def test_connection_and_topology_are_reused(self):
+        with unittest.mock.patch('pika.BlockingConnection') as connection_class:
+            connection = connection_class.return_value
+            connection.is_closed = False
+            channel = connection.channel.return_value
+            channel.is_closed = False
+            with UploadClient() as client:
+                for i in range(3):
+                    self.assertEqual(client.send_job(make_job(f'job{i}')), 2)
+            connection_class.assert_called_once()
+            self.assertEqual(channel.queue_declare.call_count, 3 + 3)
+            self.assertEqual(channel.basic_publish.call_count, 12)
+            connection.close.assert_called_once()
+
+    '''
+        purpose: To verify that a missing queue is reported instead of being created outside the topology file.
+        process: Makes the passive declare of the Image queue fail the way the broker does.
+        validation: Ensures MissingQueue is raised, nothing is published and no queue is declared or bound.
+    '''
+    def test_missing_queue_is_reported(self):
+        with unittest.mock.patch('pika.BlockingConnection') as connection_class:
+            connection = connection_class.return_value
+            connection.is_closed = False
+            channel = connection.channel.return_value
+            channel.is_closed = False
+
+            def declare(queue, passive=False, durable=False):
+                if passive and queue == 'Image':
+                    raise pika.exceptions.ChannelClosedByBroker(404, 'NOT_FOUND')
+
+            channel.queue_declare.side_effect = declare
+            with self.assertRaises(MissingQueue):
+                UploadClient().send_job(make_job())
+            self.assertTrue(all(call.kwargs.get('passive') for call in channel.queue_declare.call_args_list))
+            channel.queue_bind.assert_not_called()
+            channel.basic_publish.assert_not_called()
+
+    '''
+        purpose: To verify that a dropped connection is re-established once per job.
+        process: Fails the first publish with a lost stream and lets the retry succeed.
+        validation: Ensures a second connection is opened and the job is reported as sent.
+    '''
+    def test_reconnects_after_lost_connection(self):
+        with unittest.mock.patch('pika.BlockingConnection') as connection_class:
+            connection = connection_class.return_value
+            connection.is_closed = False
+            channel = connection.channel.return_value
+            channel.is_closed = False
+            channel.basic_publish.side_effect = [pika.exceptions.StreamLostError('lost')] + [None] * 4
+            self.assertEqual(UploadClient().send_job(make_job()), 2)
+            self.assertEqual(connection_class.call_count, 2)
+
+    '''
+        purpose: To verify that a job with messages the broker returned is not reported as sent.
+        process: Has the broker return the image when the events after the job are processed, then sends a second job.
+        validation: Ensures the first job raises UnroutableMessages and the next one is sent normally.
+    '''
+    def test_returned_messages_fail_the_job(self):
+        with unittest.mock.patch('pika.BlockingConnection') as connection_class:
+            connection = connection_class.return_value
+            connection.is_closed = False
+            channel = connection.channel.return_value
+            channel.is_closed = False
+            client = UploadClient()
+            method = unittest.mock.Mock(routing_key='.Image.', reply_text='NO_ROUTE')
+
+            def process_data_events(time_limit):
+                # The broker returns the first job's image
+                if connection.process_data_events.call_count == 1:
+                    client._on_return(channel, method, None, b'')
+
+            connection.process_data_events.side_effect = process_data_events
+            with self.assertRaises(UnroutableMessages):
+                client.send_job(make_job('a'))
+            self.assertEqual(client.send_job(make_job('b')), 2)
+
+    '''
+        purpose: To verify that the asyncio API sends jobs through the same blocking client.
+        process: Sends two jobs concurrently through AsyncUploadClient with the connection mocked.
+        validation: Ensures both jobs are sent over a single connection.
+    '''
+    def test_async_client(self):
+        with unittest.mock.patch('pika.BlockingConnection') as connection_class:
+            connection = connection_class.return_value
+            connection.is_closed = False
+            connection.channel.return_value.is_closed = False
+
+            async def scenario():
+                async with AsyncUploadClient() as client:
+                    return await asyncio.gather(client.send_job(make_job('a')), client.send_job(make_job('b')))
+
+            self.assertEqual(asyncio.run(scenario()), [2, 2])
+            connection_class.assert_called_once()
+
+
+class TestTopicRouting(unittest.TestCase):
+    '''
+        purpose: To verify that jobs go through the Topic exchange with the keys the module bindings expect.
+        process: Sends a job with one document and one image.
+        validation: Ensures mandatory publishes to Topic with .Status./.Document./.Image. and no topology changes.
+    '''
+    def test_publishes_through_topic_exchange(self):
+        with unittest.mock.patch('pika.BlockingConnection') as connection_class:
+            connection = connection_class.return_value
+            connection.is_closed = False
+            channel = connection.channel.return_value
+            channel.is_closed = False
+            UploadClient().send_job(make_job())
+        published = [call.kwargs for call in channel.basic_publish.call_args_list]
+        self.assertEqual({message['exchange'] for message in published}, {'Topic'})
+        self.assertTrue(all(message['mandatory'] for message in published))
+        self.assertEqual([message['routing_key'] for message in published],
+                         ['.Status.', '.Document.', '.Status.', '.Image.'])
+        channel.exchange_declare.assert_not_called()
+        channel.queue_bind.assert_not_called()
+
+    '''
+        purpose: To verify that small items take the priority lane and large items and statuses do not.
+        process: Sends a job with a small document and an image one byte over the small item limit.
+        validation: Ensures only the document is published with the small item priority.
+    '''
+    def test_small_items_use_priority_lane(self):
+        job = make_job()
+        job['Images'][0]['Payload'] = b'x' * (SMALL_ITEM_BYTES + 1)
+        with unittest.mock.patch('pika.BlockingConnection') as connection_class:
+            connection = connection_class.return_value
+            connection.is_closed = False
+            channel = connection.channel.return_value
+            channel.is_closed = False
+            UploadClient().send_job(job)
+        priorities = [(call.kwargs['routing_key'], call.kwargs['properties'].priority)
+                      for call in channel.basic_publish.call_args_list]
+        self.assertEqual(priorities, [('.Status.', None), ('.Document.', SMALL_ITEM_PRIORITY),
+                                      ('.Status.', None), ('.Image.', None)])
+
+    '''
+        purpose: To verify that sharded types keep every item of a job on one shard queue.
+        process: Sends jobs with several documents through a client sharding Document over four queues.
+        validation: Ensures each job's documents share one Document-n key and images stay unsharded.
+    '''
+    def test_sharded_job_stays_on_one_queue(self):
+        with unittest.mock.patch('pika.BlockingConnection') as connection_class:
+            connection = connection_class.return_value
+            connection.is_closed = False
+            channel = connection.channel.return_value
+            channel.is_closed = False
+            client = UploadClient(shards={'Document': 4})
+            for i in range(8):
+                channel.basic_publish.reset_mock()
+                client.send_job(make_job(f'job{i}', documents=3))
+                keys = [call.kwargs['routing_key'] for call in channel.basic_publish.call_args_list]
+                document_keys = {key for key in keys if key.startswith('.Document')}
+                self.assertEqual(document_keys, {f'.Document-{shard_index(f"job{i}", 4)}.'})
+                self.assertIn('.Image.', keys)
+
+    '''
+        purpose: To verify that the job hash spreads jobs evenly and moves few jobs when shards are added.
+        process: Hashes 4,000 job ids onto four shards and again onto five.
+        validation: Ensures every shard gets a fair share and only about a fifth of the jobs move.
+    '''
+    def test_shard_index_is_consistent(self):
+        job_ids = [f'job{i}' for i in range(4000)]
+        four = [shard_index(job_id, 4) for job_id in job_ids]
+        five = [shard_index(job_id, 5) for job_id in job_ids]
+        for shard in range(4):
+            self.assertGreater(four.count(shard), 800)
+        moved = sum(1 for a, b in zip(four, five) if a != b)
+        self.assertLess(moved, 1000)
+        self.assertTrue(all(b == 4 for a, b in zip(four, five) if a != b))
+
+
+class TestLazyFiles(unittest.TestCase):
+    '''
+        purpose: To verify that files selected by path are read only when their item is sent.
+        process: Sends a job whose document is given as Path/Size, reading in small chunks.
+        validation: Ensures the published item carries the file bytes, no local fields, and progress covers the file.
+    '''
+    def test_file_read_at_send_time(self):
+        with tempfile.NamedTemporaryFile(suffix='.pdf') as f:
+            f.write(b'x' * 5000)
+            f.flush()
+            job = make_job(images=0)
+            job['Documents'][0] = {'ID': 'job1', 'DocumentId': 'doc0', 'FileName': 'a.pdf', 'Path': f.name,
+                                   'Size': 5000}
+            progress = []
+            with unittest.mock.patch('upload_client.READ_CHUNK_SIZE', 1024):
+                messages = list(job_messages(job, progress.append))
+        item = BSON(messages[1][1]).decode()
+        self.assertEqual(item['Payload'], b'x' * 5000)
+        self.assertNotIn('Path', item)
+        self.assertEqual(sum(progress), 5000)
+        self.assertEqual(len(progress), 5)
+
+    '''
+        purpose: To verify that a cancelled upload stops before publishing the unread item.
+        process: Sets the cancel event before sending a job whose document is a file path.
+        validation: Ensures UploadCancelled is raised and neither the item nor its status is published.
+    '''
+    def test_cancel_stops_before_publishing(self):
+        with tempfile.NamedTemporaryFile() as f, unittest.mock.patch('pika.BlockingConnection') as connection_class:
+            connection = connection_class.return_value
+            connection.is_closed = False
+            channel = connection.channel.return_value
+            channel.is_closed = False
+            job = make_job(images=0)
+            job['Documents'][0] = {'ID': 'job1', 'DocumentId': 'doc0', 'FileName': 'a.pdf', 'Path': f.name, 'Size': 0}
+            cancelled = threading.Event()
+            cancelled.set()
+            with self.assertRaises(UploadCancelled):
+                UploadClient().send_job(job, cancelled=cancelled)
+            channel.basic_publish.assert_not_called()
+
+
+class TestStreaming(unittest.TestCase):
+    '''
+        purpose: To verify that a streamed file is split into chunk messages that reassemble to the file.
+        process: Streams a 10,000 byte file with 4,096 byte chunks and writes each payload at its offset.
+        validation: Ensures one status, three chunks with consistent headers, the original bytes and one item sent.
+    '''
+    def test_file_streamed_in_chunks(self):
+        data = os.urandom(10000)
+        with tempfile.NamedTemporaryFile() as f, unittest.mock.patch('pika.BlockingConnection') as connection_class:
+            f.write(data)
+            f.flush()
+            connection = connection_class.return_value
+            connection.is_closed = False
+            channel = connection.channel.return_value
+            channel.is_closed = False
+            job = make_job(images=0)
+            job['Documents'][0] = {'ID': 'job1', 'DocumentId': 'doc0', 'FileName': 'a.pdf', 'Path': f.name,
+                                   'Size': len(data)}
+            progress = []
+            self.assertEqual(UploadClient(chunk_size=4096).send_job(job, progress.append), 1)
+
+        published = [call.kwargs for call in channel.basic_publish.call_args_list]
+        self.assertEqual([message['routing_key'] for message in published],
+                         ['.Status.', '.Document.', '.Document.', '.Document.'])
+        chunks = [BSON(message['body']).decode() for message in published[1:]]
+        reassembled = bytearray(len(data))
+        for chunk in chunks:
+            self.assertEqual(chunk['Chunk']['Count'], 3)
+            self.assertEqual(chunk['Chunk']['TotalSize'], len(data))
+            offset = chunk['Chunk']['Offset']
+            reassembled[offset:offset + len(chunk['Payload'])] = chunk['Payload']
+        self.assertEqual(bytes(reassembled), data)
+        self.assertEqual(progress, [4096, 4096, 1808])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,323 @@
+import asyncio
+import datetime
+import hashlib
+import logging
+import math
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pika
+from bson import BSON
+
+# Trace headers and the priority lane are shared by every module (DockerFile/common)
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'common'))
+from messaging import message_priority, trace_headers
+
+# Job list key -> (content type, queue)
+CONTENT_QUEUES = {
+    'Documents': ('Document', 'Document'),
+    'Images': ('Image', 'Image'),
+    'Audio': ('Audio', 'Audio'),
+    'Video': ('Video', 'Video')
+}
+# Job list key -> job-level item count field, copied into every item so later stages (e.g. the
+# Store's per-job completion) know how many items of each type the job has
+COUNT_FIELDS = {'Documents': 'NumberOfDocuments', 'Images': 'NumberOfImages', 'Audio': 'NumberOfAudio',
+                'Video': 'NumberOfVideo'}
+DASHBOARD_QUEUE = 'Dashboard'
+# Everything is published through the topic exchange created by Exchange_Set_Up/setup.py; queue X is
+# bound with '#.X.#' and published to with '.X.', except the Dashboard queue which takes '.Status.'
+EXCHANGE = 'Topic'
+STATUS_ROUTE = 'Status'
+# Content id field of each item, in the order they are checked
+CONTENT_ID_FIELDS = ('DocumentId', 'PictureID', 'AudioID', 'VideoID')
+# Item fields describing a local file to be read at send time; they are never published
+LOCAL_FIELDS = ('Path', 'Size')
+READ_CHUNK_SIZE = 1024 * 1024
+# Payload bytes per message when files are streamed as chunks
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class UploadCancelled(Exception):
+    pass
+
+
+class MissingQueue(Exception):
+    pass
+
+
+class UnroutableMessages(Exception):
+    pass
+
+
+def read_payload(path, progress=None, cancelled=None, chunk_size=None):
+    """Read a file chunk by chunk, reporting each chunk's size and stopping once `cancelled` is set."""
+    chunk_size = chunk_size or READ_CHUNK_SIZE
+    chunks = []
+    with open(path, 'rb') as f:
+        while True:
+            if cancelled is not None and cancelled.is_set():
+                raise UploadCancelled()
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            if progress:
+                progress(len(chunk))
+    return b''.join(chunks)
+
+
+def item_body(item, progress=None, cancelled=None):
+    """The item as published, with a lazily selected file ('Path') read into its Payload."""
+    if 'Path' not in item:
+        if progress:
+            progress(len(item.get('Payload') or b''))
+        return item
+    body = {key: value for key, value in item.items() if key not in LOCAL_FIELDS}
+    body['Payload'] = read_payload(item['Path'], progress, cancelled)
+    return body
+
+
+def item_chunks(item, chunk_size, progress=None, cancelled=None):
+    """Encoded chunk messages for an item whose file ('Path') is streamed rather than read whole.
+
+    Each chunk is the item with that slice of the file as its Payload and a 'Chunk' header
+    (Index, Count, Offset, TotalSize), so consumers can write every payload at its offset and
+    finish once Count chunks have arrived. Only one chunk is held at a time; progress is reported
+    after the caller has sent a chunk.
+    """
+    size = os.path.getsize(item['Path'])
+    count = max(1, math.ceil(size / chunk_size))
+    header = {key: value for key, value in item.items() if key not in LOCAL_FIELDS}
+    with open(item['Path'], 'rb') as f:
+        for index in range(count):
+            if cancelled is not None and cancelled.is_set():
+                raise UploadCancelled()
+            payload = f.read(chunk_size)
+            header['Payload'] = payload
+            header['Chunk'] = {'Index': index, 'Count': count, 'Offset': index * chunk_size, 'TotalSize': size}
+            yield BSON.encode(header)
+            if progress:
+                progress(len(payload))
+
+
+def parse_shards(values):
+    """{'Document': 4} from command-line values like ['Document=4']."""
+    shards = {}
+    for value in values or []:
+        queue, _, count = value.partition('=')
+        shards[queue] = int(count)
+    return shards
+
+
+def shard_index(job_id, shards):
+    """Jump consistent hash of a job id onto `shards` buckets.
+
+    Every item of a job lands on the same shard, so one consumer per shard sees a job in order, and
+    growing the shard count moves only the jobs that must move.
+    """
+    key = int.from_bytes(hashlib.sha256(str(job_id).encode()).digest()[:8], 'big')
+    bucket, candidate = -1, 0
+    while candidate < shards:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_queue(queue, job_id, shards=None):
+    """Queue for a job's items: `queue` itself, or `queue`-<n> when the type is split over n shards.
+
+    Shard names use '-' rather than '.', since a '.Document.3.' routing key would also match the
+    '#.Document.#' binding of the unsharded queue.
+    """
+    count = (shards or {}).get(queue)
+    if not count or count < 2:
+        return queue
+    return f"{queue}-{shard_index(job_id, count)}"
+
+
+def routing_key(queue):
+    word = STATUS_ROUTE if queue == DASHBOARD_QUEUE else queue
+    return f".{word}."
+
+
+def job_messages(job, progress=None, cancelled=None, chunk_size=None, shards=None):
+    """(queue, body, headers, priority) for every message of a job: a dashboard status, then the item, per item.
+
+    Items are read and encoded only when reached, so one file's payload is held at a time. With a
+    `chunk_size`, items selected by path are streamed as chunk messages instead (see item_chunks).
+    `shards` ({'Document': 4}) spreads the given types over numbered queues by job id.
+    """
+    # Items per content type in this job, sent with every dashboard message
+    expected = {content_type: len(job.get(key) or []) for key, (content_type, _) in CONTENT_QUEUES.items()}
+    counts = {COUNT_FIELDS[key]: len(job.get(key) or []) for key in CONTENT_QUEUES}
+    sent_at = datetime.datetime.now().strftime('%m/%d/%Y, %I:%M:%S %p')
+
+    for key, (content_type, queue) in CONTENT_QUEUES.items():
+        for item in job.get(key) or []:
+            item_queue = shard_queue(queue, item['ID'], shards)
+            item = {**item, **counts}
+            # One trace per item; the status message is its own hop of the same trace
+            item_headers = trace_headers(None, 'main_server')
+            # Time id_generator spent preparing the job, so it shows up in the item's timeline
+            item_headers['hops'][-1]['prepare_ms'] = job.get('processingTime', 0) * 1000
+            status_headers = trace_headers({'trace_id': item_headers['trace_id']}, 'main_server', kind='status')
+
+            dashboard_message = {
+                'time': sent_at,
+                'job_id': item['ID'],
+                'content_id': next((item[field] for field in CONTENT_ID_FIELDS if item.get(field)), None),
+                'content_type': content_type,
+                'file_name': item['FileName'],
+                'status': 'Processed',
+                'message': f"{content_type} file '{item['FileName']}' successfully sent to {key} queue",
+                # Lets the dashboard track job completion
+                'expected': expected
+            }
+            # Read before the status goes out, so a cancelled read never reports an unsent item
+            if chunk_size and 'Path' in item:
+                chunks = item_chunks(item, chunk_size, progress, cancelled)
+                body = next(chunks)
+            else:
+                chunks = ()
+                body = BSON.encode(item_body(item, progress, cancelled))
+            priority = message_priority(item)
+            yield DASHBOARD_QUEUE, BSON.encode(dashboard_message), status_headers, None
+            yield item_queue, body, item_headers, priority
+            # Every chunk of an item continues the same hop
+            for body in chunks:
+                yield item_queue, body, item_headers, priority
+
+
+class UploadClient:
+    """Publishes jobs through the Topic exchange over one long-lived connection.
+
+    Queues are never declared here: Exchange_Set_Up/setup.py owns the topology, and the client only
+    checks that the queues it needs exist, caching the checks for its lifetime. A job's messages are
+    written back to back without waiting on the broker in between. A dropped connection is
+    re-established once per message before the error is raised.
+
+    With a `chunk_size`, files selected by path are streamed in chunks of that size, keeping memory
+    use bounded by the chunk size whatever the file sizes or number of items. With `shards`
+    ({'Document': 4}), those types are spread over Document-0..3 by job id.
+    """
+
+    def __init__(self, host='localhost', heartbeat=60, chunk_size=None, shards=None):
+        self.parameters = pika.ConnectionParameters(host, heartbeat=heartbeat)
+        self.chunk_size = chunk_size
+        self.shards = shards or {}
+        self.connection = None
+        self.channel = None
+        self.declared = set()
+        self.unroutable = 0
+
+    def _channel(self):
+        if self.connection is None or self.connection.is_closed:
+            self.connection = pika.BlockingConnection(self.parameters)
+            self.channel = None
+        if self.channel is None or self.channel.is_closed:
+            self.channel = self.connection.channel()
+            # Messages are published as mandatory, so a missing binding is reported instead of dropped
+            self.channel.add_on_return_callback(self._on_return)
+        return self.channel
+
+    def _on_return(self, channel, method, properties, body):
+        self.unroutable += 1
+        logging.error(f"Message to {method.routing_key} was not routed to any queue: {method.reply_text}")
+
+    def ensure_queue(self, queue_name):
+        if queue_name in self.declared:
+            return
+        try:
+            self._channel().queue_declare(queue=queue_name, passive=True)
+        except pika.exceptions.ChannelClosedByBroker as e:
+            # The broker closes the channel (not the connection) for a missing queue
+            raise MissingQueue(
+                f"Queue {queue_name} does not exist ({e.reply_text}); add it to Exchange_Set_Up/topology.json "
+                f"and run Exchange_Set_Up/setup.py"
+            ) from e
+        self.declared.add(queue_name)
+
+    def _publish(self, queue, body, headers, priority=None):
+        for attempt in (1, 2):
+            try:
+                self._channel().basic_publish(
+                    exchange=EXCHANGE,
+                    routing_key=routing_key(queue),
+                    body=body,
+                    properties=pika.BasicProperties(delivery_mode=2, headers=headers, priority=priority),
+                    mandatory=True
+                )
+                return
+            except (pika.exceptions.AMQPConnectionError, pika.exceptions.StreamLostError) as e:
+                self.connection = self.channel = None
+                if attempt == 2:
+                    raise
+                logging.warning(f"RabbitMQ connection lost ({e}), reconnecting")
+
+    def send_job(self, job, progress=None, cancelled=None):
+        """Publish every item of `job` and its dashboard statuses; returns the number of items sent.
+
+        Raises UnroutableMessages if the broker returned any of the job's messages (no queue bound
+        for their routing key), as those were never delivered. `progress` is called with the size of each chunk of payload streamed into the upload, and
+        `cancelled` (a threading.Event) stops the upload between chunks with UploadCancelled.
+        Items published before a cancellation stay published.
+        """
+        queues = {shard_queue(queue, item['ID'], self.shards)
+                  for key, (_, queue) in CONTENT_QUEUES.items() for item in job.get(key) or []}
+        for queue in queues | {DASHBOARD_QUEUE}:
+            self.ensure_queue(queue)
+        sent = 0
+        for queue, body, headers, priority in job_messages(job, progress, cancelled, self.chunk_size, self.shards):
+            self._publish(queue, body, headers, priority)
+            # One dashboard status per item, however many chunks the item takes
+            sent += queue == DASHBOARD_QUEUE
+        # The broker answers in order on a channel, so once this round trip completes every return of
+        # the job's messages has arrived; dispatching them surfaces broker errors before reporting
+        unroutable = self.unroutable
+        self._channel().queue_declare(queue=DASHBOARD_QUEUE, passive=True)
+        self.connection.process_data_events(time_limit=0)
+        returned = self.unroutable - unroutable
+        if returned:
+            raise UnroutableMessages(f"{returned} messages of job {job.get('ID')} were not routed to any queue")
+        return sent
+
+    def close(self):
+        if self.connection is not None and self.connection.is_open:
+            self.connection.close()
+        self.connection = self.channel = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncUploadClient:
+    """asyncio front end for UploadClient.
+
+    pika's blocking connection is not thread-safe, so every call runs on one dedicated worker thread.
+    """
+
+    def __init__(self, host='localhost', heartbeat=60, chunk_size=None, shards=None):
+        self.client = UploadClient(host, heartbeat, chunk_size, shards)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='upload-client')
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def send_job(self, job, progress=None, cancelled=None):
+        return await self._run(self.client.send_job, job, progress, cancelled)
+
+    async def close(self):
+        await self._run(self.client.close)
+        self.executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -2,8 +2,13 @@ import socket
 import bson  # Binary JSON format
 import threading  # For handling multiple clients concurrently
 import pika  # RabbitMQ client library
+import os
+import sys
 from pika.exchange_type import ExchangeType
 from copy import deepcopy  # Import deepcopy if you need a deep copy
+# Trace headers and the priority lane are shared by every module (DockerFile/common)
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'common'))
+from messaging import trace_headers
 
 def recvall(sock, expected_length):
     data = b''
@@ -36,6 +41,7 @@ def handle_client(client):
 
 # Function to publish messages to RabbitMQ
 def publish_to_rabbitmq(routing_key, message):
+    status_headers = trace_headers(None, 'metadata', kind='status')
     try:
         # Establish a connection to the RabbitMQ server
         connection_parameters = pika.ConnectionParameters('localhost')
@@ -69,7 +75,8 @@ def publish_to_rabbitmq(routing_key, message):
         channel.basic_publish(
             exchange="Topic",
             routing_key=".Status.",
-            body=status_message
+            body=status_message,
+            properties=pika.BasicProperties(headers=status_headers)
         )
 
     except Exception as e:
@@ -92,7 +99,8 @@ def publish_to_rabbitmq(routing_key, message):
         channel.basic_publish(
             exchange="Topic",
             routing_key=".Status.",
-            body= status_message
+            body= status_message,
+            properties=pika.BasicProperties(headers=status_headers)
         )
     # Close the connection to RabbitMQ
     connection.close()
@@ -2,8 +2,16 @@ import socket
 import bson  # Binary JSON format
 import threading  # For handling multiple clients concurrently
 import pika  # RabbitMQ client library
+import os
+import sys
+import time
+import heapq
+import itertools
 from pika.exchange_type import ExchangeType
 from copy import deepcopy  # Import deepcopy if you need a deep copy
+# Trace headers and the priority lane are shared by every module (DockerFile/common)
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'common'))
+from messaging import trace_headers, message_priority
 
 def recvall(sock, expected_length):
     data = b''
@@ -52,8 +60,99 @@ def parse_bson_obj(obj):
         else:
             print(f"No {data_type.lower()} to send")
 
+# Failed publishes are retried after RETRY_DELAY, RETRY_DELAY * RETRY_MULTIPLIER, ... seconds,
+# the same backoff as the delay queues in Exchange_Set_Up/topology.json
+RETRY_ATTEMPTS = 3
+RETRY_DELAY = 1.0
+RETRY_MULTIPLIER = 5
+
+def dead_letter(routing_key, message, attempts, error):
+    """Publish an item that could not be published to the DeadLetter exchange, for dead_letters.py."""
+    headers = {
+        'x-retry-attempt': attempts,
+        'x-last-error': str(error)[:1000],
+        'x-original-exchange': 'Topic',
+        'x-original-routing-key': routing_key,
+        'x-original-queue': routing_key.strip('.')
+    }
+    try:
+        connection = pika.BlockingConnection(pika.ConnectionParameters('localhost'))
+        try:
+            connection.channel().basic_publish(
+                exchange='DeadLetter',
+                routing_key=routing_key.strip('.'),
+                body=bson.dumps(message),
+                properties=pika.BasicProperties(delivery_mode=2, headers=headers)
+            )
+        finally:
+            connection.close()
+    except Exception as e:
+        print(f"Could not dead-letter {message.get('FileName')}, dropping it: {e}")
+
+class RetryScheduler:
+    """Re-publishes items whose publish failed, with exponential backoff, on its own thread.
+
+    The parser has no delivery to nack, so the delay is kept here instead of in a delay queue;
+    handle_client never waits for it. An item that fails RETRY_ATTEMPTS retries is dead-lettered.
+    When the item was published but its status message was not, only the status is retried.
+    """
+
+    def __init__(self, publish, attempts=RETRY_ATTEMPTS, delay=RETRY_DELAY, multiplier=RETRY_MULTIPLIER):
+        self.publish = publish
+        self.attempts = attempts
+        self.delay = delay
+        self.multiplier = multiplier
+        # (due, sequence, routing_key, message, attempt, status_headers)
+        self.pending = []
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def schedule(self, routing_key, message, attempt, error, status_headers=None):
+        """Queue retry `attempt` of an item (or dead-letter it); returns (status, what happened) for its status.
+
+        Only a dead-lettered item is reported as failed: the dashboard counts every failed status
+        against the job, and an item being retried may still be published.
+
+        With `status_headers`, the item itself was published and only its status message is retried,
+        under those headers; after the last retry that status is dropped, not the item dead-lettered.
+        """
+        if attempt > self.attempts:
+            if status_headers is not None:
+                print(f"Dropping the status of {message.get('FileName')} after {self.attempts} retries: {error}")
+                return 'Preprocessed Successfully', f"status dropped after {self.attempts} retries"
+            dead_letter(routing_key, message, attempt - 1, error)
+            return 'Preprocessing Failed', f"moved to the dead-letter queue after {self.attempts} retries"
+        delay = self.delay * self.multiplier ** (attempt - 1)
+        with self.condition:
+            heapq.heappush(self.pending, (time.monotonic() + delay, next(self.sequence), routing_key, message, attempt,
+                                          status_headers))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='parser-retry', daemon=True)
+                self.thread.start()
+            self.condition.notify()
+        return 'Retrying', f"retry {attempt} of {self.attempts} in {delay:g}s"
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.pending or self.pending[0][0] > time.monotonic():
+                    self.condition.wait(self.pending[0][0] - time.monotonic() if self.pending else None)
+                _, _, routing_key, message, attempt, status_headers = heapq.heappop(self.pending)
+            self.publish(routing_key, message, attempt, status_headers)
+
 # Function to publish messages to RabbitMQ
-def publish_to_rabbitmq(routing_key, message):
+def publish_to_rabbitmq(routing_key, message, attempt=0, status_headers=None):
+    # With status_headers, an earlier attempt published the item and only its status is left to publish
+    status_only = status_headers is not None
+    if not status_only:
+        # Each item starts its trace here; its status message is a separate hop of the same trace
+        item_headers = trace_headers(None, 'parser')
+        status_headers = trace_headers({'trace_id': item_headers['trace_id']}, 'parser', kind='status')
+    # The item as received; message is replaced by its encoding below
+    item = message
+    connection = channel = None
+    published = status_only
     try:
         # Establish a connection to the RabbitMQ server
         connection_parameters = pika.ConnectionParameters('localhost')
@@ -64,15 +163,17 @@ def publish_to_rabbitmq(routing_key, message):
 
         #prepping status message
         status_message = message.copy()
-        del status_message['Payload'] #remove payload from status message
+        status_message.pop('Payload', None) #remove payload from status message
         status_message['Status'] = 'Preprocessed Successfully' 
         status_message['Message'] = 'Message has been preprocessed and sent to the respective queues' 
 
         
         status_message=bson.dumps(status_message)
 
-        # Serialize the message to BSON
-        message = bson.dumps(message)
+        if not status_only:
+            priority = message_priority(message)
+            # Serialize the message to BSON
+            message = bson.dumps(message)
 
         '''
             Sample message  to be sent to the respective queues
@@ -85,11 +186,14 @@ def publish_to_rabbitmq(routing_key, message):
             }
         '''
         # Publish the message to the specified routing key
-        channel.basic_publish(
-            exchange="Topic",
-            routing_key=routing_key,
-            body=message
-        )
+        if not status_only:
+            channel.basic_publish(
+                exchange="Topic",
+                routing_key=routing_key,
+                body=message,
+                properties=pika.BasicProperties(headers=item_headers, priority=priority)
+            )
+            published = True
         '''
         This will be sent to the dashboard
             {
@@ -105,10 +209,18 @@ def publish_to_rabbitmq(routing_key, message):
         channel.basic_publish(
             exchange="Topic",
             routing_key=".Status.",
-            body=status_message
+            body=status_message,
+            properties=pika.BasicProperties(headers=status_headers)
         )
 
     except Exception as e:
+        if published:
+            # The item is on its way; retrying all of it would publish it twice. The status is
+            # retried without its payload, which the scheduler need not hold on to.
+            print(f"Publishing the status of {item.get('FileName')} failed: {e}")
+            header = {key: value for key, value in item.items() if key != 'Payload'}
+            retry_scheduler.schedule(routing_key, header, attempt + 1, e, status_headers)
+            return
         '''
         This will be sent to the dashboard
             {
@@ -120,18 +232,28 @@ def publish_to_rabbitmq(routing_key, message):
                 "Message": "String"
             }
         '''
-        status_message = message.copy()
-        del status_message['Payload']
-        status_message['Status'] = 'Preprocessing Failed'
-        status_message['Message'] = e
+        print(f"Publishing {item.get('FileName')} to {routing_key} failed: {e}")
+        status, outcome = retry_scheduler.schedule(routing_key, item, attempt + 1, e)
+        status_message = {key: value for key, value in item.items() if key != 'Payload'}
+        status_message['Status'] = status
+        status_message['Message'] = f"{e} ({outcome})"
         status_message=bson.dumps(status_message)
-        channel.basic_publish(
-            exchange="Topic",
-            routing_key=".Status.",
-            body= status_message
-        )
-    # Close the connection to RabbitMQ
-    connection.close()
+        try:
+            if channel is not None and channel.is_open:
+                channel.basic_publish(
+                    exchange="Topic",
+                    routing_key=".Status.",
+                    body= status_message,
+                    properties=pika.BasicProperties(headers=status_headers)
+                )
+        except Exception as status_error:
+            print(f"Could not report the failure to the dashboard: {status_error}")
+    finally:
+        # Close the connection to RabbitMQ
+        if connection is not None and connection.is_open:
+            connection.close()
+
+retry_scheduler = RetryScheduler(publish_to_rabbitmq)
 
 # Function to start a socket server and listen for incoming BSON objects
 def receive_bson_obj():
@@ -4,8 +4,9 @@ import bson
 import socket
 import os
 import sys
+import threading
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
-from parse import handle_client, parse_bson_obj, publish_to_rabbitmq, receive_bson_obj
+from parse import handle_client, parse_bson_obj, publish_to_rabbitmq, receive_bson_obj, RetryScheduler
 
 class TestParseFunctions(unittest.TestCase):
     def setUp(self):
@@ -89,9 +90,37 @@ class TestParseFunctions(unittest.TestCase):
       mock_channel.basic_publish.side_effect = Exception
       with unittest.mock.patch('pika.BlockingConnection', return_value=mock_connection), \
         unittest.mock.patch.object(mock_connection, 'channel', return_value=mock_channel), \
-        unittest.mock.patch.object(mock_connection, 'close'):
-        with self.assertRaises(Exception):
-          publish_to_rabbitmq('.Document.', self.obj['Documents'][0])
+        unittest.mock.patch.object(mock_connection, 'close'), \
+        unittest.mock.patch('parse.retry_scheduler') as mock_retry_scheduler:
+        mock_retry_scheduler.schedule.return_value = ('Retrying', 'retry 1 of 3 in 1s')
+        publish_to_rabbitmq('.Document.', self.obj['Documents'][0])
+        mock_retry_scheduler.schedule.assert_called_once()
+        self.assertEqual(mock_retry_scheduler.schedule.call_args.args[:3], ('.Document.', self.obj['Documents'][0], 1))
+
+    '''
+      - Purpose: To verify that a failed status publish after a successful item publish does not publish the item again.
+      - Process: Mocks the channel so the item publish succeeds and the status publish fails, with the retry scheduler mocked.
+      - Validation: Ensures only the status is scheduled for a retry, without the payload and with the status headers of the item's trace.
+    '''
+    def test_publish_to_rabbitmq_status_failure_retries_status_only(self):
+      mock_connection = unittest.mock.Mock()
+      mock_channel = unittest.mock.Mock()
+      mock_channel.basic_publish.side_effect = [None, Exception]
+      with unittest.mock.patch('pika.BlockingConnection', return_value=mock_connection), \
+        unittest.mock.patch.object(mock_connection, 'channel', return_value=mock_channel), \
+        unittest.mock.patch('parse.retry_scheduler') as mock_retry_scheduler:
+        publish_to_rabbitmq('.Document.', self.obj['Documents'][0])
+        self.assertEqual(mock_channel.basic_publish.call_count, 2)
+        routing_key, message, attempt, _, status_headers = mock_retry_scheduler.schedule.call_args.args
+        self.assertEqual((routing_key, attempt), ('.Document.', 1))
+        self.assertNotIn('Payload', message)
+        item_headers = mock_channel.basic_publish.call_args_list[0].kwargs['properties'].headers
+        self.assertEqual(status_headers['trace_id'], item_headers['trace_id'])
+
+        mock_channel.basic_publish.reset_mock(side_effect=True)
+        publish_to_rabbitmq(routing_key, message, attempt, status_headers)
+        mock_channel.basic_publish.assert_called_once()
+        self.assertEqual(mock_channel.basic_publish.call_args.kwargs['routing_key'], '.Status.')
           
     '''
       - Purpose: To verify that the handle_client function correctly handles exceptions.
@@ -109,5 +138,44 @@ class TestParseFunctions(unittest.TestCase):
             unittest.mock.patch('threading.Thread.start') as mock_start:
             receive_bson_obj()  
           
+class TestRetryScheduler(unittest.TestCase):
+    '''
+      - Purpose: To verify that failed publishes are retried in the background and dead-lettered after the last retry.
+      - Process: Schedules retries with a tiny delay whose publish always fails again, with dead_letter mocked.
+      - Validation: Ensures schedule returns at once with a 'Retrying' status, every retry runs with its attempt number and the item is dead-lettered once, reported as failed.
+    '''
+    def test_retries_then_dead_letters(self):
+      attempts = []
+      done = threading.Event()
+
+      def publish(routing_key, message, attempt, status_headers=None):
+        attempts.append(attempt)
+        status, _ = scheduler.schedule(routing_key, message, attempt + 1, Exception('broker down'))
+        if status == 'Preprocessing Failed':
+          done.set()
+
+      scheduler = RetryScheduler(publish, attempts=3, delay=0.001, multiplier=2)
+      item = {'FileName': 'a.pdf', 'Payload': b'x'}
+      with unittest.mock.patch('parse.dead_letter') as mock_dead_letter:
+        self.assertEqual(scheduler.schedule('.Document.', item, 1, Exception('broker down')),
+                         ('Retrying', 'retry 1 of 3 in 0.001s'))
+        self.assertTrue(done.wait(5))
+        self.assertEqual(attempts, [1, 2, 3])
+        mock_dead_letter.assert_called_once()
+        self.assertEqual(mock_dead_letter.call_args.args[:3], ('.Document.', item, 3))
+
+    '''
+      - Purpose: To verify that a status message that cannot be published is dropped, not dead-lettered, after the last retry.
+      - Process: Schedules a status-only retry past the last attempt, with dead_letter mocked.
+      - Validation: Ensures nothing is dead-lettered or queued and the item is still reported as preprocessed.
+    '''
+    def test_status_retries_are_dropped(self):
+      scheduler = RetryScheduler(unittest.mock.Mock(), attempts=3)
+      with unittest.mock.patch('parse.dead_letter') as mock_dead_letter:
+        status, _ = scheduler.schedule('.Document.', {'FileName': 'a.pdf'}, 4, Exception('broker down'), {'trace_id': 't'})
+        self.assertEqual(status, 'Preprocessed Successfully')
+        mock_dead_letter.assert_not_called()
+        self.assertEqual(scheduler.pending, [])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
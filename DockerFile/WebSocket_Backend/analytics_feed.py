@@ -0,0 +1,108 @@
+import asyncio
+
+import websockets
+
+from wire_format import FrameEncoder
+
+
+def diff_analytics(old, new):
+    """Return the parts of `new` that differ from `old` (nested dicts are diffed, other values replaced)."""
+    if old is None:
+        return new
+    delta = {}
+    for key, value in new.items():
+        previous = old.get(key)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            nested = diff_analytics(previous, value)
+            if nested:
+                delta[key] = nested
+        elif value != previous:
+            delta[key] = value
+    return delta
+
+
+def select_fields(data, fields):
+    """Keep only the dotted field paths in `fields`; an empty selection keeps everything."""
+    if not fields:
+        return data
+    selected = {}
+    for path in fields:
+        keys = path.split('.')
+        value = data
+        for key in keys:
+            if not isinstance(value, dict) or key not in value:
+                break
+            value = value[key]
+        else:
+            target = selected
+            for key in keys[:-1]:
+                target = target.setdefault(key, {})
+            target[keys[-1]] = value
+    return selected
+
+
+class AnalyticsFeed:
+    """Pushes one shared analytics snapshot per tick to every subscribed client."""
+
+    def __init__(self, compute_snapshot, interval=5.0, encoder=None):
+        self.compute_snapshot = compute_snapshot
+        self.interval = interval
+        self.encoder = encoder or FrameEncoder()
+        # websocket -> tuple of dotted field paths (empty tuple means all fields)
+        self.subscribers = {}
+        self.last_snapshot = None
+
+    async def subscribe(self, websocket, fields=None):
+        fields = tuple(fields or ())
+        self.subscribers[websocket] = fields
+        if self.last_snapshot is None:
+            self.last_snapshot = await self.compute_snapshot()
+
+        # New subscribers start from the current shared snapshot, then receive the per-tick deltas
+        await websocket.send(self.encoder.encode_for(websocket, {
+            'type': 'analytics',
+            'data': select_fields(self.last_snapshot, fields)
+        }))
+
+    def unsubscribe(self, websocket):
+        self.subscribers.pop(websocket, None)
+
+    async def tick(self):
+        if not self.subscribers:
+            # Nobody is listening; the next subscriber computes a fresh snapshot
+            self.last_snapshot = None
+            return
+
+        snapshot = await self.compute_snapshot()
+        delta = diff_analytics(self.last_snapshot, snapshot)
+        self.last_snapshot = snapshot
+        if not delta:
+            return
+
+        # Serialise once per distinct field selection and encoding, not once per subscriber
+        frames = {}
+        for websocket, fields in list(self.subscribers.items()):
+            if fields not in frames:
+                selected = select_fields(delta, fields)
+                frames[fields] = ({'type': 'analyticsDelta', 'data': selected}, {}) if selected else None
+            if frames[fields] is None:
+                continue
+            message, cache = frames[fields]
+            try:
+                await websocket.send(self.encoder.encode_for(websocket, message, cache))
+            except websockets.ConnectionClosed:
+                self.unsubscribe(websocket)
+            except Exception as e:
+                print(f"Error pushing analytics to client: {e}")
+                self.unsubscribe(websocket)
+
+    async def run(self):
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                try:
+                    await self.tick()
+                except Exception as e:
+                    print(f"Error computing analytics tick: {e}")
+        except asyncio.CancelledError:
+            pass
@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pika
+
+# Seconds to wait before reconnecting after the broker connection drops
+RECONNECT_DELAY = 5
+
+
+class DashboardConsumer(threading.Thread):
+    """Consumes a RabbitMQ queue on a dedicated thread and hands raw deliveries to the event loop.
+
+    The callback only enqueues (channel, delivery_tag, body); decoding, persistence and broadcast
+    run as asyncio stages. Messages are acked once persisted, so the broker's prefetch limit is the
+    backpressure: at most `prefetch` unacked deliveries are ever held in this process.
+    """
+
+    def __init__(self, loop, handoff_queue, queue_name='Dashboard', host='localhost', prefetch=100):
+        super().__init__(name=f'{queue_name}-consumer', daemon=True)
+        self.loop = loop
+        self.handoff_queue = handoff_queue
+        self.queue_name = queue_name
+        self.host = host
+        self.prefetch = prefetch
+        self.connection = None
+        self.channel = None
+        self._stopping = threading.Event()
+
+    def run(self):
+        while not self._stopping.is_set():
+            try:
+                self.connection = pika.BlockingConnection(pika.ConnectionParameters(self.host))
+                self.channel = self.connection.channel()
+                # Passive: the queue and its arguments are owned by Exchange_Set_Up/topology.json
+                self.channel.queue_declare(queue=self.queue_name, passive=True)
+                self.channel.basic_qos(prefetch_count=self.prefetch)
+                self.channel.basic_consume(
+                    queue=self.queue_name,
+                    on_message_callback=self._on_message,
+                    auto_ack=False
+                )
+                print(f"Consuming '{self.queue_name}' with prefetch {self.prefetch}")
+                self.channel.start_consuming()
+            except Exception as e:
+                if self._stopping.is_set():
+                    break
+                print(f"Error in RabbitMQ consumer, reconnecting in {RECONNECT_DELAY}s: {e}")
+                time.sleep(RECONNECT_DELAY)
+
+    def _on_message(self, channel, method, properties, body):
+        # Trace context from the publishers, stamped with when this hop was dequeued
+        headers = properties.headers or {}
+        trace = None
+        if headers.get('trace_id'):
+            trace = {'trace_id': headers['trace_id'], 'hops': headers.get('hops') or [], 'received': time.time()}
+        self.loop.call_soon_threadsafe(self.handoff_queue.put_nowait, (channel, method.delivery_tag, body, trace))
+
+    def _run_on_channel(self, channel, action):
+        # pika channels are not thread safe; schedule the action on the consumer thread
+        def callback():
+            if channel.is_open:
+                action()
+        try:
+            channel.connection.add_callback_threadsafe(callback)
+        except Exception as e:
+            # The connection is gone; the broker will redeliver anything left unacked
+            print(f"Could not schedule ack on closed connection: {e}")
+
+    def ack(self, channel, delivery_tag, multiple=False):
+        self._run_on_channel(channel, lambda: channel.basic_ack(delivery_tag=delivery_tag, multiple=multiple))
+
+    def nack(self, channel, delivery_tag, multiple=False, requeue=True):
+        self._run_on_channel(
+            channel,
+            lambda: channel.basic_nack(delivery_tag=delivery_tag, multiple=multiple, requeue=requeue)
+        )
+
+    def stop(self):
+        self._stopping.set()
+        if self.channel is not None:
+            self._run_on_channel(self.channel, self.channel.stop_consuming)
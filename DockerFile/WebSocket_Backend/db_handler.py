@@ -1,10 +1,22 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import OperationFailure
 from bson import BSON
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
+from status_record import StatusRecord, format_time
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Raw status rows are removed by MongoDB's TTL monitor this long after they were processed
+RETENTION_DAYS = 7
+# Per-minute rollups outlive the raw rows; per-hour rollups are kept indefinitely
+MINUTE_ROLLUP_RETENTION_DAYS = 90
+# Minutes younger than this are not rolled up yet, so batches still being inserted are not missed
+ROLLUP_LAG = timedelta(seconds=30)
+# Items of these content types end at a storage stage that reports 'Stored'; the other types have
+# no stage past their queue, so main_server's 'Processed' (sent to the queue) is their last status
+STORED_TYPES = ('Document', 'Image')
+
 
 def _is_valid_document(document):
     """Check if document has valid data."""
@@ -16,7 +28,13 @@ def _is_valid_document(document):
 
 
 class DBHandler:
-    def __init__(self):
+    def __init__(self, retention_days=RETENTION_DAYS, manage_ttl=False, shorten_ttl=False):
+        # Only the dashboard server manages the TTL indexes (manage_ttl); tools such as retention.py
+        # read the retention in effect from the index instead of imposing their own
+        self.retention_days = retention_days
+        self.manage_ttl = manage_ttl
+        # A TTL is only ever lengthened, unless the operator explicitly asked to shorten it
+        self.shorten_ttl = shorten_ttl
         self.client = None
         self.db = None
         self.collection = None
@@ -29,65 +47,192 @@ class DBHandler:
             self.db = self.client['dashboard_db']
             self.collection = self.db['messages']
             logging.info("Connected to MongoDB successfully")
+            self.ensure_indexes()
         except Exception as e:
             logging.error(f"Failed to connect to MongoDB: {e}")
             raise
 
+    def ensure_indexes(self):
+        """Create the indexes used by history loads and analytics (no-op if they exist)."""
+        self.collection.create_index([("time", DESCENDING)], name="time_desc")
+        self.collection.create_index([("job_id", ASCENDING)], name="job_id")
+        self.collection.create_index([("content_id", ASCENDING)], name="content_id")
+        self.collection.create_index([("status", ASCENDING), ("content_type", ASCENDING)],
+                                     name="status_content_type")
+        self.collection.create_index([("seq", DESCENDING)], name="seq_desc", sparse=True)
+        if self.manage_ttl:
+            self._ensure_ttl_index(self.collection, "processed_time", self.retention_days)
+            self._ensure_ttl_index(self.db['rollup_minute'], "bucket", MINUTE_ROLLUP_RETENTION_DAYS)
+        # What is archived follows the TTL actually in effect, which another instance may have set
+        seconds = self._ttl_seconds(self.collection, "processed_time")
+        if seconds is not None:
+            self.retention_days = seconds / (24 * 3600)
+        self.db['rollup_hour'].create_index([("bucket", ASCENDING)], name="bucket")
+        logging.info("MongoDB indexes ensured")
+
+    @staticmethod
+    def _ttl_seconds(collection, field):
+        """expireAfterSeconds of the TTL index on `field`, or None if there is none."""
+        index = collection.index_information().get(f"{field}_ttl")
+        return index.get('expireAfterSeconds') if index else None
+
+    def _ensure_ttl_index(self, collection, field, days):
+        name = f"{field}_ttl"
+        seconds = int(days * 24 * 3600)
+        current = self._ttl_seconds(collection, field)
+        if current is None:
+            try:
+                collection.create_index([(field, ASCENDING)], name=name, expireAfterSeconds=seconds)
+                return
+            except OperationFailure:
+                # Another instance created it in the meantime
+                current = self._ttl_seconds(collection, field)
+        if current == seconds:
+            return
+        if current is not None and current > seconds and not self.shorten_ttl:
+            # Expired rows are gone for good; an instance started with a shorter (or the default)
+            # retention must not cut the history the index is configured to keep
+            logging.warning(f"Keeping the {current / (24 * 3600):g}-day TTL on {collection.name}.{field}; "
+                            f"pass --shorten-retention to lower it to {days:g} days")
+            return
+        self.db.command('collMod', collection.name, index={'name': name, 'expireAfterSeconds': seconds})
+
+    def _build_document(self, message, processed_time=None):
+        """Map an incoming status message onto the stored document layout."""
+        # If message is BSON, decode it
+        if isinstance(message, bytes):
+            message = BSON(message).decode()
+
+        processed_time = processed_time or datetime.now()
+        message['processed_time'] = format_time(processed_time)
+        return StatusRecord.from_message(message).to_document(processed_time)
+
     def save_message_to_db(self, message):
-        """Save a message to the database."""
+        """Save a message to the database and return the stored document (None if skipped)."""
         try:
             # Debug log the incoming message
             logging.info(f"Attempting to save message: {message}")
 
-            # If message is BSON, decode it
-            if isinstance(message, bytes):
-                message = BSON(message).decode()
-
-            message['processed_time'] = datetime.now().strftime('%m/%d/%Y, %I:%M:%S %p')
-
-            # Extract or generate the timestamp
-            timestamp = message.get('time')
-            if not timestamp:
-                timestamp = datetime.now().strftime('%m/%d/%Y, %I:%M:%S %p')
-
-            # Create document with proper field mapping
-            document = {
-                "time": timestamp,
-                "processed_time": message.get('processed_time'),
-                "job_id": message.get('job_id') or message.get('ID', 'Unknown JobID'),
-                "content_id": (message.get('content_id') or
-                               message.get('DocumentId') or
-                               message.get('PictureID') or
-                               message.get('AudioID', 'Unknown ContentID')),
-                "content_type": message.get('content_type') or self._determine_content_type(message),
-                "file_name": message.get('file_name') or message.get('FileName', 'Unknown File'),
-                "status": message.get('status', 'Processed'),
-                "message": message.get('message', 'No additional information')
-            }
+            document = self._build_document(message)
 
             # Only save if we have valid data
             if _is_valid_document(document):
                 self.collection.insert_one(document)
                 logging.info(f"Successfully saved message to MongoDB: {document}")
-            else:
-                logging.warning(f"Skipping invalid document: {document}")
+                self.update_jobs([document])
+                return document
+            logging.warning(f"Skipping invalid document: {document}")
+            return None
 
         except Exception as e:
             logging.error(f"Failed to save message to MongoDB: {e}")
             raise
 
-    def _determine_content_type(self, message):
-        """Determine content type from message structure."""
-        if 'DocumentId' in message:
-            return 'Document'
-        elif 'PictureID' in message:
-            return 'Picture'
-        elif 'AudioID' in message:
-            return 'Audio'
-        return message.get('content_type', 'Unknown Type')
-
-    def load_messages(self):
-        """Load messages from the database."""
+    def save_messages_to_db(self, messages):
+        """Save a batch of messages in one round trip; returns one stored document (or None) per message."""
+        try:
+            # One processing timestamp for the whole batch
+            processed_time = datetime.now()
+            documents = [self._build_document(message, processed_time) for message in messages]
+            documents = [document if _is_valid_document(document) else None for document in documents]
+            valid = [document for document in documents if document is not None]
+            if len(valid) < len(documents):
+                logging.warning(f"Skipping {len(documents) - len(valid)} invalid documents")
+            if valid:
+                self.collection.insert_many(valid, ordered=False)
+                logging.info(f"Saved batch of {len(valid)} messages to MongoDB")
+                self.update_jobs(valid)
+            return documents
+        except Exception as e:
+            logging.error(f"Failed to save message batch to MongoDB: {e}")
+            raise
+
+    def update_jobs(self, documents):
+        """Fold stored status documents into their `jobs` rows with one atomic upsert per job.
+
+        'Processed' counts an item sent to its queue by main_server, and an item is completed by the
+        last stage of its content type ('Stored', see STORED_TYPES), counted per type. Any status
+        containing 'fail' marks a failed item; 'Job Stored' marks the whole job as written by the
+        Store stage. Every other status only counts as a message.
+        """
+        updates = {}
+        for document in documents:
+            job_id = document['job_id']
+            if job_id == 'Unknown JobID':
+                continue
+            update = updates.setdefault(job_id, {'$inc': {}, '$min': {}, '$max': {}, '$set': {}})
+            increments = update['$inc']
+
+            def inc(field, amount=1):
+                increments[field] = increments.get(field, 0) + amount
+
+            status = str(document['status'])
+            content_type = 'Image' if document['content_type'] == 'Picture' else document['content_type']
+            inc('messages')
+            inc(f'by_type.{content_type}')
+            if 'fail' in status.lower():
+                inc('items_failed')
+            elif status == 'Processed':
+                inc('items_sent')
+                if content_type not in STORED_TYPES:
+                    inc(f'completed.{content_type}')
+            elif status == 'Stored':
+                inc(f'completed.{content_type}')
+            elif status == 'Job Stored':
+                update['$set']['stored'] = True
+
+            time, processed_time = document['time'], document['processed_time']
+            update['$min']['first_time'] = min(time, update['$min'].get('first_time', time))
+            update['$max']['last_time'] = max(processed_time, update['$max'].get('last_time', processed_time))
+            latency_ms = max(0.0, (processed_time - time).total_seconds() * 1000)
+            inc('latency_ms_sum', latency_ms)
+            update['$max']['latency_ms_max'] = max(latency_ms, update['$max'].get('latency_ms_max', 0.0))
+
+            update['$set'].update(last_status=status, updated_at=processed_time)
+            if document.get('expected'):
+                update['$set'].update(expected=document['expected'],
+                                      expected_total=sum(document['expected'].values()))
+
+        if not updates:
+            return
+        try:
+            self.db['jobs'].bulk_write(
+                [UpdateOne({'_id': job_id}, update, upsert=True) for job_id, update in updates.items()],
+                ordered=False
+            )
+        except Exception as e:
+            # Job rows are derived data; the status messages themselves are already stored
+            logging.error(f"Failed to update job progress: {e}")
+
+    def get_jobs(self, job_ids):
+        """Load `jobs` rows by job id (one indexed lookup per job)."""
+        return list(self.db['jobs'].find({'_id': {'$in': list(job_ids)}}))
+
+    def allocate_sequence(self, count):
+        """Reserve `count` consecutive broadcast sequence numbers and return the first one.
+
+        The counter lives in MongoDB so numbers stay monotonic across restarts and instances.
+        """
+        counter = self.db['counters'].find_one_and_update(
+            {'_id': 'messages'},
+            {'$inc': {'seq': count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return counter['seq'] - count + 1
+
+    def load_recent_sequenced(self, limit):
+        """Load the newest `limit` sequenced messages, oldest first."""
+        try:
+            messages = list(self.collection.find({'seq': {'$exists': True}}, {'_id': 0}).sort('seq', -1).limit(limit))
+            messages.reverse()
+            return messages
+        except Exception as e:
+            logging.error(f"Failed to load sequenced messages from MongoDB: {e}")
+            return []
+
+    def load_messages(self, limit=0):
+        """Load messages from the database, newest first (`limit` 0 loads all of them)."""
         try:
             # Get messages and sort by time in descending order
             messages = list(self.collection.find(
@@ -99,7 +244,7 @@ class DBHandler:
                     ]
                 },
                 {'_id': 0}
-            ).sort("time", -1))
+            ).sort("time", -1).limit(limit))
 
             logging.info(f"Successfully loaded {len(messages)} messages from MongoDB")
             return messages
@@ -108,7 +253,7 @@ class DBHandler:
             return []
 
     def clear_invalid_messages(self):
-        """Clear invalid messages from the database."""
+        """Clear invalid messages from the database and return how many were deleted."""
         try:
             result = self.collection.delete_many({
                 "$and": [
@@ -118,21 +263,127 @@ class DBHandler:
                 ]
             })
             logging.info(f"Cleared {result.deleted_count} invalid messages from MongoDB")
+            return result.deleted_count
         except Exception as e:
             logging.error(f"Failed to clear invalid messages: {e}")
+            return 0
+
+    def count_by_type_and_status(self):
+        """Return (content_type, status, count) rows over the whole history, including expired raw rows."""
+        state = self._rollup_state()
+        hour, minute = state.get('hour'), state.get('minute')
+        sources = []
+        if hour:
+            sources.append((self.db['rollup_hour'], {"bucket": {"$lt": hour}}, "$count"))
+        if minute:
+            sources.append((self.db['rollup_minute'], {"bucket": {"$gte": hour or minute, "$lt": minute}}, "$count"))
+        sources.append((self.collection, {"processed_time": {"$gte": minute}} if minute else {}, 1))
+
+        counts = {}
+        for collection, match, amount in sources:
+            for row in collection.aggregate([
+                {"$match": match},
+                {"$group": {"_id": {"content_type": "$content_type", "status": "$status"}, "count": {"$sum": amount}}}
+            ]):
+                key = (row["_id"].get("content_type"), row["_id"].get("status"))
+                counts[key] = counts.get(key, 0) + row["count"]
+        return [(content_type, status, count) for (content_type, status), count in counts.items()]
 
-    async def get_peak_throughput(self):
-        # Get messages processed per minute at peak
-        pipeline = [
+    def _rollup_state(self):
+        return self.db['rollup_state'].find_one({'_id': 'rollups'}) or {}
+
+    def rollup_minutes(self, since, until):
+        """(Re)compute per-minute rollups for whole minutes in [since, until) from the raw rows."""
+        self.collection.aggregate([
+            {"$match": {"processed_time": {"$gte": since, "$lt": until}}},
+            {"$group": {
+                "_id": {
+                    "bucket": {"$dateTrunc": {"date": "$processed_time", "unit": "minute"}},
+                    "content_type": "$content_type",
+                    "status": "$status"
+                },
+                "count": {"$sum": 1},
+                "latency_ms_sum": {"$sum": {"$dateDiff": {
+                    "startDate": "$time", "endDate": "$processed_time", "unit": "millisecond"
+                }}},
+                "latency_count": {"$sum": {"$cond": [{"$eq": [{"$type": "$time"}, "date"]}, 1, 0]}}
+            }},
+            {"$set": {"bucket": "$_id.bucket", "content_type": "$_id.content_type", "status": "$_id.status"}},
+            # Replacing whole buckets keeps re-runs over the same window idempotent
+            {"$merge": {"into": "rollup_minute", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+        ])
+
+    def rollup_hours(self, since, until):
+        """(Re)compute per-hour rollups for whole hours in [since, until) from the per-minute rollups."""
+        self.db['rollup_minute'].aggregate([
+            {"$match": {"bucket": {"$gte": since, "$lt": until}}},
             {"$group": {
-                "_id": {"$dateToString": {"format": "%Y-%m-%d %H:%M", "date": "$timestamp"}},
-                "count": {"$sum": 1}
+                "_id": {
+                    "bucket": {"$dateTrunc": {"date": "$bucket", "unit": "hour"}},
+                    "content_type": "$content_type",
+                    "status": "$status"
+                },
+                "count": {"$sum": "$count"},
+                "latency_ms_sum": {"$sum": "$latency_ms_sum"},
+                "latency_count": {"$sum": "$latency_count"}
             }},
-            {"$sort": {"count": -1}},
-            {"$limit": 1}
+            {"$set": {"bucket": "$_id.bucket", "content_type": "$_id.content_type", "status": "$_id.status"}},
+            {"$merge": {"into": "rollup_hour", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+        ])
+
+    def roll_up(self, now=None):
+        """Fold every completed minute and hour since the last run into the rollup collections."""
+        now = now or datetime.now()
+        state = self._rollup_state()
+        minute_end = (now - ROLLUP_LAG).replace(second=0, microsecond=0)
+        minute_start = state.get('minute')
+        if minute_start is None:
+            oldest = self.collection.find_one({"processed_time": {"$type": "date"}}, sort=[("processed_time", 1)])
+            minute_start = (oldest["processed_time"] if oldest else minute_end).replace(second=0, microsecond=0)
+        hour_end = minute_end.replace(minute=0)
+        hour_start = state.get('hour') or minute_start.replace(minute=0)
+
+        if minute_start < minute_end:
+            self.rollup_minutes(minute_start, minute_end)
+        if hour_start < hour_end:
+            self.rollup_hours(hour_start, hour_end)
+        self.db['rollup_state'].update_one(
+            {'_id': 'rollups'},
+            {'$set': {'minute': max(minute_start, minute_end), 'hour': max(hour_start, hour_end)}},
+            upsert=True
+        )
+        return minute_end
+
+    def get_throughput_history(self, unit='hour', since=None):
+        """Messages per minute or hour from the rollups, oldest first."""
+        match = {"bucket": {"$gte": since}} if since else {}
+        return [
+            {unit: row["_id"].isoformat(), "count": row["count"]}
+            for row in self.db[f'rollup_{unit}'].aggregate([
+                {"$match": match},
+                {"$group": {"_id": "$bucket", "count": {"$sum": "$count"}}},
+                {"$sort": {"_id": 1}}
+            ])
         ]
-        result = await self.db.messages.aggregate(pipeline).to_list(1)
-        return result[0]["count"] if result else 0
+
+    def find_processed_between(self, since, until):
+        """Raw rows processed in [since, until), for archiving before they expire."""
+        return self.collection.find({"processed_time": {"$gte": since, "$lt": until}}, {'_id': 0})
+
+    def save_metrics_snapshot(self, snapshot):
+        """Persist the rolling metrics snapshot, replacing the previous one."""
+        try:
+            self.db['metrics_snapshots'].replace_one({'_id': 'rolling'}, snapshot, upsert=True)
+        except Exception as e:
+            logging.error(f"Failed to save metrics snapshot: {e}")
+
+    def load_metrics_snapshot(self):
+        """Load the last rolling metrics snapshot, or None if there is none."""
+        try:
+            return self.db['metrics_snapshots'].find_one({'_id': 'rolling'})
+        except Exception as e:
+            logging.error(f"Failed to load metrics snapshot: {e}")
+            return None
 
     async def get_success_rate(self):
         total = await self.db.messages.count_documents({})
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+
+import pika
+from bson import BSON
+
+# Events kept per instance queue before the broker drops the oldest (live dashboard data only)
+INSTANCE_QUEUE_MAX_LENGTH = 10000
+RECONNECT_DELAY = 5
+
+
+class InMemoryFanout:
+    """Single-process event bus: every published batch reaches every bound instance.
+
+    This is the default for a lone server and the broker stand-in for the multi-instance test harness.
+    """
+
+    def __init__(self):
+        self.bindings = []
+        self.lock = threading.Lock()
+
+    def bind(self, loop):
+        queue = asyncio.Queue()
+        with self.lock:
+            self.bindings.append((loop, queue))
+        return queue
+
+    def publish(self, events):
+        # Safe to call from executor threads; delivery happens on each instance's loop
+        with self.lock:
+            bindings = list(self.bindings)
+        for loop, queue in bindings:
+            loop.call_soon_threadsafe(queue.put_nowait, events)
+
+
+class RabbitMQFanout:
+    """Fans persisted status events out to every websocket instance through a fanout exchange.
+
+    Each instance binds its own exclusive, auto-deleted queue, so all instances see every event
+    while the Dashboard work queue is still consumed (and persisted) exactly once.
+    """
+
+    def __init__(self, exchange='DashboardEvents', host='localhost'):
+        self.exchange = exchange
+        self.host = host
+        self._connection = None
+        self._channel = None
+        self._publish_lock = threading.Lock()
+
+    def _declare_exchange(self, channel):
+        channel.exchange_declare(exchange=self.exchange, exchange_type='fanout', durable=True)
+
+    def _publish_channel(self):
+        if self._channel is None or not self._channel.is_open:
+            self._connection = pika.BlockingConnection(pika.ConnectionParameters(self.host))
+            self._channel = self._connection.channel()
+            self._declare_exchange(self._channel)
+        return self._channel
+
+    def publish(self, events):
+        body = BSON.encode({'events': events})
+        # pika connections are not thread safe; executor threads take turns on one connection
+        with self._publish_lock:
+            try:
+                self._publish_channel().basic_publish(exchange=self.exchange, routing_key='', body=body)
+            except (pika.exceptions.AMQPConnectionError, pika.exceptions.AMQPChannelError):
+                self._channel = None
+                self._publish_channel().basic_publish(exchange=self.exchange, routing_key='', body=body)
+
+    def bind(self, loop):
+        queue = asyncio.Queue()
+        threading.Thread(
+            target=self._consume, args=(loop, queue), name=f'{self.exchange}-fanout', daemon=True
+        ).start()
+        return queue
+
+    def _consume(self, loop, queue):
+        def callback(channel, method, properties, body):
+            loop.call_soon_threadsafe(queue.put_nowait, BSON(body).decode()['events'])
+
+        while True:
+            try:
+                connection = pika.BlockingConnection(pika.ConnectionParameters(self.host))
+                channel = connection.channel()
+                self._declare_exchange(channel)
+                result = channel.queue_declare(
+                    queue='',
+                    exclusive=True,
+                    arguments={'x-max-length': INSTANCE_QUEUE_MAX_LENGTH, 'x-overflow': 'drop-head'}
+                )
+                channel.queue_bind(exchange=self.exchange, queue=result.method.queue)
+                channel.basic_consume(queue=result.method.queue, on_message_callback=callback, auto_ack=True)
+                channel.start_consuming()
+            except Exception as e:
+                print(f"Error in fanout consumer, reconnecting in {RECONNECT_DELAY}s: {e}")
+                time.sleep(RECONNECT_DELAY)
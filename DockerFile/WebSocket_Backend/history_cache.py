@@ -0,0 +1,45 @@
+from collections import deque
+
+
+class HistoryCache:
+    """The most recent status messages, newest first, kept ready to send to connecting clients.
+
+    Each message is serialised at most once per encoding and kept next to it, so a new message only
+    costs its own serialisation and the initialMessages frame is re-assembled from cached pieces.
+    Connection bursts are then served from memory without touching MongoDB.
+    """
+
+    def __init__(self, size=1000):
+        # [message, {encoding: serialised message}] entries
+        self.entries = deque(maxlen=size)
+        self.seqs = set()
+        self.seq = 0
+        # encoding -> assembled frame payload, valid until the next change
+        self.frame_cache = {}
+
+    def load(self, messages, seq=0):
+        """Replace the cache with `messages` (newest first), e.g. after rows were deleted."""
+        self.entries.clear()
+        self.seqs.clear()
+        for message in messages[:self.entries.maxlen]:
+            self.entries.append([message, {}])
+            if message.get('seq') is not None:
+                self.seqs.add(message['seq'])
+        self.seq = max(seq, max(self.seqs, default=0))
+        self.frame_cache = {}
+
+    def add(self, message):
+        seq = message.get('seq')
+        if seq is not None:
+            if seq in self.seqs:
+                # Already loaded from MongoDB by a reload that raced with this event
+                return
+            self.seqs.add(seq)
+            self.seq = max(self.seq, seq)
+        if len(self.entries) == self.entries.maxlen:
+            self.seqs.discard(self.entries[-1][0].get('seq'))
+        self.entries.appendleft([message, {}])
+        self.frame_cache = {}
+
+    def __len__(self):
+        return len(self.entries)
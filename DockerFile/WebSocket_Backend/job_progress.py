@@ -0,0 +1,103 @@
+import asyncio
+
+import websockets
+
+from status_record import format_time
+from wire_format import FrameEncoder
+
+
+def job_progress(job):
+    """Dashboard form of a `jobs` row (a bare {'_id': job_id} gives an empty progress report).
+
+    Items count as completed once their last stage reports them; per content type no more than the
+    job announced are counted, as stages may report items of their own (e.g. images extracted from
+    a document).
+    """
+    expected = job.get('expected', {})
+    completed_by_type = job.get('completed', {})
+    if expected:
+        completed = sum(min(completed_by_type.get(content_type, 0), count)
+                        for content_type, count in expected.items())
+    else:
+        completed = sum(completed_by_type.values())
+    failed = job.get('items_failed', 0)
+    messages = job.get('messages', 0)
+    expected_total = job.get('expected_total')
+    first_time, last_time = job.get('first_time'), job.get('last_time')
+    return {
+        'job_id': job['_id'],
+        'expected': expected,
+        'expectedTotal': expected_total,
+        'sent': job.get('items_sent', 0),
+        'completed': completed,
+        'failed': failed,
+        'messages': messages,
+        'byType': job.get('by_type', {}),
+        'progress': min(1.0, (completed + failed) / expected_total) if expected_total else None,
+        'done': bool(expected_total) and completed + failed >= expected_total,
+        'stored': job.get('stored', False),
+        'lastStatus': job.get('last_status'),
+        'firstTime': format_time(first_time) if first_time else None,
+        'lastTime': format_time(last_time) if last_time else None,
+        'endToEndMs': (last_time - first_time).total_seconds() * 1000 if first_time and last_time else None,
+        'avgLatencyMs': job.get('latency_ms_sum', 0) / messages if messages else 0,
+        'maxLatencyMs': job.get('latency_ms_max', 0)
+    }
+
+
+class JobProgressFeed:
+    """Answers jobProgress queries and pushes updated progress to clients watching specific jobs."""
+
+    def __init__(self, load_jobs, encoder=None):
+        # Blocking lookup of `jobs` rows by id; run in the default executor
+        self.load_jobs = load_jobs
+        self.encoder = encoder or FrameEncoder()
+        # job_id -> websockets watching it, and the reverse for cleanup
+        self.watchers = {}
+        self.watched = {}
+
+    async def query(self, job_ids):
+        job_ids = [str(job_id) for job_id in job_ids]
+        rows = await asyncio.get_running_loop().run_in_executor(None, self.load_jobs, job_ids)
+        found = {row['_id']: row for row in rows}
+        return [job_progress(found.get(job_id, {'_id': job_id})) for job_id in job_ids]
+
+    async def subscribe(self, websocket, job_ids):
+        job_ids = {str(job_id) for job_id in job_ids}
+        self.watched.setdefault(websocket, set()).update(job_ids)
+        for job_id in job_ids:
+            self.watchers.setdefault(job_id, set()).add(websocket)
+        await websocket.send(self.encoder.encode_for(websocket, {
+            'type': 'jobProgress',
+            'data': await self.query(sorted(job_ids))
+        }))
+
+    def unsubscribe(self, websocket):
+        for job_id in self.watched.pop(websocket, ()):
+            watchers = self.watchers.get(job_id)
+            if watchers is not None:
+                watchers.discard(websocket)
+                if not watchers:
+                    del self.watchers[job_id]
+
+    async def publish(self, job_ids):
+        """Push fresh progress for the watched jobs among `job_ids` (e.g. the jobs in one event batch)."""
+        watched = [job_id for job_id in set(job_ids) if job_id in self.watchers]
+        if not watched:
+            return
+        try:
+            reports = await self.query(watched)
+        except Exception as e:
+            print(f"Error loading job progress: {e}")
+            return
+
+        for report in reports:
+            message, cache = {'type': 'jobProgress', 'data': [report]}, {}
+            for websocket in list(self.watchers.get(report['job_id'], ())):
+                try:
+                    await websocket.send(self.encoder.encode_for(websocket, message, cache))
+                except websockets.ConnectionClosed:
+                    self.unsubscribe(websocket)
+                except Exception as e:
+                    print(f"Error pushing job progress to client: {e}")
+                    self.unsubscribe(websocket)
@@ -0,0 +1,163 @@
+import math
+import threading
+from datetime import datetime
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram with bounded relative error (HDR style)."""
+
+    def __init__(self, precision=0.05):
+        self.precision = precision
+        self._log_growth = math.log(1 + precision)
+        self.counts = {}
+        self.total = 0
+        self.sum = 0.0
+
+    def _bucket(self, value_ms):
+        # Bucket 0 holds sub-millisecond values, bucket i covers [g^(i-1), g^i)
+        if value_ms < 1:
+            return 0
+        return int(math.log(value_ms) / self._log_growth) + 1
+
+    def record(self, value_ms):
+        value_ms = max(0.0, value_ms)
+        bucket = self._bucket(value_ms)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.total += 1
+        self.sum += value_ms
+
+    def percentile(self, p):
+        if not self.total:
+            return 0
+        target = p * self.total
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= target:
+                return 0 if bucket == 0 else math.exp((bucket - 0.5) * self._log_growth)
+        return 0
+
+    def mean(self):
+        return self.sum / self.total if self.total else 0
+
+    def to_snapshot(self):
+        return {
+            'precision': self.precision,
+            'counts': {str(bucket): count for bucket, count in self.counts.items()},
+            'total': self.total,
+            'sum': self.sum
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        histogram = cls(snapshot.get('precision', 0.05))
+        histogram.counts = {int(bucket): count for bucket, count in snapshot.get('counts', {}).items()}
+        histogram.total = snapshot.get('total', 0)
+        histogram.sum = snapshot.get('sum', 0.0)
+        return histogram
+
+
+class MetricsEngine:
+    """Rolling dashboard metrics updated per stored message so analytics reads are O(1)."""
+
+    def __init__(self, throughput_minutes=60):
+        self.throughput_minutes = throughput_minutes
+        self.type_counts = {}
+        self.status_counts = {}
+        self.total = 0
+        # Ring buffer of per-minute counts, indexed by epoch minute modulo its size
+        self.minute_counts = [0] * throughput_minutes
+        self.minute_stamps = [None] * throughput_minutes
+        self.latency = LatencyHistogram()
+        self.lock = threading.Lock()
+
+    def record(self, document):
+        """Fold one stored message document into the counters."""
+        processed_time = document.get('processed_time') or datetime.now()
+        received_time = document.get('time')
+        content_type = document.get('content_type', 'Unknown Type')
+        if content_type == 'Picture':
+            content_type = 'Image'
+        status = document.get('status', 'Unknown')
+        minute = int(processed_time.timestamp() // 60)
+        slot = minute % self.throughput_minutes
+
+        with self.lock:
+            self.total += 1
+            self.type_counts[content_type] = self.type_counts.get(content_type, 0) + 1
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+            if self.minute_stamps[slot] != minute:
+                self.minute_stamps[slot] = minute
+                self.minute_counts[slot] = 0
+            self.minute_counts[slot] += 1
+
+            if isinstance(received_time, datetime):
+                self.latency.record((processed_time - received_time).total_seconds() * 1000)
+
+    def seed_counts(self, rows):
+        """Initialise the counters from (content_type, status, count) rows, e.g. a one-off DB aggregate."""
+        with self.lock:
+            for content_type, status, count in rows:
+                if content_type == 'Picture':
+                    content_type = 'Image'
+                self.total += count
+                self.type_counts[content_type] = self.type_counts.get(content_type, 0) + count
+                self.status_counts[status] = self.status_counts.get(status, 0) + count
+
+    def throughput(self, now=None):
+        """Per-minute counts for the ring buffer window, oldest first."""
+        current = int((now or datetime.now()).timestamp() // 60)
+        buckets = []
+        with self.lock:
+            for minute in range(current - self.throughput_minutes + 1, current + 1):
+                slot = minute % self.throughput_minutes
+                count = self.minute_counts[slot] if self.minute_stamps[slot] == minute else 0
+                buckets.append({'minute': datetime.fromtimestamp(minute * 60).isoformat(), 'count': count})
+        return buckets
+
+    def summary(self):
+        """Analytics summary: totals, type distribution, throughput and latency percentiles."""
+        throughput = self.throughput()
+        with self.lock:
+            type_distribution = {'Document': 0, 'Image': 0, 'Audio': 0}
+            type_distribution.update(self.type_counts)
+            return {
+                'totalMessages': self.total,
+                # Storage acknowledgements ('Stored') are successful deliveries too
+                'processedMessages': self.status_counts.get('Processed', 0) + self.status_counts.get('Stored', 0),
+                'typeDistribution': type_distribution,
+                'throughputPerMinute': throughput,
+                'messageRate': sum(bucket['count'] for bucket in throughput) / (self.throughput_minutes * 60),
+                'latencyMs': {
+                    'avg': self.latency.mean(),
+                    'p50': self.latency.percentile(0.5),
+                    'p95': self.latency.percentile(0.95),
+                    'p99': self.latency.percentile(0.99)
+                }
+            }
+
+    def to_snapshot(self):
+        with self.lock:
+            return {
+                'total': self.total,
+                'typeCounts': dict(self.type_counts),
+                'statusCounts': dict(self.status_counts),
+                'minuteCounts': list(self.minute_counts),
+                'minuteStamps': list(self.minute_stamps),
+                'latency': self.latency.to_snapshot(),
+                'snapshotTime': datetime.now()
+            }
+
+    @classmethod
+    def from_snapshot(cls, snapshot, throughput_minutes=60):
+        engine = cls(throughput_minutes)
+        engine.total = snapshot.get('total', 0)
+        engine.type_counts = dict(snapshot.get('typeCounts', {}))
+        engine.status_counts = dict(snapshot.get('statusCounts', {}))
+        # Only reuse the ring buffer if it was written with the same window size
+        if len(snapshot.get('minuteCounts', [])) == throughput_minutes:
+            engine.minute_counts = list(snapshot['minuteCounts'])
+            engine.minute_stamps = list(snapshot['minuteStamps'])
+        engine.latency = LatencyHistogram.from_snapshot(snapshot.get('latency', {}))
+        return engine
@@ -0,0 +1,56 @@
+"""One-shot migration converting string `time`/`processed_time` fields in `messages` to BSON datetimes."""
+import argparse
+import logging
+
+from pymongo import UpdateOne
+
+from db_handler import DBHandler
+from status_record import parse_timestamp
+
+TIMESTAMP_FIELDS = ('time', 'processed_time')
+
+
+def migrate_timestamps(collection, batch_size=1000):
+    """Rewrite string timestamps in batches; returns (converted, skipped) row counts."""
+    query = {"$or": [{field: {"$type": "string"}} for field in TIMESTAMP_FIELDS]}
+    projection = {field: 1 for field in TIMESTAMP_FIELDS}
+
+    converted = 0
+    skipped = 0
+    operations = []
+    for document in collection.find(query, projection).batch_size(batch_size):
+        update = {}
+        for field in TIMESTAMP_FIELDS:
+            value = document.get(field)
+            if isinstance(value, str):
+                parsed = parse_timestamp(value)
+                if parsed is not None:
+                    update[field] = parsed
+
+        if not update:
+            skipped += 1
+            continue
+
+        operations.append(UpdateOne({'_id': document['_id']}, {'$set': update}))
+        if len(operations) >= batch_size:
+            collection.bulk_write(operations, ordered=False)
+            converted += len(operations)
+            logging.info(f"Converted {converted} messages so far")
+            operations = []
+
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+        converted += len(operations)
+
+    return converted, skipped
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--batch-size', type=int, default=1000, help='rows per bulk write')
+    args = parser.parse_args()
+
+    db_handler = DBHandler()
+    db_handler.init_db()
+    converted, skipped = migrate_timestamps(db_handler.collection, batch_size=args.batch_size)
+    logging.info(f"Timestamp migration finished: {converted} converted, {skipped} unparseable rows left as-is")
@@ -0,0 +1,30 @@
+from collections import deque
+
+
+class ReplayRing:
+    """Bounded in-memory history of broadcast frames, used to resume reconnecting clients.
+
+    Frames carry the durable sequence number assigned when their batch was persisted, so a
+    client can resume from the last sequence it saw on any instance, including after a restart.
+    """
+
+    def __init__(self, size=5000, covered_from=0):
+        self.frames = deque(maxlen=size)
+        # Every frame after this sequence is still in the ring
+        self.covered_from = covered_from
+        self.last_seq = covered_from
+
+    def append(self, frame):
+        if len(self.frames) == self.frames.maxlen:
+            self.covered_from = max(self.covered_from, self.frames[0]['seq'])
+        self.frames.append(frame)
+        self.last_seq = max(self.last_seq, frame['seq'])
+
+    def since(self, last_seen):
+        """Frames after `last_seen` in sequence order, or None if the gap has fallen out of the ring."""
+        if last_seen >= self.last_seq:
+            return []
+        if last_seen < self.covered_from:
+            return None
+        # Batches persisted by different scale-out instances can arrive slightly out of order
+        return sorted((frame for frame in self.frames if frame['seq'] > last_seen), key=lambda f: f['seq'])
@@ -0,0 +1,78 @@
+"""Retention job: rolls raw status rows up into per-minute/per-hour aggregates and archives completed days."""
+import argparse
+import asyncio
+import gzip
+import logging
+import os
+from datetime import datetime, timedelta
+
+from bson import json_util
+
+from db_handler import DBHandler
+
+# Seconds between rollup passes
+ROLLUP_INTERVAL = 60
+# A day is archived only once this long has passed since midnight, so late inserts are included
+ARCHIVE_LAG = timedelta(minutes=5)
+
+
+def archive_day(db_handler, day, directory):
+    """Write the raw rows processed on `day` to <directory>/messages-YYYY-MM-DD.jsonl.gz; returns the row count."""
+    path = os.path.join(directory, f"messages-{day:%Y-%m-%d}.jsonl.gz")
+    if os.path.exists(path):
+        return 0
+    count = 0
+    # Written under a temporary name so a crash never leaves a truncated archive that looks complete
+    with gzip.open(path + '.tmp', 'wt', encoding='utf-8') as archive:
+        for document in db_handler.find_processed_between(day, day + timedelta(days=1)):
+            archive.write(json_util.dumps(document) + '\n')
+            count += 1
+    os.replace(path + '.tmp', path)
+    return count
+
+
+class RetentionJob:
+    def __init__(self, db_handler, interval=ROLLUP_INTERVAL, archive_dir=None):
+        self.db_handler = db_handler
+        self.interval = interval
+        self.archive_dir = archive_dir
+
+    def run_once(self, now=None):
+        now = now or datetime.now()
+        self.db_handler.roll_up(now)
+        if self.archive_dir:
+            self.archive_completed_days(now)
+
+    def archive_completed_days(self, now):
+        # Completed days whose rows have not started expiring yet; archives are written once per day
+        os.makedirs(self.archive_dir, exist_ok=True)
+        today = (now - ARCHIVE_LAG).replace(hour=0, minute=0, second=0, microsecond=0)
+        for age in range(int(self.db_handler.retention_days) - 1, 0, -1):
+            day = today - timedelta(days=age)
+            count = archive_day(self.db_handler, day, self.archive_dir)
+            if count:
+                logging.info(f"Archived {count} messages from {day:%Y-%m-%d}")
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    await loop.run_in_executor(None, self.run_once)
+                except Exception as e:
+                    logging.error(f"Retention pass failed: {e}")
+                await asyncio.sleep(self.interval)
+        except asyncio.CancelledError:
+            pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--archive-dir', help='write completed days as gzipped JSON lines to this directory')
+    args = parser.parse_args()
+
+    # Archives the days the server's TTL keeps; the TTL itself is left to the server
+    db_handler = DBHandler()
+    db_handler.init_db()
+    RetentionJob(db_handler, archive_dir=args.archive_dir).run_once()
+    logging.info("Retention pass finished")
@@ -0,0 +1,144 @@
+from datetime import datetime
+from functools import lru_cache
+
+# Display format used by the publishers and the dashboard frontend
+TIME_FORMAT = '%m/%d/%Y, %I:%M:%S %p'
+DEFAULT_MESSAGE = 'No additional information'
+
+# Publisher id field -> content type, in the order they are checked
+ID_TYPES = (('DocumentId', 'Document'), ('PictureID', 'Picture'), ('AudioID', 'Audio'))
+# Job-level item counts carried by publisher messages -> content type
+EXPECTED_COUNT_FIELDS = (('NumberOfDocuments', 'Document'), ('NumberOfImages', 'Image'),
+                         ('NumberOfAudio', 'Audio'), ('NumberOfVideo', 'Video'))
+
+
+@lru_cache(maxsize=4096)
+def _parse_string(value):
+    # Status timestamps have one-second resolution, so bursts of messages mostly hit the cache
+    try:
+        return datetime.strptime(value, TIME_FORMAT)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def parse_timestamp(value):
+    """Convert a stored or incoming timestamp to a datetime, or None if it cannot be parsed."""
+    if isinstance(value, datetime):
+        return value
+    if not isinstance(value, str) or not value:
+        return None
+    return _parse_string(value)
+
+
+@lru_cache(maxsize=1024)
+def _format_second(value):
+    return value.strftime(TIME_FORMAT)
+
+
+def format_time(value):
+    """Display form of a datetime; formatting is cached per second."""
+    return _format_second(value.replace(microsecond=0))
+
+
+class StatusRecord:
+    """A status update normalised from either publisher form (ID, DocumentId, FileName, ...) or
+    dashboard form (job_id, content_id, file_name, ...), with the stored and broadcast layouts
+    derived from it in one pass.
+    """
+
+    __slots__ = ('time', 'job_id', 'content_id', 'content_type', 'file_name', 'status', 'message', 'seq',
+                 'expected')
+
+    def __init__(self, time, job_id, content_id, content_type, file_name, status, message, seq=None,
+                 expected=None):
+        self.time = time
+        self.job_id = job_id
+        self.content_id = content_id
+        self.content_type = content_type
+        self.file_name = file_name
+        self.status = status
+        self.message = message
+        self.seq = seq
+        # Items per content type in the whole job, when the publisher announced them
+        self.expected = expected
+
+    @classmethod
+    def from_message(cls, message):
+        get = message.get
+        id_value = id_type = None
+        for field, content_type in ID_TYPES:
+            if field in message:
+                id_value, id_type = message[field], content_type
+                break
+
+        if 'ID' in message:
+            # Publisher form: modules report their own Status/Message, otherwise a processed item
+            file_name = get('FileName')
+            status = get('Status') or get('status') or 'Processed'
+            text = get('Message')
+            if text is None:
+                text = (f"{id_type} file '{get('FileName', 'unknown file')}' was successfully processed"
+                        if id_type else DEFAULT_MESSAGE)
+            text = str(text)
+            expected = {content_type: get(field) for field, content_type in EXPECTED_COUNT_FIELDS
+                        if isinstance(get(field), int)} or None
+        else:
+            file_name = get('file_name') or get('FileName')
+            status = get('status', 'Processed')
+            text = get('message', DEFAULT_MESSAGE)
+            expected = get('expected')
+
+        return cls(
+            get('time'),
+            get('job_id') or get('ID'),
+            get('content_id') or id_value,
+            get('content_type') or id_type,
+            file_name,
+            status,
+            text,
+            get('seq'),
+            expected
+        )
+
+    def to_broadcast(self, received_time):
+        """Dashboard form sent to clients; `received_time` is the display string for this batch."""
+        time = self.time
+        if time is None:
+            time = received_time
+        elif isinstance(time, datetime):
+            time = format_time(time)
+        broadcast = {
+            'time': time,
+            'received_time': received_time,
+            'job_id': self.job_id,
+            'content_id': self.content_id,
+            'content_type': self.content_type or 'Unknown Type',
+            'file_name': self.file_name,
+            'status': self.status,
+            'message': self.message
+        }
+        if self.expected:
+            broadcast['expected'] = self.expected
+        return broadcast
+
+    def to_document(self, processed_time):
+        """Stored form, with native datetimes and placeholders for missing identifiers."""
+        document = {
+            "time": parse_timestamp(self.time) or processed_time,
+            "processed_time": processed_time,
+            "job_id": self.job_id or 'Unknown JobID',
+            "content_id": self.content_id or 'Unknown ContentID',
+            "content_type": self.content_type or 'Unknown Type',
+            "file_name": self.file_name or 'Unknown File',
+            "status": self.status,
+            "message": self.message
+        }
+        if self.seq is not None:
+            document['seq'] = self.seq
+        if self.expected:
+            document['expected'] = self.expected
+        return document
@@ -0,0 +1,54 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from status_record import format_time
+
+
+class StoredFiles:
+    """Read-only view of the Store module's index (STORE_ROOT/index.sqlite): which files each job and
+    item has on disk, and the content-addressed blob each one is kept in.
+
+    The index is opened read-only and lazily, so the dashboard starts before the Store module has
+    created it; the Store commits in WAL mode, so reads never block its writes.
+    """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self.db = None
+        self.lock = threading.Lock()
+
+    def _connect(self):
+        if self.db is None:
+            if not os.path.exists(self.index_path):
+                return None
+            self.db = sqlite3.connect(f'file:{self.index_path}?mode=ro', uri=True, check_same_thread=False)
+        return self.db
+
+    def lookup(self, job_id=None, content_id=None, limit=100):
+        """Files of a job and/or an item, newest first; [] while the index does not exist."""
+        conditions = [(column, value) for column, value in
+                      (('f.job_id', job_id), ('f.content_id', content_id)) if value]
+        if not conditions:
+            return []
+        where = ' AND '.join(f'{column} = ?' for column, _ in conditions)
+        with self.lock:
+            db = self._connect()
+            if db is None:
+                return []
+            rows = db.execute(
+                'SELECT f.job_id, f.content_id, f.kind, f.name, f.digest, f.stored_at, b.size, b.refcount '
+                f'FROM files f JOIN blobs b ON b.digest = f.digest WHERE {where} '
+                'ORDER BY f.stored_at DESC LIMIT ?', [value for _, value in conditions] + [int(limit)]).fetchall()
+        return [{
+            'job_id': row[0],
+            'content_id': row[1],
+            'kind': row[2],
+            'file_name': row[3],
+            'digest': row[4],
+            'stored_at': format_time(datetime.fromtimestamp(row[5])),
+            'size': row[6],
+            # Items sharing this payload, stored once
+            'shared_by': row[7]
+        } for row in rows]
@@ -0,0 +1,95 @@
+def _normalize_type(content_type):
+    # Image content is reported as 'Picture' by some publishers
+    return 'Image' if content_type == 'Picture' else content_type
+
+
+def parse_filters(raw_filters):
+    """Normalise a client's filter spec to {field: frozenset(values)}; each value may be a string or list."""
+    filters = {}
+    for field in SubscriptionIndex.FILTER_FIELDS:
+        values = (raw_filters or {}).get(field)
+        if values is None or values == []:
+            continue
+        if isinstance(values, str):
+            values = [values]
+        if field == 'content_type':
+            values = [_normalize_type(value) for value in values]
+        filters[field] = frozenset(str(value) for value in values)
+    return filters
+
+
+class SubscriptionIndex:
+    """Routes status messages to the clients whose filters match them.
+
+    Each filtered client is indexed under one anchor field (its most selective filter), so routing a
+    message only looks at clients indexed under that message's values, then checks the rest of their
+    filter. Clients without filters receive everything.
+    """
+
+    FILTER_FIELDS = ('job_id', 'content_type', 'status', 'file_prefix')
+    # Most selective first
+    ANCHOR_ORDER = ('job_id', 'file_prefix', 'content_type', 'status')
+
+    def __init__(self):
+        self.unfiltered = set()
+        # field -> value -> clients anchored on that value
+        self.anchors = {field: {} for field in self.ANCHOR_ORDER}
+        self.filters = {}
+
+    def add(self, client, filters=None):
+        self.remove(client)
+        filters = filters or {}
+        self.filters[client] = filters
+        if not filters:
+            self.unfiltered.add(client)
+            return
+        anchor = next(field for field in self.ANCHOR_ORDER if field in filters)
+        for value in filters[anchor]:
+            self.anchors[anchor].setdefault(value, set()).add(client)
+
+    def remove(self, client):
+        filters = self.filters.pop(client, None)
+        self.unfiltered.discard(client)
+        if not filters:
+            return
+        anchor = next(field for field in self.ANCHOR_ORDER if field in filters)
+        index = self.anchors[anchor]
+        for value in filters[anchor]:
+            clients = index.get(value)
+            if clients is not None:
+                clients.discard(client)
+                if not clients:
+                    del index[value]
+
+    def _message_values(self, message):
+        return {
+            'job_id': str(message.get('job_id')),
+            'content_type': _normalize_type(message.get('content_type')),
+            'status': str(message.get('status')),
+            'file_name': message.get('file_name') or ''
+        }
+
+    def _matches(self, filters, values):
+        for field, allowed in filters.items():
+            if field == 'file_prefix':
+                if not any(values['file_name'].startswith(prefix) for prefix in allowed):
+                    return False
+            elif values[field] not in allowed:
+                return False
+        return True
+
+    def match(self, message):
+        """Return the clients that should receive this status message."""
+        values = self._message_values(message)
+        candidates = set()
+        for field in ('job_id', 'content_type', 'status'):
+            candidates.update(self.anchors[field].get(values[field], ()))
+        prefixes = self.anchors['file_prefix']
+        if prefixes:
+            file_name = values['file_name']
+            for end in range(1, len(file_name) + 1):
+                candidates.update(prefixes.get(file_name[:end], ()))
+
+        matched = set(self.unfiltered)
+        matched.update(client for client in candidates if self._matches(self.filters[client], values))
+        return matched
@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+import psutil
+
+
+class SystemSampler:
+    """Samples host metrics on a fixed interval so request handlers never block on psutil."""
+
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self.latest = {
+            'cpuUtilization': 0.0,
+            'memoryUsage': 0.0,
+            'diskUsage': 0.0,
+            'processCount': 0,
+            'bytesSent': 0,
+            'bytesReceived': 0,
+            'bytesSentPerSecond': 0.0,
+            'bytesReceivedPerSecond': 0.0,
+            'diskReadBytesPerSecond': 0.0,
+            'diskWriteBytesPerSecond': 0.0,
+            'sampledAt': None
+        }
+        self._previous = None
+        # Prime cpu_percent so the first non-blocking call has a reference point
+        psutil.cpu_percent(interval=None)
+
+    def sample(self):
+        """Take one sample and publish it as the latest snapshot."""
+        now = time.monotonic()
+        network = psutil.net_io_counters()
+        disk_io = psutil.disk_io_counters()
+        counters = {
+            'bytes_sent': network.bytes_sent,
+            'bytes_recv': network.bytes_recv,
+            'read_bytes': disk_io.read_bytes if disk_io else 0,
+            'write_bytes': disk_io.write_bytes if disk_io else 0
+        }
+
+        rates = {'bytes_sent': 0.0, 'bytes_recv': 0.0, 'read_bytes': 0.0, 'write_bytes': 0.0}
+        if self._previous:
+            previous_time, previous_counters = self._previous
+            elapsed = now - previous_time
+            if elapsed > 0:
+                # Counters can reset (e.g. interface restart); never report negative rates
+                rates = {key: max(0, counters[key] - previous_counters[key]) / elapsed for key in counters}
+        self._previous = (now, counters)
+
+        # Build a new dict and swap it in so readers always see a consistent sample
+        self.latest = {
+            'cpuUtilization': psutil.cpu_percent(interval=None),
+            'memoryUsage': psutil.virtual_memory().percent,
+            'diskUsage': psutil.disk_usage('/').percent,
+            'processCount': len(psutil.pids()),
+            'bytesSent': network.bytes_sent,
+            'bytesReceived': network.bytes_recv,
+            'bytesSentPerSecond': rates['bytes_sent'],
+            'bytesReceivedPerSecond': rates['bytes_recv'],
+            'diskReadBytesPerSecond': rates['read_bytes'],
+            'diskWriteBytesPerSecond': rates['write_bytes'],
+            'sampledAt': time.time()
+        }
+        return self.latest
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    await loop.run_in_executor(None, self.sample)
+                except Exception as e:
+                    print(f"Error sampling system metrics: {e}")
+                await asyncio.sleep(self.interval)
+        except asyncio.CancelledError:
+            pass
@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from db_handler import DBHandler
+from websocket_server import WebSocketServer
+
+TIME_FORMAT = '%m/%d/%Y, %I:%M:%S %p'
+
+
+def make_status(i):
+    # Publisher form, as consumed from the Dashboard queue
+    id_field = ('DocumentId', 'PictureID', 'AudioID')[i % 3]
+    return {
+        'ID': f'job{i // 10}',
+        id_field: f'content{i}',
+        'FileName': f'file_{i}.bin',
+        'time': datetime.now().strftime(TIME_FORMAT)
+    }
+
+
+def legacy_convert(data):
+    # The per-message conversion this benchmark replaced, kept for comparison
+    def content_type(d):
+        if 'DocumentId' in d:
+            return 'Document'
+        elif 'PictureID' in d:
+            return 'Picture'
+        elif 'AudioID' in d:
+            return 'Audio'
+        return d.get('content_type', 'Unknown Type')
+
+    return {
+        'time': data.get('time', datetime.now().strftime(TIME_FORMAT)),
+        'received_time': datetime.now().strftime(TIME_FORMAT),
+        'job_id': data.get('ID'),
+        'content_id': data.get('DocumentId') or data.get('PictureID') or data.get('AudioID'),
+        'content_type': content_type(data),
+        'file_name': data.get('FileName'),
+        'status': 'Processed',
+        'message': f"{content_type(data)} file '{data.get('FileName', 'unknown file')}' was successfully processed"
+    }
+
+
+def legacy_document(message):
+    processed_time = datetime.now()
+    message['processed_time'] = processed_time.strftime(TIME_FORMAT)
+    try:
+        timestamp = datetime.strptime(message.get('time'), TIME_FORMAT)
+    except (TypeError, ValueError):
+        timestamp = processed_time
+    return {
+        "time": timestamp,
+        "processed_time": processed_time,
+        "job_id": message.get('job_id') or message.get('ID', 'Unknown JobID'),
+        "content_id": message.get('content_id') or message.get('DocumentId') or message.get('PictureID') or
+                      message.get('AudioID', 'Unknown ContentID'),
+        "content_type": message.get('content_type'),
+        "file_name": message.get('file_name') or message.get('FileName', 'Unknown File'),
+        "status": message.get('status', 'Processed'),
+        "message": message.get('message', 'No additional information')
+    }
+
+
+def timed(label, func):
+    start = time.process_time()
+    func()
+    print(f"{label:42} {(time.process_time() - start) * 1000:8.1f} ms CPU")
+
+
+if __name__ == '__main__':
+    NUM_MESSAGES = 100000
+
+    statuses = [make_status(i) for i in range(NUM_MESSAGES)]
+    server = WebSocketServer.__new__(WebSocketServer)
+    db_handler = DBHandler()
+
+    timed('legacy convert + document', lambda: [legacy_document(legacy_convert(s)) for s in statuses])
+    timed('convert_bson_to_json (per message)', lambda: [server.convert_bson_to_json(s) for s in statuses])
+    timed('convert_bson_to_json (one list)', lambda: server.convert_bson_to_json(statuses))
+    converted = server.convert_bson_to_json(statuses)
+    timed('_build_document (per message)', lambda: [db_handler._build_document(m) for m in converted])
+    processed_time = datetime.now()
+    timed('_build_document (shared batch time)', lambda: [db_handler._build_document(m, processed_time)
+                                                           for m in converted])
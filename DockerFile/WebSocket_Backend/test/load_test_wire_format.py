@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+import zlib
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from wire_format import FrameEncoder, JSON_SUBPROTOCOL, MSGPACK_SUBPROTOCOL
+import hashlib
+import random
+
+
+class FakeClient:
+    def __init__(self, subprotocol):
+        self.subprotocol = subprotocol
+
+
+def make_message(i):
+    job_id = hashlib.sha256(str(random.random()).encode()).hexdigest()
+    return {
+        'type': 'newMessage',
+        'data': {
+            'time': '01/02/2024, 03:04:05 PM',
+            'received_time': '01/02/2024, 03:04:06 PM',
+            'processed_time': '01/02/2024, 03:04:06 PM',
+            'job_id': job_id,
+            'content_id': hashlib.sha256(job_id.encode()).hexdigest(),
+            'content_type': 'Document',
+            'file_name': f'Project_{i}.pdf',
+            'status': 'Processed',
+            'message': f"Document file 'Project_{i}.pdf' successfully sent to Documents queue"
+        }
+    }
+
+
+def measure(subprotocol, messages, clients_per_message):
+    encoder = FrameEncoder()
+    clients = [FakeClient(subprotocol) for _ in range(clients_per_message)]
+    for client in clients:
+        encoder.register(client)
+    # Same settings as the server's permessage-deflate extension (context takeover keeps history)
+    compressor = zlib.compressobj(wbits=-11, memLevel=4)
+
+    raw_bytes = 0
+    deflated_bytes = 0
+    start = time.process_time()
+    for message in messages:
+        cache = {}
+        for client in clients:
+            frame = encoder.encode_for(client, message, cache)
+        frame = frame.encode() if isinstance(frame, str) else frame
+        raw_bytes += len(frame)
+        deflated_bytes += len(compressor.compress(frame) + compressor.flush(zlib.Z_SYNC_FLUSH))
+    cpu_seconds = time.process_time() - start
+    return raw_bytes / len(messages), deflated_bytes / len(messages), cpu_seconds
+
+
+if __name__ == '__main__':
+    NUM_BROADCASTS = 10000  # Messages broadcast
+    CLIENTS = 10  # Connected dashboards per broadcast
+
+    messages = [make_message(i) for i in range(NUM_BROADCASTS)]
+    for name, subprotocol in (('json', JSON_SUBPROTOCOL), ('msgpack', MSGPACK_SUBPROTOCOL)):
+        raw, deflated, cpu = measure(subprotocol, messages, CLIENTS)
+        print(f"{name:8} {raw:7.1f} B/msg raw  {deflated:7.1f} B/msg deflated  "
+              f"{cpu * 1000:8.1f} ms CPU per {NUM_BROADCASTS} broadcasts to {CLIENTS} clients")
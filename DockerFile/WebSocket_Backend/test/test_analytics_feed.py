@@ -0,0 +1,59 @@
+import asyncio
+import json
+import unittest
+import unittest.mock
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from analytics_feed import AnalyticsFeed, diff_analytics, select_fields
+
+
+class TestAnalyticsFeed(unittest.TestCase):
+    '''
+        purpose: To verify that diff_analytics only keeps changed values.
+        process: Diffs two nested analytics dicts that differ in one nested and one top-level value.
+        validation: Ensures unchanged keys are dropped and nested changes keep their path.
+    '''
+    def test_diff_analytics(self):
+        old = {'performanceStats': {'cpu': 1, 'uptime': 10}, 'systemHealth': {'successRate': 100}}
+        new = {'performanceStats': {'cpu': 1, 'uptime': 15}, 'systemHealth': {'successRate': 100}}
+        self.assertEqual(diff_analytics(old, new), {'performanceStats': {'uptime': 15}})
+        self.assertEqual(diff_analytics(None, new), new)
+
+    '''
+        purpose: To verify that select_fields keeps only the requested dotted paths.
+        process: Selects a nested field, a whole section and a missing path.
+        validation: Ensures the result has the same nesting and missing paths are ignored.
+    '''
+    def test_select_fields(self):
+        data = {'performanceStats': {'cpu': 1, 'uptime': 10}, 'fileStats': {'total': 3}}
+        selected = select_fields(data, ('performanceStats.cpu', 'fileStats', 'systemHealth.queueDepth'))
+        self.assertEqual(selected, {'performanceStats': {'cpu': 1}, 'fileStats': {'total': 3}})
+        self.assertIs(select_fields(data, ()), data)
+
+    '''
+        purpose: To verify that a tick computes one snapshot and shares frames between subscribers.
+        process: Subscribes two clients with the same fields, changes the snapshot and runs a tick.
+        validation: Ensures the snapshot is computed twice in total and both clients get the same delta frame.
+    '''
+    def test_tick_shares_snapshot(self):
+        snapshots = iter([{'performanceStats': {'uptime': 1, 'cpu': 5}},
+                          {'performanceStats': {'uptime': 2, 'cpu': 5}}])
+        compute = unittest.mock.AsyncMock(side_effect=lambda: next(snapshots))
+        feed = AnalyticsFeed(compute)
+        first, second = unittest.mock.AsyncMock(), unittest.mock.AsyncMock()
+
+        async def scenario():
+            await feed.subscribe(first, ['performanceStats'])
+            await feed.subscribe(second, ['performanceStats'])
+            await feed.tick()
+
+        asyncio.run(scenario())
+        self.assertEqual(compute.await_count, 2)
+        expected = json.dumps({'type': 'analyticsDelta', 'data': {'performanceStats': {'uptime': 2}}})
+        self.assertEqual(first.send.await_args_list[-1].args[0], expected)
+        self.assertEqual(second.send.await_args_list[-1].args[0], expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+import unittest.mock
+import os
+import sys
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from db_handler import DBHandler
+from status_record import parse_timestamp
+from migrate_timestamps import migrate_timestamps
+
+
+class TestDBHandler(unittest.TestCase):
+    def setUp(self):
+        self.db_handler = DBHandler()
+        self.db_handler.collection = unittest.mock.MagicMock()
+
+    '''
+        purpose: To verify that parse_timestamp understands the dashboard display format and ISO strings.
+        process: Parses a display-format string, an ISO string, a datetime and garbage.
+        validation: Ensures strings become datetimes, datetimes pass through and garbage returns None.
+    '''
+    def test_parse_timestamp(self):
+        self.assertEqual(parse_timestamp('01/02/2024, 03:04:05 PM'), datetime(2024, 1, 2, 15, 4, 5))
+        self.assertEqual(parse_timestamp('2024-01-02T15:04:05'), datetime(2024, 1, 2, 15, 4, 5))
+        now = datetime.now()
+        self.assertIs(parse_timestamp(now), now)
+        self.assertIsNone(parse_timestamp('not a time'))
+        self.assertIsNone(parse_timestamp(None))
+
+    '''
+        purpose: To verify that save_message_to_db stores native datetimes.
+        process: Saves a message with a display-format time and inspects the inserted document.
+        validation: Ensures time and processed_time are datetime objects, not strings.
+    '''
+    def test_save_message_stores_datetimes(self):
+        self.db_handler.save_message_to_db({
+            'time': '01/02/2024, 03:04:05 PM',
+            'job_id': 'job',
+            'content_id': 'content',
+            'content_type': 'Document',
+        })
+        document = self.db_handler.collection.insert_one.call_args[0][0]
+        self.assertEqual(document['time'], datetime(2024, 1, 2, 15, 4, 5))
+        self.assertIsInstance(document['processed_time'], datetime)
+
+    '''
+        purpose: To verify that init_db creates the history and analytics indexes.
+        process: Mocks MongoClient and calls init_db.
+        validation: Ensures create_index is called for time, job_id, content_id and status/content_type.
+    '''
+    def test_init_db_creates_indexes(self):
+        with unittest.mock.patch('db_handler.MongoClient') as mock_client:
+            collection = mock_client.return_value['dashboard_db']['messages']
+            collection.index_information.return_value = {}
+            db_handler = DBHandler()
+            db_handler.init_db()
+            names = {call.kwargs['name'] for call in collection.create_index.call_args_list}
+            self.assertTrue({'time_desc', 'job_id', 'content_id', 'status_content_type'} <= names)
+            self.assertNotIn('processed_time_ttl', names)
+
+    '''
+        purpose: To verify that the TTL of the raw rows is only lengthened unless shortening was asked for.
+        process: Initialises handlers against an existing 30-day TTL index: a tool, servers with 7 and 60 days, and a server with 7 days and shorten_ttl.
+        validation: Ensures the tool and the 7-day server leave the index and adopt 30 days, while the 60-day and the shortening server change it.
+    '''
+    def test_ttl_is_never_shortened_implicitly(self):
+        def init(*args, **kwargs):
+            with unittest.mock.patch('db_handler.MongoClient') as mock_client:
+                db = mock_client.return_value['dashboard_db']
+                db['messages'].index_information.return_value = {'processed_time_ttl': {'expireAfterSeconds': 30 * 86400}}
+                db['messages'].name = 'messages'
+                db_handler = DBHandler(*args, **kwargs)
+                db_handler.init_db()
+            collmods = [call for call in db.command.call_args_list if call.args[1] == 'messages']
+            return db_handler, [call.kwargs['index']['expireAfterSeconds'] for call in collmods]
+
+        for args, kwargs in (((), {}), ((7,), {'manage_ttl': True})):
+            db_handler, collmods = init(*args, **kwargs)
+            self.assertEqual(collmods, [])
+            self.assertEqual(db_handler.retention_days, 30)
+        self.assertEqual(init(60, manage_ttl=True)[1], [60 * 86400])
+        self.assertEqual(init(7, manage_ttl=True, shorten_ttl=True)[1], [7 * 86400])
+
+    '''
+        purpose: To verify that the timestamp migration converts rows in batches.
+        process: Feeds three string-timestamp rows and one unparseable row with a batch size of two.
+        validation: Ensures two bulk writes are issued and the unparseable row is skipped.
+    '''
+    def test_migrate_timestamps_batches(self):
+        rows = [{'_id': i, 'time': '01/02/2024, 03:04:05 PM'} for i in range(3)]
+        rows.append({'_id': 3, 'time': 'garbage'})
+        collection = unittest.mock.MagicMock()
+        collection.find.return_value.batch_size.return_value = iter(rows)
+        converted, skipped = migrate_timestamps(collection, batch_size=2)
+        self.assertEqual((converted, skipped), (3, 1))
+        self.assertEqual(collection.bulk_write.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from history_cache import HistoryCache
+
+
+class TestHistoryCache(unittest.TestCase):
+    '''
+        purpose: To verify that the cache keeps the newest messages first and stays bounded.
+        process: Loads two messages into a cache of three and adds two more, one of them twice.
+        validation: Ensures the duplicate is ignored, the oldest message is evicted and seq follows the newest.
+    '''
+    def test_add_is_bounded_and_deduplicated(self):
+        cache = HistoryCache(3)
+        cache.load([{'seq': 2}, {'seq': 1}])
+        cache.add({'seq': 3})
+        cache.add({'seq': 3})
+        cache.add({'seq': 4})
+        self.assertEqual([message['seq'] for message, _ in cache.entries], [4, 3, 2])
+        self.assertEqual(cache.seq, 4)
+        self.assertNotIn(1, cache.seqs)
+
+    '''
+        purpose: To verify that changes drop the assembled frames while per-message serialisations survive.
+        process: Fills the frame cache and one item's serialisation, then adds a message.
+        validation: Ensures the frame cache is emptied and the existing item keeps its serialisation.
+    '''
+    def test_add_invalidates_assembled_frames(self):
+        cache = HistoryCache(3)
+        cache.load([{'seq': 1}])
+        cache.frame_cache['json'] = '...'
+        cache.entries[0][1]['json'] = '{"seq": 1}'
+        cache.add({'seq': 2})
+        self.assertEqual(cache.frame_cache, {})
+        self.assertEqual(cache.entries[1][1], {'json': '{"seq": 1}'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import asyncio
+import unittest
+import unittest.mock
+import os
+import sys
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from db_handler import DBHandler
+from job_progress import JobProgressFeed, job_progress
+
+
+class TestJobProgress(unittest.TestCase):
+    '''
+        purpose: To verify that a batch of statuses becomes one atomic upsert per job.
+        process: Saves four statuses for one job (two sent, one stored, one failed) and a sent Audio item and
+                 'Job Stored' event for another job, with the jobs collection mocked.
+        validation: Ensures one bulk write with two upserts carrying the counters, time bounds, expected counts
+                    and the stored flag of the job whose 'Job Stored' event arrived; only 'Stored' completes a
+                    Document or Image, while a sent Audio item is complete.
+    '''
+    def test_update_jobs_batches_per_job(self):
+        db_handler = DBHandler()
+        db_handler.collection = unittest.mock.MagicMock()
+        db_handler.db = unittest.mock.MagicMock()
+        expected = {'Document': 1, 'Image': 2}
+        db_handler.save_messages_to_db([
+            {'job_id': 'job1', 'content_type': 'Document', 'status': 'Processed',
+             'time': '01/02/2024, 03:04:05 PM', 'expected': expected},
+            {'job_id': 'job1', 'content_type': 'Picture', 'status': 'Processed', 'time': '01/02/2024, 03:04:06 PM'},
+            {'job_id': 'job1', 'content_type': 'Document', 'status': 'Stored'},
+            {'job_id': 'job1', 'content_type': 'Picture', 'status': 'Processing Failed'},
+            {'job_id': 'job2', 'content_type': 'Audio', 'status': 'Processed'},
+            {'job_id': 'job2', 'content_type': None, 'status': 'Job Stored'}
+        ])
+        operations = db_handler.db['jobs'].bulk_write.call_args[0][0]
+        self.assertEqual(db_handler.db['jobs'].bulk_write.call_count, 1)
+        self.assertEqual([operation._filter for operation in operations], [{'_id': 'job1'}, {'_id': 'job2'}])
+        update = operations[0]._doc
+        self.assertEqual(update['$inc']['messages'], 4)
+        self.assertEqual(update['$inc']['items_sent'], 2)
+        self.assertEqual(update['$inc']['completed.Document'], 1)
+        self.assertNotIn('completed.Image', update['$inc'])
+        self.assertEqual(update['$inc']['items_failed'], 1)
+        self.assertEqual(update['$inc']['by_type.Image'], 2)
+        self.assertEqual(update['$min']['first_time'], datetime(2024, 1, 2, 15, 4, 5))
+        self.assertEqual(update['$set']['expected_total'], 3)
+        self.assertNotIn('stored', update['$set'])
+        self.assertTrue(operations[1]._doc['$set']['stored'])
+        self.assertEqual(operations[1]._doc['$inc']['completed.Audio'], 1)
+
+    '''
+        purpose: To verify that a jobs row is reported with progress, completion and latency.
+        process: Formats a row with three expected items, two completed (plus an image the job did not announce)
+                 and one failed, then the same row with nothing completed yet.
+        validation: Ensures the job is reported done at 100% with its end-to-end latency, and sent items alone
+                    do not complete it.
+    '''
+    def test_job_progress_report(self):
+        report = job_progress({
+            '_id': 'job1', 'expected': {'Document': 2, 'Image': 1}, 'expected_total': 3, 'items_sent': 3,
+            'completed': {'Document': 2, 'Image': 1}, 'items_failed': 1, 'messages': 4,
+            'first_time': datetime(2024, 1, 2, 15, 4, 5), 'last_time': datetime(2024, 1, 2, 15, 4, 7),
+            'latency_ms_sum': 400.0
+        })
+        self.assertTrue(report['done'])
+        self.assertEqual(report['progress'], 1.0)
+        self.assertEqual((report['sent'], report['completed']), (3, 3))
+        self.assertEqual(report['endToEndMs'], 2000)
+        self.assertEqual(report['avgLatencyMs'], 100)
+        sent_only = job_progress({'_id': 'job1', 'expected': {'Document': 3}, 'expected_total': 3, 'items_sent': 3})
+        self.assertFalse(sent_only['done'])
+        self.assertEqual(sent_only['progress'], 0)
+        self.assertFalse(job_progress({'_id': 'unknown'})['done'])
+
+    '''
+        purpose: To verify that progress updates are pushed only to clients watching the changed job.
+        process: Subscribes one client to job1 and another to job2, then publishes a change to job1.
+        validation: Ensures the job1 watcher gets a second jobProgress frame and the job2 watcher does not.
+    '''
+    def test_feed_pushes_to_watchers(self):
+        feed = JobProgressFeed(lambda job_ids: [{'_id': job_id, 'messages': 1} for job_id in job_ids])
+        first, second = unittest.mock.AsyncMock(), unittest.mock.AsyncMock()
+
+        async def scenario():
+            await feed.subscribe(first, ['job1'])
+            await feed.subscribe(second, ['job2'])
+            await feed.publish({'job1', 'job3'})
+
+        asyncio.run(scenario())
+        self.assertEqual(first.send.call_count, 2)
+        self.assertEqual(second.send.call_count, 1)
+        feed.unsubscribe(first)
+        self.assertNotIn('job1', feed.watchers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import os
+import sys
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from metrics_engine import LatencyHistogram, MetricsEngine
+
+
+class TestMetricsEngine(unittest.TestCase):
+    def make_document(self, content_type='Document', status='Processed', latency_ms=100, processed_time=None):
+        processed_time = processed_time or datetime.now()
+        return {
+            'time': processed_time - timedelta(milliseconds=latency_ms),
+            'processed_time': processed_time,
+            'content_type': content_type,
+            'status': status
+        }
+
+    '''
+        purpose: To verify that the histogram percentiles stay within the configured relative error.
+        process: Records the values 1..1000 ms and reads p50 and p99.
+        validation: Ensures both percentiles are within 5% of the exact values.
+    '''
+    def test_histogram_percentiles(self):
+        histogram = LatencyHistogram(precision=0.05)
+        for value in range(1, 1001):
+            histogram.record(value)
+        self.assertAlmostEqual(histogram.percentile(0.5), 500, delta=25)
+        self.assertAlmostEqual(histogram.percentile(0.99), 990, delta=50)
+        self.assertAlmostEqual(histogram.mean(), 500.5)
+
+    '''
+        purpose: To verify that recorded messages update type, status and throughput counters.
+        process: Records two documents, a picture and a failure, then reads the summary.
+        validation: Ensures Picture folds into Image and the current minute bucket holds all messages.
+    '''
+    def test_record_and_summary(self):
+        engine = MetricsEngine()
+        engine.record(self.make_document())
+        engine.record(self.make_document(content_type='Picture'))
+        engine.record(self.make_document(status='Processing Failed'))
+        summary = engine.summary()
+        self.assertEqual(summary['totalMessages'], 3)
+        self.assertEqual(summary['processedMessages'], 2)
+        self.assertEqual(summary['typeDistribution'], {'Document': 2, 'Image': 1, 'Audio': 0})
+        self.assertEqual(summary['throughputPerMinute'][-1]['count'], 3)
+        self.assertEqual(len(summary['throughputPerMinute']), 60)
+
+    '''
+        purpose: To verify that stale ring buffer slots are not reported as current throughput.
+        process: Records a message two hours ago and one now with a 60 minute ring.
+        validation: Ensures only the current message is counted in the window.
+    '''
+    def test_ring_buffer_expires_old_minutes(self):
+        engine = MetricsEngine(throughput_minutes=60)
+        engine.record(self.make_document(processed_time=datetime.now() - timedelta(hours=2)))
+        engine.record(self.make_document())
+        self.assertEqual(sum(bucket['count'] for bucket in engine.throughput()), 1)
+
+    '''
+        purpose: To verify that the engine can be rebuilt from its snapshot.
+        process: Records messages, snapshots the engine and restores a new one from it.
+        validation: Ensures the restored summary matches the original.
+    '''
+    def test_snapshot_round_trip(self):
+        engine = MetricsEngine()
+        for latency_ms in (10, 20, 30):
+            engine.record(self.make_document(latency_ms=latency_ms))
+        restored = MetricsEngine.from_snapshot(engine.to_snapshot())
+        self.assertEqual(restored.summary(), engine.summary())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from replay_ring import ReplayRing
+
+
+def frame(seq):
+    return {'type': 'newMessage', 'seq': seq, 'data': {'seq': seq}}
+
+
+class TestReplayRing(unittest.TestCase):
+    '''
+        purpose: To verify that a resume inside the ring returns exactly the missed frames in order.
+        process: Appends sequences 1-5 with 4 arriving before 3, then resumes from 2 and from 5.
+        validation: Ensures frames 3, 4, 5 are returned sorted, and nothing is returned when up to date.
+    '''
+    def test_since_returns_gap(self):
+        ring = ReplayRing(10)
+        for seq in (1, 2, 4, 3, 5):
+            ring.append(frame(seq))
+        self.assertEqual([f['seq'] for f in ring.since(2)], [3, 4, 5])
+        self.assertEqual(ring.since(5), [])
+
+    '''
+        purpose: To verify that a gap older than the ring is reported instead of replayed partially.
+        process: Appends 10 frames to a ring of 4 and resumes from sequences before and at its start.
+        validation: Ensures None (snapshot required) for an evicted gap and the full ring otherwise.
+    '''
+    def test_since_reports_evicted_gap(self):
+        ring = ReplayRing(4)
+        for seq in range(1, 11):
+            ring.append(frame(seq))
+        self.assertIsNone(ring.since(5))
+        self.assertEqual([f['seq'] for f in ring.since(6)], [7, 8, 9, 10])
+        self.assertIsNone(ReplayRing(4, covered_from=20).since(19))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import gzip
+import os
+import sys
+import tempfile
+import unittest
+import unittest.mock
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from bson import json_util
+from db_handler import DBHandler
+from retention import RetentionJob, archive_day
+
+
+class TestRetention(unittest.TestCase):
+    '''
+        purpose: To verify that a rollup pass covers exactly the completed minutes and hours since the last pass.
+        process: Runs roll_up at 12:31:40 with minute and hour watermarks at 10:00, with the rollup queries mocked.
+        validation: Ensures minutes [10:00, 12:31) and hours [10:00, 12:00) are rolled and both watermarks advance.
+    '''
+    def test_roll_up_windows(self):
+        db_handler = DBHandler()
+        db_handler.db = unittest.mock.MagicMock()
+        watermark = datetime(2024, 1, 2, 10, 0)
+        db_handler.db['rollup_state'].find_one.return_value = {'_id': 'rollups', 'minute': watermark, 'hour': watermark}
+        with unittest.mock.patch.object(db_handler, 'rollup_minutes') as minutes, \
+                unittest.mock.patch.object(db_handler, 'rollup_hours') as hours:
+            db_handler.roll_up(datetime(2024, 1, 2, 12, 31, 40))
+        minutes.assert_called_once_with(watermark, datetime(2024, 1, 2, 12, 31))
+        hours.assert_called_once_with(watermark, datetime(2024, 1, 2, 12, 0))
+        update = db_handler.db['rollup_state'].update_one.call_args[0][1]['$set']
+        self.assertEqual(update, {'minute': datetime(2024, 1, 2, 12, 31), 'hour': datetime(2024, 1, 2, 12, 0)})
+
+    '''
+        purpose: To verify that completed days are archived once each, before their rows start to expire.
+        process: Runs the archive step twice with a 3-day retention and a mocked row source.
+        validation: Ensures the two intact days are written as gzipped JSON lines and not rewritten.
+    '''
+    def test_archive_completed_days(self):
+        db_handler = unittest.mock.MagicMock()
+        db_handler.retention_days = 3
+        db_handler.find_processed_between.side_effect = lambda since, until: [{'job_id': 'job1', 'time': since}]
+        with tempfile.TemporaryDirectory() as directory:
+            job = RetentionJob(db_handler, archive_dir=directory)
+            job.run_once(datetime(2024, 1, 5, 9, 0))
+            job.run_once(datetime(2024, 1, 5, 10, 0))
+            self.assertEqual(sorted(os.listdir(directory)), ['messages-2024-01-03.jsonl.gz', 'messages-2024-01-04.jsonl.gz'])
+            with gzip.open(os.path.join(directory, 'messages-2024-01-04.jsonl.gz'), 'rt') as archive:
+                rows = [json_util.loads(line) for line in archive]
+            self.assertEqual(archive_day(db_handler, datetime(2024, 1, 4), directory), 0)
+        self.assertEqual(db_handler.find_processed_between.call_count, 2)
+        self.assertEqual(rows[0]['time'], datetime(2024, 1, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import asyncio
+import itertools
+import json
+import unittest
+import unittest.mock
+import os
+import sys
+import websockets
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from event_bus import InMemoryFanout
+from websocket_server import WebSocketServer
+
+
+# Shared by every instance, like the MongoDB counters collection
+sequence = itertools.count(1)
+
+
+def allocate_sequence(count):
+    first = next(sequence)
+    for _ in range(count - 1):
+        next(sequence)
+    return first
+
+
+def make_db_handler(*args, **kwargs):
+    # MongoDB stand-in: empty history, no metrics snapshot, batch saves keep every message
+    db_handler = unittest.mock.MagicMock()
+    db_handler.load_messages.return_value = []
+    db_handler.load_recent_sequenced.return_value = []
+    db_handler.allocate_sequence.side_effect = allocate_sequence
+    db_handler.load_metrics_snapshot.return_value = None
+    db_handler.count_by_type_and_status.return_value = []
+    db_handler.save_messages_to_db.side_effect = lambda messages: [None for _ in messages]
+    return db_handler
+
+
+async def start_instances(count, bus):
+    """Start `count` websocket servers on free ports sharing one broker stand-in."""
+    instances = []
+    for _ in range(count):
+        server = WebSocketServer(bus)
+        ws_server = await server.serve('localhost', 0)
+        port = ws_server.sockets[0].getsockname()[1]
+        instances.append((server, ws_server, f'ws://localhost:{port}'))
+    return instances
+
+
+async def receive_type(websocket, frame_type):
+    while True:
+        frame = json.loads(await asyncio.wait_for(websocket.recv(), timeout=2))
+        if frame['type'] == frame_type:
+            return frame
+
+
+class TestScaleOut(unittest.TestCase):
+    '''
+        purpose: To verify that a status event handled by one instance reaches clients on every instance.
+        process: Starts three instances on one in-memory fanout, connects a client to each and posts a
+                 status message to the first instance only.
+        validation: Ensures it is persisted once and every client receives it as a newMessage.
+    '''
+    def test_every_instance_broadcasts(self):
+        async def scenario():
+            with unittest.mock.patch('websocket_server.DBHandler', side_effect=make_db_handler):
+                instances = await start_instances(3, InMemoryFanout())
+            clients = [await websockets.connect(url) for _, _, url in instances]
+            try:
+                for client in clients:
+                    await receive_type(client, 'initialMessages')
+                status = {'job_id': 'job1', 'content_type': 'Document', 'status': 'Processed'}
+                await clients[0].send(json.dumps(status))
+                received = [await receive_type(client, 'newMessage') for client in clients]
+            finally:
+                for client in clients:
+                    await client.close()
+                for server, ws_server, _ in instances:
+                    await server.stop(ws_server)
+            saves = sum(server.db_handler.save_messages_to_db.call_count for server, _, _ in instances)
+            return received, saves
+
+        received, saves = asyncio.run(scenario())
+        self.assertEqual(saves, 1)
+        self.assertEqual([frame['data']['job_id'] for frame in received], ['job1'] * 3)
+        self.assertEqual(len({frame['seq'] for frame in received}), 1)
+
+    '''
+        purpose: To verify that a client reconnecting to another instance receives only the messages it missed.
+        process: Connects to the first instance, records the last sequence, disconnects, posts two messages
+                 and reconnects to the second instance with lastSeq, then asks for an uncovered sequence.
+        validation: Ensures a single replay frame with exactly the two missed messages, and a snapshotRequired
+                    reply followed by initialMessages when the gap is no longer in the ring.
+    '''
+    def test_resume_replays_only_the_gap(self):
+        async def scenario():
+            with unittest.mock.patch('websocket_server.DBHandler', side_effect=make_db_handler):
+                instances = await start_instances(2, InMemoryFanout())
+            (first, _, first_url), (second, _, second_url) = instances
+            try:
+                client = await websockets.connect(first_url)
+                last_seq = (await receive_type(client, 'initialMessages'))['seq']
+                await client.close()
+
+                poster = await websockets.connect(first_url)
+                await receive_type(poster, 'initialMessages')
+                for job_id in ('missed1', 'missed2'):
+                    await poster.send(json.dumps({'job_id': job_id, 'content_type': 'Document', 'status': 'Processed'}))
+                    await receive_type(poster, 'newMessage')
+                await poster.close()
+
+                client = await websockets.connect(f'{second_url}/?lastSeq={last_seq}')
+                replay = await receive_type(client, 'replay')
+                await client.close()
+
+                # Simulate the ring having evicted the first missed message
+                second.replay_ring.covered_from = replay['data'][0]['seq']
+                client = await websockets.connect(f'{second_url}/?lastSeq={last_seq}')
+                snapshot = [json.loads(await asyncio.wait_for(client.recv(), timeout=2))['type'] for _ in range(2)]
+                await client.close()
+            finally:
+                for server, ws_server, _ in instances:
+                    await server.stop(ws_server)
+            return replay, snapshot
+
+        replay, snapshot = asyncio.run(scenario())
+        self.assertEqual([message['job_id'] for message in replay['data']], ['missed1', 'missed2'])
+        self.assertEqual(replay['seq'], replay['data'][-1]['seq'])
+        self.assertEqual(snapshot, ['snapshotRequired', 'initialMessages'])
+
+    '''
+        purpose: To verify that connects are served from the history cache and that deleting rows invalidates it everywhere.
+        process: Posts a message to the first instance, connects three clients to the second, then clears
+                 invalid rows on the first instance and connects once more.
+        validation: Ensures no history query per connect, the posted message in each snapshot, and an
+                    empty snapshot after the invalidation reloaded the second instance's cache.
+    '''
+    def test_history_cache_serves_connects(self):
+        async def scenario():
+            with unittest.mock.patch('websocket_server.DBHandler', side_effect=make_db_handler):
+                instances = await start_instances(2, InMemoryFanout())
+            (first, _, first_url), (second, _, second_url) = instances
+            first.db_handler.save_messages_to_db.side_effect = lambda messages: [{'status': 'Processed'} for _ in messages]
+            try:
+                poster = await websockets.connect(first_url)
+                await receive_type(poster, 'initialMessages')
+                await poster.send(json.dumps({'job_id': 'cached', 'content_type': 'Document', 'status': 'Processed'}))
+                await receive_type(poster, 'newMessage')
+                await poster.close()
+
+                snapshots = []
+                for _ in range(3):
+                    async with websockets.connect(second_url) as client:
+                        snapshots.append((await receive_type(client, 'initialMessages'))['data'])
+                history_queries = second.db_handler.load_messages.call_count
+
+                first.db_handler.clear_invalid_messages.return_value = 1
+                await asyncio.get_running_loop().run_in_executor(None, first.clear_invalid_messages)
+                await asyncio.sleep(0.05)
+                async with websockets.connect(second_url) as client:
+                    after_clear = (await receive_type(client, 'initialMessages'))['data']
+            finally:
+                for server, ws_server, _ in instances:
+                    await server.stop(ws_server)
+            return snapshots, history_queries, after_clear
+
+        snapshots, history_queries, after_clear = asyncio.run(scenario())
+        self.assertEqual(history_queries, 1)
+        self.assertEqual([[message['job_id'] for message in data] for data in snapshots], [['cached']] * 3)
+        self.assertEqual(after_clear, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
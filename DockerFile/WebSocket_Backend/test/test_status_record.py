@@ -0,0 +1,48 @@
+import unittest
+import os
+import sys
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from status_record import StatusRecord, format_time
+
+
+class TestStatusRecord(unittest.TestCase):
+    '''
+        purpose: To verify that a publisher status becomes the dashboard broadcast form in one pass.
+        process: Normalises a raw picture status with ID, PictureID and FileName.
+        validation: Ensures job and content ids, content type, status and generated message are mapped.
+    '''
+    def test_publisher_form_to_broadcast(self):
+        raw = {'ID': 'job1', 'PictureID': 'pic1', 'FileName': 'cat.png', 'Payload': b'...'}
+        broadcast = StatusRecord.from_message(raw).to_broadcast('01/02/2024, 03:04:05 PM')
+        self.assertEqual(broadcast, {
+            'time': '01/02/2024, 03:04:05 PM',
+            'received_time': '01/02/2024, 03:04:05 PM',
+            'job_id': 'job1',
+            'content_id': 'pic1',
+            'content_type': 'Picture',
+            'file_name': 'cat.png',
+            'status': 'Processed',
+            'message': "Picture file 'cat.png' was successfully processed"
+        })
+
+    '''
+        purpose: To verify that the stored form parses timestamps and fills placeholders for missing fields.
+        process: Normalises a dashboard-form status with only a time, status and sequence number.
+        validation: Ensures a native datetime time, placeholder identifiers and the sequence are stored.
+    '''
+    def test_dashboard_form_to_document(self):
+        processed_time = datetime(2024, 1, 2, 15, 4, 9)
+        record = StatusRecord.from_message({'time': '01/02/2024, 03:04:05 PM', 'status': 'Failed', 'seq': 7})
+        document = record.to_document(processed_time)
+        self.assertEqual(document['time'], datetime(2024, 1, 2, 15, 4, 5))
+        self.assertEqual(document['processed_time'], processed_time)
+        self.assertEqual(document['job_id'], 'Unknown JobID')
+        self.assertEqual(document['content_type'], 'Unknown Type')
+        self.assertEqual(document['status'], 'Failed')
+        self.assertEqual(document['seq'], 7)
+        self.assertEqual(format_time(processed_time.replace(microsecond=5)), '01/02/2024, 03:04:09 PM')
+
+
+if __name__ == '__main__':
+    unittest.main()
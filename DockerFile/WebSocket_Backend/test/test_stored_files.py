@@ -0,0 +1,53 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from stored_files import StoredFiles
+
+
+class TestStoredFiles(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.index_path = os.path.join(self.directory.name, 'index.sqlite')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_index(self):
+        # The tables the Store module's BlobStore keeps
+        db = sqlite3.connect(self.index_path)
+        db.executescript("""
+            CREATE TABLE blobs (digest TEXT PRIMARY KEY, size INTEGER, refcount INTEGER);
+            CREATE TABLE files (job_id TEXT, content_id TEXT, kind TEXT, name TEXT, digest TEXT, stored_at REAL,
+                                PRIMARY KEY (job_id, content_id, kind));
+            INSERT INTO blobs VALUES ('aa11', 100, 2), ('bb22', 5, 1);
+            INSERT INTO files VALUES ('job1', 'doc1', 'document', 'a.pdf', 'aa11', 1700000000),
+                                     ('job1', 'doc1', 'meta', 'a.txt Meta.txt', 'bb22', 1700000001),
+                                     ('job2', 'doc2', 'document', 'a.pdf', 'aa11', 1700000002);
+        """)
+        db.commit()
+        db.close()
+
+    '''
+        purpose: To verify that the dashboard can look up a job's or an item's stored files from the Store index.
+        process: Queries before the index exists, then writes an index with two jobs sharing one blob and queries it.
+        validation: Ensures the lookups are empty until the index exists, then return the files newest first with sizes and sharing counts.
+    '''
+    def test_lookup(self):
+        stored_files = StoredFiles(self.index_path)
+        self.assertEqual(stored_files.lookup(job_id='job1'), [])
+        self.write_index()
+
+        files = stored_files.lookup(job_id='job1')
+        self.assertEqual([f['kind'] for f in files], ['meta', 'document'])
+        self.assertEqual(files[1]['file_name'], 'a.pdf')
+        self.assertEqual((files[1]['size'], files[1]['shared_by']), (100, 2))
+        self.assertEqual(len(stored_files.lookup(job_id='job1', content_id='doc1', limit=1)), 1)
+        self.assertEqual([f['job_id'] for f in stored_files.lookup(content_id='doc2')], ['job2'])
+        self.assertEqual(stored_files.lookup(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from subscription_index import SubscriptionIndex, parse_filters
+
+
+def status(job_id='job1', content_type='Document', status='Processed', file_name='report.pdf'):
+    return {'job_id': job_id, 'content_type': content_type, 'status': status, 'file_name': file_name}
+
+
+class TestSubscriptionIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = SubscriptionIndex()
+
+    '''
+        purpose: To verify that clients without filters receive every message.
+        process: Adds an unfiltered client and a job-filtered client and routes a message for another job.
+        validation: Ensures only the unfiltered client matches.
+    '''
+    def test_unfiltered_client_gets_everything(self):
+        self.index.add('all')
+        self.index.add('job2', parse_filters({'job_id': 'job2'}))
+        self.assertEqual(self.index.match(status()), {'all'})
+
+    '''
+        purpose: To verify that filters combine as AND across fields and OR within a field.
+        process: Subscribes a client to job1 and the Image type (given as a list with Picture normalisation).
+        validation: Ensures Picture messages of job1 match while Documents of job1 and Images of job2 do not.
+    '''
+    def test_conjunctive_filters(self):
+        self.index.add('watcher', parse_filters({'job_id': ['job1'], 'content_type': ['Image', 'Audio']}))
+        self.assertEqual(self.index.match(status(content_type='Picture')), {'watcher'})
+        self.assertEqual(self.index.match(status(content_type='Document')), set())
+        self.assertEqual(self.index.match(status(job_id='job2', content_type='Image')), set())
+
+    '''
+        purpose: To verify file-name prefix filters.
+        process: Subscribes to the 'Project_' prefix and routes two file names.
+        validation: Ensures only names starting with the prefix match.
+    '''
+    def test_file_prefix(self):
+        self.index.add('prefix', parse_filters({'file_prefix': 'Project_'}))
+        self.assertEqual(self.index.match(status(file_name='Project_4.pdf')), {'prefix'})
+        self.assertEqual(self.index.match(status(file_name='x.png')), set())
+
+    '''
+        purpose: To verify that routing only visits clients indexed under the message's values.
+        process: Adds 1000 clients each watching a different job and removes one of them again.
+        validation: Ensures one client matches its job and the removed client's index entry is gone.
+    '''
+    def test_index_scales_with_interested_clients(self):
+        for i in range(1000):
+            self.index.add(f'client{i}', parse_filters({'job_id': f'job{i}'}))
+        self.assertEqual(self.index.match(status(job_id='job42')), {'client42'})
+        self.index.remove('client42')
+        self.assertEqual(self.index.match(status(job_id='job42')), set())
+        self.assertNotIn('job42', self.index.anchors['job_id'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+import unittest.mock
+import os
+import sys
+from collections import namedtuple
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from system_sampler import SystemSampler
+
+NetIO = namedtuple('NetIO', 'bytes_sent bytes_recv')
+DiskIO = namedtuple('DiskIO', 'read_bytes write_bytes')
+
+
+class TestSystemSampler(unittest.TestCase):
+    '''
+        purpose: To verify that the sampler reports per-second rates and never blocks on cpu_percent.
+        process: Mocks psutil counters and the monotonic clock across two samples 2 seconds apart.
+        validation: Ensures rates are the counter deltas divided by elapsed time and cpu_percent uses interval=None.
+    '''
+    def test_sample_derives_rates(self):
+        with unittest.mock.patch('system_sampler.psutil') as mock_psutil, \
+                unittest.mock.patch('system_sampler.time.monotonic', side_effect=[10.0, 12.0]):
+            mock_psutil.net_io_counters.side_effect = [NetIO(1000, 2000), NetIO(3000, 2500)]
+            mock_psutil.disk_io_counters.side_effect = [DiskIO(0, 0), DiskIO(400, 800)]
+            mock_psutil.pids.return_value = [1, 2, 3]
+            sampler = SystemSampler(interval=1)
+            sampler.sample()
+            latest = sampler.sample()
+
+            self.assertEqual(latest['bytesSentPerSecond'], 1000)
+            self.assertEqual(latest['bytesReceivedPerSecond'], 250)
+            self.assertEqual(latest['diskReadBytesPerSecond'], 200)
+            self.assertEqual(latest['diskWriteBytesPerSecond'], 400)
+            self.assertEqual(latest['processCount'], 3)
+            for call in mock_psutil.cpu_percent.call_args_list:
+                self.assertEqual(call.kwargs, {'interval': None})
+
+
+if __name__ == '__main__':
+    unittest.main()
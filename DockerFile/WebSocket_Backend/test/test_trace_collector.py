@@ -0,0 +1,73 @@
+import unittest
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from trace_collector import TraceCollector
+
+
+def item_path():
+    # main_server -> Document module -> Store, as seen on the statuses each stage reports
+    main = {'stage': 'main_server', 'span_id': 'a', 'enqueued': 100.0, 'prepare_ms': 5.0}
+    document = {'stage': 'document_module', 'span_id': 'b', 'enqueued': 100.5}
+    document_status = {'stage': 'document_module', 'span_id': 'c', 'enqueued': 100.6, 'kind': 'status'}
+    store_status = {'stage': 'store', 'span_id': 'd', 'enqueued': 101.0, 'kind': 'status'}
+    dequeued_main = dict(main, dequeued=100.2, consumer='document_module')
+    dequeued_document = dict(document, dequeued=100.7, consumer='store')
+    return [
+        ({'trace_id': 't1', 'hops': [dequeued_main, document_status], 'received': 100.8},
+         {'status': 'Processed', 'file_name': 'a.pdf'}),
+        ({'trace_id': 't1', 'hops': [dequeued_main, dequeued_document, store_status], 'received': 101.5},
+         {'status': 'Stored', 'file_name': 'a.pdf'})
+    ]
+
+
+class TestTraceCollector(unittest.TestCase):
+    '''
+        purpose: To verify that statuses from several stages of one item merge into a single timeline.
+        process: Records the Document module status and the Store status of the same trace.
+        validation: Ensures each hop appears once, in enqueue order, with both statuses and the end-to-end time.
+    '''
+    def test_timeline_merges_hops(self):
+        collector = TraceCollector()
+        for trace, message in item_path():
+            collector.record(trace, message)
+        timeline = collector.timeline('t1')
+        self.assertEqual([hop['span_id'] for hop in timeline['hops']], ['a', 'b', 'c', 'd'])
+        self.assertEqual([status['status'] for status in timeline['statuses']], ['Processed', 'Stored'])
+        self.assertAlmostEqual(timeline['endToEndMs'], 1500)
+        self.assertAlmostEqual(timeline['hops'][0]['queueMs'], 200)
+
+    '''
+        purpose: To verify that shared hops are counted once in the per-stage histograms.
+        process: Records the same two statuses as above and reads the stage summary.
+        validation: Ensures one queue wait per edge and processing times derived from dequeue to next publish.
+    '''
+    def test_stage_summary_counts_each_hop_once(self):
+        collector = TraceCollector()
+        for trace, message in item_path():
+            collector.record(trace, message)
+        summary = collector.stage_summary()
+        self.assertEqual(summary['queueWaitMs']['main_server→document_module']['count'], 1)
+        self.assertEqual(summary['queueWaitMs']['document_module→store']['count'], 1)
+        self.assertEqual(summary['queueWaitMs']['store→dashboard']['count'], 1)
+        self.assertEqual(summary['processingMs']['main_server']['count'], 1)
+        # Item and status hops published after the same dequeue
+        self.assertEqual(summary['processingMs']['document_module']['count'], 2)
+        self.assertAlmostEqual(summary['processingMs']['store']['avg'], 300, delta=15)
+
+    '''
+        purpose: To verify that the collector keeps a bounded number of traces.
+        process: Records five single-hop traces into a collector limited to three.
+        validation: Ensures the oldest traces are dropped and recent() lists the newest first.
+    '''
+    def test_bounded_and_recent_first(self):
+        collector = TraceCollector(max_traces=3)
+        for i in range(5):
+            collector.record({'trace_id': f't{i}', 'received': i + 1.0,
+                              'hops': [{'stage': 'parser', 'span_id': f's{i}', 'enqueued': float(i)}]})
+        self.assertIsNone(collector.timeline('t0'))
+        self.assertEqual([timeline['trace_id'] for timeline in collector.recent(10)], ['t4', 't3', 't2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
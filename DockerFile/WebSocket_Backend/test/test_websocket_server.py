@@ -0,0 +1,102 @@
+import asyncio
+import unittest
+import unittest.mock
+import os
+import sys
+from bson import BSON
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from websocket_server import CONSUMER_PREFETCH, WebSocketServer
+
+
+def make_server():
+    # Bypass __init__ so no MongoDB connection is attempted
+    server = WebSocketServer.__new__(WebSocketServer)
+    server.connected_clients = set()
+    server.db_handler = unittest.mock.MagicMock()
+    server.db_handler.allocate_sequence.return_value = 1
+    server.metrics = unittest.mock.MagicMock()
+    server.event_bus = unittest.mock.MagicMock()
+    return server
+
+
+class TestRabbitMQPipeline(unittest.TestCase):
+    '''
+        purpose: To verify that consumed deliveries are decoded, persisted in one batch, published and acked.
+        process: Feeds three BSON deliveries and one corrupt body through the decode and persist stages.
+        validation: Ensures a single batch save, one published batch of three carrying their trace context,
+                    one multiple-ack and one reject.
+    '''
+    def test_pipeline_batches_and_acks(self):
+        server = make_server()
+        server.consumer = unittest.mock.MagicMock()
+        channel = object()
+
+        async def scenario():
+            server.loop = asyncio.get_running_loop()
+            server.message_queue = asyncio.Queue()
+            deliveries, decoded = asyncio.Queue(), asyncio.Queue()
+            for tag in (1, 2, 3):
+                body = BSON.encode({'job_id': f'job{tag}', 'content_type': 'Document', 'status': 'Processed'})
+                deliveries.put_nowait((channel, tag, body, {'trace_id': f'trace{tag}', 'hops': [], 'received': 0.0}))
+            deliveries.put_nowait((channel, 4, b'not bson', None))
+
+            decode = asyncio.create_task(server.decode_deliveries(deliveries, decoded))
+            await asyncio.sleep(0.05)
+            persist = asyncio.create_task(server.persist_deliveries(decoded))
+            await asyncio.sleep(0.05)
+            decode.cancel()
+            persist.cancel()
+
+        server.db_handler.save_messages_to_db.side_effect = lambda messages: [{} for _ in messages]
+        asyncio.run(scenario())
+        self.assertEqual(server.db_handler.save_messages_to_db.call_count, 1)
+        self.assertEqual(len(server.db_handler.save_messages_to_db.call_args[0][0]), 3)
+        server.event_bus.publish.assert_called_once()
+        events = server.event_bus.publish.call_args[0][0]
+        self.assertEqual([event['trace']['trace_id'] for event in events], ['trace1', 'trace2', 'trace3'])
+        server.consumer.ack.assert_called_once_with(channel, 3, multiple=True)
+        server.consumer.nack.assert_called_once_with(channel, 4, requeue=False)
+
+    '''
+        purpose: To verify that the consumer handoff never drops a delivery when more than a prefetch window is queued.
+        process: Starts the pipeline with the consumer thread mocked and hands over twice the prefetch, as after a reconnect.
+        validation: Ensures the handoff queue is unbounded and holds every delivery.
+    '''
+    def test_handoff_holds_more_than_prefetch(self):
+        server = make_server()
+
+        async def scenario():
+            server.loop = asyncio.get_running_loop()
+            with unittest.mock.patch('websocket_server.DashboardConsumer') as consumer, \
+                    unittest.mock.patch.object(server, 'decode_deliveries', new=unittest.mock.AsyncMock()), \
+                    unittest.mock.patch.object(server, 'persist_deliveries', new=unittest.mock.AsyncMock()):
+                await server.consume_rabbitmq()
+            deliveries = consumer.call_args[0][1]
+            for tag in range(2 * consumer.call_args.kwargs['prefetch']):
+                deliveries.put_nowait((object(), tag, b'', None))
+            return deliveries
+
+        deliveries = asyncio.run(scenario())
+        self.assertEqual(deliveries.maxsize, 0)
+        self.assertEqual(deliveries.qsize(), 2 * CONSUMER_PREFETCH)
+
+
+class TestConvertBsonToJson(unittest.TestCase):
+    '''
+        purpose: To verify that lists of publisher statuses are converted in one batch.
+        process: Converts a list holding a document status and an audio status.
+        validation: Ensures both are normalised and share a single received timestamp.
+    '''
+    def test_list_conversion(self):
+        server = make_server()
+        converted = server.convert_bson_to_json([
+            {'ID': 'job1', 'DocumentId': 'doc1', 'FileName': 'a.pdf'},
+            {'ID': 'job1', 'AudioID': 'aud1', 'FileName': 'b.mp3'}
+        ])
+        self.assertEqual([item['content_type'] for item in converted], ['Document', 'Audio'])
+        self.assertEqual([item['content_id'] for item in converted], ['doc1', 'aud1'])
+        self.assertEqual(converted[0]['received_time'], converted[1]['received_time'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import json
+import unittest
+import unittest.mock
+import os
+import sys
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from wire_format import FrameDecoder, FrameEncoder, MSGPACK_SUBPROTOCOL, JSON_SUBPROTOCOL
+
+JOB_ID = 'ab' * 32
+
+MESSAGE = {
+    'type': 'newMessage',
+    'data': {
+        'time': '01/02/2024, 03:04:05 PM',
+        'job_id': JOB_ID,
+        'content_id': 'not-a-hex-id',
+        'content_type': 'Document',
+        'status': 'Processed'
+    }
+}
+
+
+class TestWireFormat(unittest.TestCase):
+    def make_client(self, subprotocol):
+        websocket = unittest.mock.Mock()
+        websocket.subprotocol = subprotocol
+        return websocket
+
+    '''
+        purpose: To verify that clients without the MessagePack subprotocol keep receiving JSON.
+        process: Encodes one message for a JSON client and a client that negotiated nothing.
+        validation: Ensures both get the same JSON text, serialised once through the shared cache.
+    '''
+    def test_json_fallback(self):
+        encoder = FrameEncoder()
+        clients = [self.make_client(JSON_SUBPROTOCOL), self.make_client(None)]
+        cache = {}
+        frames = []
+        for client in clients:
+            encoder.register(client)
+            frames.append(encoder.encode_for(client, MESSAGE, cache))
+        self.assertEqual(frames, [json.dumps(MESSAGE)] * 2)
+
+    '''
+        purpose: To verify that MessagePack frames round-trip with compact ids and timestamps.
+        process: Encodes two frames for a MessagePack client and decodes them with FrameDecoder.
+        validation: Ensures fields round-trip, the second frame carries no new keys and is smaller than JSON.
+    '''
+    def test_msgpack_round_trip(self):
+        encoder = FrameEncoder()
+        client = self.make_client(MSGPACK_SUBPROTOCOL)
+        encoder.register(client)
+        decoder = FrameDecoder()
+
+        first = encoder.encode_for(client, MESSAGE)
+        second = encoder.encode_for(client, MESSAGE)
+        decoded = decoder.decode(first)
+        self.assertEqual(decoder.decode(second), decoded)
+
+        self.assertEqual(decoded['data']['job_id'], JOB_ID)
+        self.assertEqual(decoded['data']['content_id'], 'not-a-hex-id')
+        self.assertEqual(decoded['data']['time'], datetime(2024, 1, 2, 15, 4, 5))
+        self.assertLess(len(second), len(first))
+        self.assertLess(len(second), len(json.dumps(MESSAGE)) / 2)
+
+    '''
+        purpose: To verify that list frames assembled from cached items decode like a normally encoded frame.
+        process: Encodes a two-item initialMessages frame for a JSON and a MessagePack client with
+                 encode_list_frame, then again after the item cache has been filled.
+        validation: Ensures both decode to the plain frame and cached item serialisations are reused.
+    '''
+    def test_list_frame_matches_plain_frame(self):
+        encoder = FrameEncoder()
+        items = [MESSAGE['data'], dict(MESSAGE['data'], status='Failed')]
+        entries = [[item, {}] for item in items]
+        frame = {'type': 'initialMessages', 'seq': 7}
+        expected = dict(frame, data=items)
+
+        json_client = self.make_client(JSON_SUBPROTOCOL)
+        encoder.register(json_client)
+        self.assertEqual(json.loads(encoder.encode_list_frame(json_client, frame, 'data', entries, {})), expected)
+
+        msgpack_client = self.make_client(MSGPACK_SUBPROTOCOL)
+        encoder.register(msgpack_client)
+        decoded = FrameDecoder().decode(encoder.encode_list_frame(msgpack_client, frame, 'data', entries, {}))
+        self.assertEqual(decoded['data'][1]['status'], 'Failed')
+        self.assertEqual(decoded['data'][0]['job_id'], JOB_ID)
+        self.assertEqual(decoded['seq'], 7)
+
+        with unittest.mock.patch('wire_format.json.dumps', wraps=json.dumps) as dumps:
+            encoder.encode_list_frame(json_client, frame, 'data', entries, {})
+        self.assertEqual(dumps.call_count, 2)  # frame head and field name, no items
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+from collections import OrderedDict
+
+from metrics_engine import LatencyHistogram
+
+# Consumer name recorded on the final hop of every trace delivered to the dashboard queue
+DASHBOARD_STAGE = 'dashboard'
+
+
+def _histogram_summary(histogram):
+    return {
+        'count': histogram.total,
+        'avg': histogram.mean(),
+        'p50': histogram.percentile(0.5),
+        'p95': histogram.percentile(0.95),
+        'p99': histogram.percentile(0.99)
+    }
+
+
+class TraceCollector:
+    """Assembles per-item timelines from the trace headers carried by status messages.
+
+    Each publish site appends a hop (stage, span id, enqueue time) and the consumer of a hop adds
+    its dequeue time, so status messages reaching the dashboard carry the path their item took.
+    Hops are merged by span id, since one item reports several statuses along the way, and every
+    hop is folded into the per-stage histograms once:
+      - queue wait "a→b": b dequeued the message a enqueued
+      - processing "b": time between b dequeuing a message and publishing the next hop
+    """
+
+    def __init__(self, max_traces=1000):
+        self.max_traces = max_traces
+        # trace_id -> {'hops': {span_id: hop}, 'statuses': [...]}, least recently updated first
+        self.traces = OrderedDict()
+        self.queue_wait = {}
+        self.processing = {}
+
+    def _histogram(self, histograms, key):
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = LatencyHistogram()
+        return histogram
+
+    def record(self, trace, message=None):
+        """Fold the trace context of one dashboard delivery ({'trace_id', 'hops', 'received'}) in."""
+        trace_id = trace.get('trace_id') if trace else None
+        if not trace_id:
+            return
+        hops = [dict(hop) for hop in trace.get('hops') or [] if hop.get('span_id')]
+        if hops and trace.get('received') is not None:
+            hops[-1].update(dequeued=trace['received'], consumer=DASHBOARD_STAGE)
+
+        entry = self.traces.pop(trace_id, None) or {'hops': {}, 'statuses': []}
+        self.traces[trace_id] = entry
+        while len(self.traces) > self.max_traces:
+            self.traces.popitem(last=False)
+
+        known = entry['hops']
+        previous = None
+        for hop in hops:
+            stored = known.get(hop['span_id'])
+            if stored is None:
+                # Dequeue details are applied below so a hop first seen already consumed is still counted
+                stored = known[hop['span_id']] = {
+                    key: value for key, value in hop.items() if key not in ('dequeued', 'consumer')}
+                if hop.get('prepare_ms') is not None:
+                    self._histogram(self.processing, hop['stage']).record(hop['prepare_ms'])
+                if previous and previous.get('consumer') == hop['stage'] and previous.get('dequeued') is not None:
+                    self._histogram(self.processing, hop['stage']).record(
+                        (hop['enqueued'] - previous['dequeued']) * 1000)
+            if hop.get('dequeued') is not None and stored.get('dequeued') is None:
+                stored.update(dequeued=hop['dequeued'], consumer=hop.get('consumer'))
+                self._histogram(self.queue_wait, f"{stored['stage']}→{stored['consumer']}").record(
+                    (stored['dequeued'] - stored['enqueued']) * 1000)
+            previous = stored
+
+        if message:
+            entry['statuses'].append({
+                'stage': hops[-1]['stage'] if hops else None,
+                'status': message.get('status'),
+                'content_type': message.get('content_type'),
+                'file_name': message.get('file_name'),
+                'at': trace.get('received')
+            })
+
+    def timeline(self, trace_id):
+        """Hops of one trace in enqueue order, with per-hop queue wait, or None if unknown."""
+        entry = self.traces.get(trace_id)
+        if entry is None:
+            return None
+        hops = sorted(entry['hops'].values(), key=lambda hop: hop['enqueued'])
+        started = hops[0]['enqueued'] if hops else None
+        finished = max((hop.get('dequeued') or hop['enqueued'] for hop in hops), default=None)
+        return {
+            'trace_id': trace_id,
+            'startedAt': started,
+            'endToEndMs': (finished - started) * 1000 if hops else 0,
+            'hops': [{
+                'stage': hop['stage'],
+                'span_id': hop['span_id'],
+                'kind': hop.get('kind', 'item'),
+                'consumer': hop.get('consumer'),
+                'enqueuedMs': (hop['enqueued'] - started) * 1000,
+                'queueMs': (hop['dequeued'] - hop['enqueued']) * 1000 if hop.get('dequeued') is not None else None,
+                'prepareMs': hop.get('prepare_ms')
+            } for hop in hops],
+            'statuses': list(entry['statuses'])
+        }
+
+    def recent(self, limit=20):
+        """Timelines of the most recently updated traces, newest first."""
+        trace_ids = list(self.traces)[-limit:] if limit else []
+        return [self.timeline(trace_id) for trace_id in reversed(trace_ids)]
+
+    def stage_summary(self):
+        return {
+            'queueWaitMs': {key: _histogram_summary(h) for key, h in sorted(self.queue_wait.items())},
+            'processingMs': {key: _histogram_summary(h) for key, h in sorted(self.processing.items())},
+            'tracesTracked': len(self.traces)
+        }
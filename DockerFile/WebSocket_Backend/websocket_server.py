@@ -1,107 +1,266 @@
+import argparse
 import asyncio
-from datetime import datetime
+import os
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs, urlparse
 
 import websockets
-import json
-import pika
+from websockets.extensions.permessage_deflate import ServerPerMessageDeflateFactory
 from bson import BSON, ObjectId
-from db_handler import DBHandler
-import psutil
+from analytics_feed import AnalyticsFeed
+from dashboard_consumer import DashboardConsumer
+from db_handler import DBHandler, RETENTION_DAYS
+from event_bus import InMemoryFanout, RabbitMQFanout
+from history_cache import HistoryCache
+from job_progress import JobProgressFeed
+from metrics_engine import MetricsEngine
+from replay_ring import ReplayRing
+from retention import RetentionJob
+from status_record import StatusRecord, format_time
+from stored_files import StoredFiles
+from subscription_index import SubscriptionIndex, parse_filters
+from system_sampler import SystemSampler
+from trace_collector import TraceCollector
+from wire_format import FrameEncoder, available_subprotocols
+
+# Seconds between rolling metrics snapshots written to MongoDB
+METRICS_SNAPSHOT_INTERVAL = 30
+# Seconds between host metric samples (CPU, memory, disk, network, processes)
+SYSTEM_SAMPLE_INTERVAL = 5
+# Seconds between analytics pushes to subscribed clients
+ANALYTICS_PUSH_INTERVAL = 5
+# Unacked Dashboard deliveries the broker may push to this process
+CONSUMER_PREFETCH = 200
+# Maximum status messages persisted per MongoDB round trip
+PERSIST_BATCH_SIZE = 100
+# permessage-deflate tuning: smaller windows and memLevel cut per-connection memory for small frames
+DEFLATE_WINDOW_BITS = 11
+DEFLATE_MEM_LEVEL = 4
+# Broadcast frames kept for resuming reconnecting clients
+REPLAY_RING_SIZE = 5000
+# Most recent messages sent to a connecting client, served from memory
+HISTORY_CACHE_SIZE = 1000
+# Index the Store module keeps of the files it has written (STORE_ROOT/index.sqlite)
+STORE_INDEX = os.environ.get('STORE_INDEX', os.path.join('..', 'ConsumerDemo', 'Store', 'store', 'index.sqlite'))
 
 
 class WebSocketServer:
-    def __init__(self):
+    def __init__(self, event_bus=None, retention_days=None, archive_dir=None, store_index=None,
+                 shorten_retention=False):
         self.connected_clients = set()
-        self.db_handler = DBHandler()
+        # Persisted events go through the bus so every instance (in scale-out mode) broadcasts them
+        self.event_bus = event_bus or InMemoryFanout()
+        self.background_tasks = []
+        self.db_handler = DBHandler(RETENTION_DAYS if retention_days is None else retention_days,
+                                    manage_ttl=True, shorten_ttl=shorten_retention)
         self.db_handler.init_db()
         self.message_queue = asyncio.Queue()
         self.start_time = datetime.now()
-
-    def convert_bson_to_json(self, data):
+        self.metrics = self.restore_metrics()
+        self.replay_ring = self.restore_replay_ring()
+        self.history = HistoryCache(HISTORY_CACHE_SIZE)
+        self.history.load(self.load_history())
+        self.system_sampler = SystemSampler(SYSTEM_SAMPLE_INTERVAL)
+        self.encoder = FrameEncoder()
+        self.subscriptions = SubscriptionIndex()
+        self.analytics_feed = AnalyticsFeed(self.get_analytics_data, ANALYTICS_PUSH_INTERVAL, self.encoder)
+        self.job_progress = JobProgressFeed(self.db_handler.get_jobs, self.encoder)
+        # Per-item timelines and per-stage latencies from the trace headers the modules propagate
+        self.traces = TraceCollector()
+        # Rolls expiring raw rows up into per-minute/per-hour aggregates (and archives them if configured)
+        self.retention = RetentionJob(self.db_handler, archive_dir=archive_dir)
+        # Files the Store module has on disk, from its index
+        self.stored_files = StoredFiles(store_index or STORE_INDEX)
+
+    def restore_metrics(self):
+        snapshot = self.db_handler.load_metrics_snapshot()
+        if snapshot:
+            print("Rolling metrics restored from snapshot")
+            return MetricsEngine.from_snapshot(snapshot)
+
+        # First start without a snapshot: seed the counters once from the stored history
+        metrics = MetricsEngine()
+        metrics.seed_counts(self.db_handler.count_by_type_and_status())
+        return metrics
+
+    def restore_replay_ring(self):
+        # Seed from the newest stored messages so clients can still resume across a restart or deploy
+        documents = self.db_handler.load_recent_sequenced(REPLAY_RING_SIZE)
+        # A full load may have cut older history off, so only the loaded range is covered
+        covered_from = documents[0]['seq'] - 1 if len(documents) == REPLAY_RING_SIZE else 0
+        ring = ReplayRing(REPLAY_RING_SIZE, covered_from)
+        for document in documents:
+            ring.append({'type': 'newMessage', 'seq': document['seq'], 'data': self.convert_bson_to_json(document)})
+        return ring
+
+    def load_history(self):
+        return [self.convert_bson_to_json(msg) for msg in self.db_handler.load_messages(HISTORY_CACHE_SIZE)]
+
+    def clear_invalid_messages(self):
+        # Deleting rows invalidates the cached history on every instance, not just this one
+        if self.db_handler.clear_invalid_messages():
+            self.event_bus.publish([{'invalidate': 'history'}])
+
+    def store_messages(self, json_messages, traces=None):
+        # Persist once, then fan out; metrics and broadcast happen when each instance receives the event
+        first_seq = self.db_handler.allocate_sequence(len(json_messages))
+        for offset, json_message in enumerate(json_messages):
+            json_message['seq'] = first_seq + offset
+        documents = self.db_handler.save_messages_to_db(json_messages)
+        traces = traces or [None] * len(json_messages)
+        self.event_bus.publish([
+            {'data': json_message, 'document': document, 'trace': trace}
+            for json_message, document, trace in zip(json_messages, documents, traces)
+        ])
+
+    def convert_bson_to_json(self, data, received_time=None):
         if isinstance(data, bytes):
             return data.decode('utf-8', errors='replace')
         elif isinstance(data, ObjectId):
             return str(data)
+        elif isinstance(data, datetime):
+            return format_time(data)
         elif isinstance(data, dict):
             # Convert the message to the expected format
             if 'ID' in data:
-                return {
-                    'time': data.get('time', datetime.now().strftime('%m/%d/%Y, %I:%M:%S %p')),
-                    'received_time': datetime.now().strftime('%m/%d/%Y, %I:%M:%S %p'),
-                    'job_id': data.get('ID'),
-                    'content_id': data.get('DocumentId') or data.get('PictureID') or data.get('AudioID'),
-                    'content_type': self._determine_content_type(data),
-                    'file_name': data.get('FileName'),
-                    'status': 'Processed',
-                    'message': self._generate_message(data)
-                }
-            return {k: self.convert_bson_to_json(v) for k, v in data.items()}
+                return StatusRecord.from_message(data).to_broadcast(received_time or format_time(datetime.now()))
+            return {k: self.convert_bson_to_json(v, received_time) for k, v in data.items()}
         elif isinstance(data, list):
-            return [self.convert_bson_to_json(item) for item in items]
+            # Items of one list share a single received timestamp
+            received_time = received_time or format_time(datetime.now())
+            return [self.convert_bson_to_json(item, received_time) for item in data]
         return data
 
-    def _determine_content_type(self, data):
-        if 'DocumentId' in data:
-            return 'Document'
-        elif 'PictureID' in data:
-            return 'Picture'
-        elif 'AudioID' in data:
-            return 'Audio'
-        return data.get('content_type', 'Unknown Type')
-
-    def _generate_message(self, data):
-        file_name = data.get('FileName', 'unknown file')
-        if 'DocumentId' in data:
-            return f"Document file '{file_name}' was successfully processed"
-        elif 'PictureID' in data:
-            return f"Picture file '{file_name}' was successfully processed"
-        elif 'AudioID' in data:
-            return f"Audio file '{file_name}' was successfully processed"
-        return 'No additional information'
+    async def send_frame(self, websocket, message):
+        # JSON or MessagePack depending on the subprotocol negotiated by this client
+        await websocket.send(self.encoder.encode_for(websocket, message))
 
     async def send_initial_messages(self, websocket):
         try:
-            messages = self.db_handler.load_messages()
-            serialized_messages = [self.convert_bson_to_json(msg) for msg in messages]
-            await websocket.send(json.dumps({
-                'type': 'initialMessages',
-                'data': serialized_messages
-            }))
+            # Assembled from the in-memory history; only messages added since the last connect are serialised
+            await websocket.send(self.encoder.encode_list_frame(
+                websocket,
+                {'type': 'initialMessages', 'seq': self.history.seq},
+                'data',
+                self.history.entries,
+                self.history.frame_cache
+            ))
         except Exception as e:
             print(f"Error sending initial messages: {e}")
             raise
 
+    async def resume_or_send_initial_messages(self, websocket):
+        # Reconnecting clients pass the last sequence they saw: ws://host:port/?lastSeq=<n>
+        query = parse_qs(urlparse(getattr(websocket, 'path', '') or '').query)
+        try:
+            last_seen = int(query['lastSeq'][0])
+        except (KeyError, ValueError):
+            await self.send_initial_messages(websocket)
+            return
+
+        frames = self.replay_ring.since(last_seen)
+        if frames is None:
+            # The gap has fallen out of the ring; the client has to start from a full snapshot
+            await self.send_frame(websocket, {'type': 'snapshotRequired', 'lastSeq': last_seen})
+            await self.send_initial_messages(websocket)
+            return
+        await self.send_frame(websocket, {
+            'type': 'replay',
+            'seq': frames[-1]['seq'] if frames else last_seen,
+            'data': [frame['data'] for frame in frames]
+        })
+
     async def handle_client(self, websocket):
         try:
             self.connected_clients.add(websocket)
-            print(f"Client connected. Total clients: {len(self.connected_clients)}")
+            self.encoder.register(websocket)
+            # Clients receive every status message until they send a 'subscribe' with filters
+            self.subscriptions.add(websocket)
+            print(f"Client connected ({websocket.subprotocol or 'json'}). Total clients: {len(self.connected_clients)}")
 
-            await self.send_initial_messages(websocket)
-            broadcast_task = asyncio.create_task(self.broadcast_messages(websocket))
+            await self.resume_or_send_initial_messages(websocket)
 
             async for message in websocket:
                 try:
-                    message_data = json.loads(message)
+                    message_data = self.encoder.decode_incoming(message)
 
                     if message_data.get('type') == 'getAnalytics':
                         analytics_data = await self.get_analytics_data()
-                        await websocket.send(json.dumps({
+                        await self.send_frame(websocket, {
                             'type': 'analytics',
                             'data': analytics_data
-                        }))
+                        })
                         print("Analytics response sent")
                         continue
 
-                    json_message = self.convert_bson_to_json(message_data)
+                    if message_data.get('type') == 'getThroughputHistory':
+                        # Long-range throughput from the rollups: unit 'minute' or 'hour', optional 'hours' back
+                        unit = 'minute' if message_data.get('unit') == 'minute' else 'hour'
+                        since = datetime.now() - timedelta(hours=message_data['hours']) if message_data.get('hours') else None
+                        history = await self.loop.run_in_executor(
+                            None, self.db_handler.get_throughput_history, unit, since)
+                        await self.send_frame(websocket, {'type': 'throughputHistory', 'unit': unit, 'data': history})
+                        continue
 
-                    # Save the message to the database
-                    self.db_handler.save_message_to_db(json_message)
+                    if message_data.get('type') in ('jobProgress', 'subscribeJobProgress', 'unsubscribeJobProgress'):
+                        # job_ids (or a single job_id); subscribers get a jobProgress frame whenever those jobs change
+                        job_ids = message_data.get('job_ids') or [message_data.get('job_id')]
+                        job_ids = [job_id for job_id in job_ids if job_id]
+                        if message_data['type'] == 'unsubscribeJobProgress':
+                            self.job_progress.unsubscribe(websocket)
+                        elif message_data['type'] == 'subscribeJobProgress':
+                            await self.job_progress.subscribe(websocket, job_ids)
+                        else:
+                            await self.send_frame(websocket, {
+                                'type': 'jobProgress',
+                                'data': await self.job_progress.query(job_ids)
+                            })
+                        continue
 
-                    # Put the message in the queue for broadcasting
-                    await self.message_queue.put({
-                        'type': 'newMessage',
-                        'data': json_message
-                    })
+                    if message_data.get('type') == 'getTraces':
+                        # A single timeline by trace_id, or the most recent ones ('limit', default 20)
+                        if message_data.get('trace_id'):
+                            data = [self.traces.timeline(message_data['trace_id'])]
+                        else:
+                            data = self.traces.recent(int(message_data.get('limit', 20)))
+                        await self.send_frame(websocket, {
+                            'type': 'traces',
+                            'data': [timeline for timeline in data if timeline],
+                            'stages': self.traces.stage_summary()
+                        })
+                        continue
+
+                    if message_data.get('type') == 'getStoredFiles':
+                        # The stored files of a job_id and/or content_id ('limit', default 100)
+                        data = await self.loop.run_in_executor(
+                            None, self.stored_files.lookup, message_data.get('job_id'),
+                            message_data.get('content_id'), int(message_data.get('limit', 100)))
+                        await self.send_frame(websocket, {'type': 'storedFiles', 'data': data})
+                        continue
+
+                    if message_data.get('type') == 'subscribeAnalytics':
+                        # Optional 'fields' is a list of dotted paths, e.g. ['performanceStats.cpuUtilization']
+                        await self.analytics_feed.subscribe(websocket, message_data.get('fields'))
+                        continue
+
+                    if message_data.get('type') == 'unsubscribeAnalytics':
+                        self.analytics_feed.unsubscribe(websocket)
+                        continue
+
+                    if message_data.get('type') == 'subscribe':
+                        # filters: job_id, content_type, status, file_prefix (string or list); {} = everything
+                        filters = parse_filters(message_data.get('filters'))
+                        self.subscriptions.add(websocket, filters)
+                        await self.send_frame(websocket, {
+                            'type': 'subscribed',
+                            'filters': {field: sorted(values) for field, values in filters.items()}
+                        })
+                        continue
+
+                    json_message = self.convert_bson_to_json(message_data)
+
+                    # Save the message to the database and publish it for broadcasting
+                    await self.loop.run_in_executor(None, self.store_messages, [json_message])
                 except Exception as e:
                     print(f"Error processing message: {e}")
                     continue
@@ -111,19 +270,25 @@ class WebSocketServer:
         except Exception as e:
             print(f"Error in WebSocket handler: {e}")
         finally:
-            self.connected_clients.remove(websocket)
-            broadcast_task.cancel()
+            self.connected_clients.discard(websocket)
+            self.subscriptions.remove(websocket)
+            self.analytics_feed.unsubscribe(websocket)
+            self.job_progress.unsubscribe(websocket)
+            self.encoder.unregister(websocket)
             print(f"Client disconnected. Total clients: {len(self.connected_clients)}")
 
-    async def broadcast_messages(self, websocket):
+    async def broadcast_messages(self):
         try:
             while True:
                 message = await self.message_queue.get()
                 websockets_to_remove = set()
+                # Serialise once per encoding, not once per client
+                frame_cache = {}
 
-                for client in self.connected_clients:
+                # Only clients whose filters match the status message are visited
+                for client in self.subscriptions.match(message['data']):
                     try:
-                        await client.send(json.dumps(message))
+                        await client.send(self.encoder.encode_for(client, message, frame_cache))
                     except websockets.ConnectionClosed:
                         websockets_to_remove.add(client)
                     except Exception as e:
@@ -131,127 +296,203 @@ class WebSocketServer:
                         websockets_to_remove.add(client)
 
                 self.connected_clients -= websockets_to_remove
+                for client in websockets_to_remove:
+                    self.subscriptions.remove(client)
                 self.message_queue.task_done()
         except asyncio.CancelledError:
             pass
 
     async def consume_rabbitmq(self):
-        def callback(ch, method, properties, body):
-            try:
-                message = BSON(body).decode()
-                json_message = self.convert_bson_to_json(message)
+        # consumer thread -> decode -> persist (batched) -> broadcast; every stage is bounded by
+        # the broker prefetch because deliveries are only acked after they are persisted.
+        # The handoff itself is unbounded: after a reconnect, deliveries of the old channel still
+        # queued here plus a full window of the new one exceed the prefetch, and the consumer
+        # thread's put_nowait must never drop one
+        deliveries = asyncio.Queue()
+        decoded = asyncio.Queue(maxsize=CONSUMER_PREFETCH)
+        self.consumer = DashboardConsumer(self.loop, deliveries, prefetch=CONSUMER_PREFETCH)
+        self.consumer.start()
+        try:
+            await asyncio.gather(
+                self.decode_deliveries(deliveries, decoded),
+                self.persist_deliveries(decoded)
+            )
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.consumer.stop()
 
-                # Print debug information
-                print(f"Received RabbitMQ message: {json_message}")
+    async def decode_deliveries(self, deliveries, decoded):
+        while True:
+            channel, delivery_tag, body, trace = await deliveries.get()
+            try:
+                json_message = self.convert_bson_to_json(BSON(body).decode())
+            except Exception as e:
+                print(f"Dropping undecodable RabbitMQ message: {e}")
+                self.consumer.nack(channel, delivery_tag, requeue=False)
+                continue
+            await decoded.put((channel, delivery_tag, json_message, trace))
 
-                # Save the message to the database
-                self.db_handler.save_message_to_db(json_message)
+    async def persist_deliveries(self, decoded):
+        while True:
+            batch = [await decoded.get()]
+            while len(batch) < PERSIST_BATCH_SIZE and not decoded.empty():
+                batch.append(decoded.get_nowait())
+            json_messages = [json_message for _, _, json_message, _ in batch]
+            traces = [trace for _, _, _, trace in batch]
 
-                # Put the message in the queue for broadcasting
-                asyncio.run_coroutine_threadsafe(
-                    self.message_queue.put({
-                        'type': 'newMessage',
-                        'data': json_message
-                    }),
-                    self.loop
-                )
+            try:
+                await self.loop.run_in_executor(None, self.store_messages, json_messages, traces)
             except Exception as e:
-                print(f"Error processing RabbitMQ message: {e}")
+                print(f"Error persisting RabbitMQ messages, requeueing {len(batch)}: {e}")
+                for channel, delivery_tag, _, _ in batch:
+                    self.consumer.nack(channel, delivery_tag)
+                await asyncio.sleep(1)
+                continue
 
-        try:
-            connection = await self.loop.run_in_executor(
-                None,
-                lambda: pika.BlockingConnection(pika.ConnectionParameters('localhost'))
-            )
-            channel = await self.loop.run_in_executor(None, connection.channel)
+            # Deliveries arrive in order, so one multiple-ack per channel settles the whole batch
+            last_tags = {}
+            for channel, delivery_tag, _, _ in batch:
+                last_tags[channel] = delivery_tag
+            for channel, delivery_tag in last_tags.items():
+                self.consumer.ack(channel, delivery_tag, multiple=True)
 
-            queue_name = 'Dashboard'
-            await self.loop.run_in_executor(
-                None,
-                lambda: channel.queue_declare(queue=queue_name, durable=True)
-            )
+    async def relay_events(self):
+        # Every instance receives every persisted event, whichever instance consumed it
+        events = self.event_bus.bind(self.loop)
+        try:
+            while True:
+                changed_jobs = set()
+                for event in await events.get():
+                    if event.get('invalidate') == 'history':
+                        self.history.load(await self.loop.run_in_executor(None, self.load_history))
+                        continue
+                    if event.get('document'):
+                        self.metrics.record(event['document'])
+                        self.history.add(event['data'])
+                        changed_jobs.add(event['document'].get('job_id'))
+                    if event.get('trace'):
+                        self.traces.record(event['trace'], event['data'])
+                    frame = {
+                        'type': 'newMessage',
+                        'seq': event['data'].get('seq'),
+                        'data': event['data']
+                    }
+                    if frame['seq'] is not None:
+                        self.replay_ring.append(frame)
+                    await self.message_queue.put(frame)
+                if changed_jobs and self.job_progress.watchers:
+                    # The persisting instance updated the jobs rows before publishing this batch
+                    self.loop.create_task(self.job_progress.publish(changed_jobs))
+        except asyncio.CancelledError:
+            pass
 
-            channel.basic_consume(
-                queue=queue_name,
-                on_message_callback=callback,
-                auto_ack=True
-            )
+    async def snapshot_metrics(self):
+        try:
+            while True:
+                await asyncio.sleep(METRICS_SNAPSHOT_INTERVAL)
+                snapshot = self.metrics.to_snapshot()
+                await self.loop.run_in_executor(None, self.db_handler.save_metrics_snapshot, snapshot)
+        except asyncio.CancelledError:
+            self.db_handler.save_metrics_snapshot(self.metrics.to_snapshot())
+            raise
 
-            await self.loop.run_in_executor(None, channel.start_consuming)
-        except Exception as e:
-            print(f"Error in RabbitMQ consumer: {e}")
+    async def serve(self, host="localhost", port=5001):
+        self.loop = asyncio.get_running_loop()
+        server = await websockets.serve(
+            self.handle_client, host, port,
+            subprotocols=available_subprotocols(),
+            compression=None,
+            extensions=[ServerPerMessageDeflateFactory(
+                server_max_window_bits=DEFLATE_WINDOW_BITS,
+                client_max_window_bits=DEFLATE_WINDOW_BITS,
+                compress_settings={'memLevel': DEFLATE_MEM_LEVEL}
+            )]
+        )
+        for coroutine in (self.relay_events(), self.broadcast_messages(), self.snapshot_metrics(),
+                          self.system_sampler.run(), self.analytics_feed.run(), self.retention.run()):
+            self.background_tasks.append(asyncio.create_task(coroutine))
+        return server
+
+    async def stop(self, server):
+        server.close()
+        await server.wait_closed()
+        for task in self.background_tasks:
+            task.cancel()
+        await asyncio.gather(*self.background_tasks, return_exceptions=True)
 
-    async def start(self):
-        self.loop = asyncio.get_event_loop()
-        server = await websockets.serve(self.handle_client, "localhost", 5001)
+    async def start(self, host="localhost", port=5001):
+        server = await self.serve(host, port)
+        await self.loop.run_in_executor(None, self.clear_invalid_messages)
 
         # Start RabbitMQ consumer in the background
-        asyncio.create_task(self.consume_rabbitmq())
+        self.background_tasks.append(asyncio.create_task(self.consume_rabbitmq()))
 
-        print("WebSocket server started on ws://localhost:5001")
+        print(f"WebSocket server started on ws://{host}:{port}")
         await server.wait_closed()
 
     async def get_analytics_data(self):
-        messages = self.db_handler.load_messages()
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
-
-        # Network metrics
-        network = psutil.net_io_counters()
-        bytes_sent = network.bytes_sent
-        bytes_recv = network.bytes_recv
+        # Message statistics come from the incrementally maintained counters
+        summary = self.metrics.summary()
+        # Host metrics come from the latest background sample; never sample on the request path
+        system = self.system_sampler.latest
 
-        response_times = []
-
-        for msg in messages:
-            try:
-                received_time = datetime.strptime(msg['time'], '%m/%d/%Y, %I:%M:%S %p')
-                processed_time = datetime.strptime(msg['processed_time'], '%m/%d/%Y, %I:%M:%S %p')
-                response_times.append((processed_time - received_time).total_seconds())
-            except (KeyError, ValueError):
-                continue
-
-        avg_response_time = sum(response_times) / len(response_times) if response_times else 0
-
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
+        total_messages = summary['totalMessages']
+        throughput = summary['throughputPerMinute']
 
         analytics = {
             'performanceStats': {
-                'peakThroughput': len(messages),
+                'peakThroughput': max((bucket['count'] for bucket in throughput), default=0),
+                'throughputPerMinute': throughput,
+                'averageResponseTime': summary['latencyMs']['avg'] / 1000,
+                'latencyPercentiles': summary['latencyMs'],
                 'currentLoad': len(self.connected_clients),
                 'uptime': (datetime.now() - self.start_time).total_seconds(),
-                'cpuUtilization': cpu_percent,
-                'memoryUsage': memory.percent,
-                'diskUsage': disk.percent,
-                'processCount': len(psutil.pids()),
+                'cpuUtilization': system['cpuUtilization'],
+                'memoryUsage': system['memoryUsage'],
+                'diskUsage': system['diskUsage'],
+                'diskReadBytesPerSecond': system['diskReadBytesPerSecond'],
+                'diskWriteBytesPerSecond': system['diskWriteBytesPerSecond'],
+                'processCount': system['processCount'],
                 'networkStats': {  # Moved inside performanceStats
-                    'bytesSent': network.bytes_sent,
-                    'bytesReceived': network.bytes_recv,
+                    'bytesSent': system['bytesSent'],
+                    'bytesReceived': system['bytesReceived'],
+                    'bytesSentPerSecond': system['bytesSentPerSecond'],
+                    'bytesReceivedPerSecond': system['bytesReceivedPerSecond'],
                     'activeConnections': len(self.connected_clients),
-                    'messageRate': len(messages) / max(1, (datetime.now() - self.start_time).total_seconds())
+                    'messageRate': summary['messageRate']
                 }
             },
             'fileStats': {
-                'totalFilesProcessed': len(messages),
-                'fileTypeDistribution': {
-                    'Document': sum(1 for m in messages if m.get('content_type') == 'Document'),
-                    'Image': sum(1 for m in messages if m.get('content_type') in ['Image', 'Picture']),
-                    'Audio': sum(1 for m in messages if m.get('content_type') == 'Audio')
-                }
+                'totalFilesProcessed': total_messages,
+                'fileTypeDistribution': summary['typeDistribution']
             },
             'systemHealth': {
                 'activeConnections': len(self.connected_clients),
-                'queueDepth': len(messages),
-                'successRate': 100 * sum(1 for m in messages if m.get('status') == 'Processed') / len(
-                    messages) if messages else 100  # noqa
-            }
+                'queueDepth': self.message_queue.qsize(),
+                'successRate': 100 * summary['processedMessages'] / total_messages if total_messages else 100
+            },
+            'traceStats': self.traces.stage_summary()
         }
         return analytics
 
 
 if __name__ == "__main__":
-    server = WebSocketServer()
-    asyncio.run(server.start())
+    parser = argparse.ArgumentParser(description="Dashboard WebSocket server")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--scale-out', action='store_true',
+                        help='share status events with other instances through the DashboardEvents fanout exchange')
+    parser.add_argument('--retention-days', type=float, default=None,
+                        help='days raw status rows are kept before they expire (rollups are kept longer)')
+    parser.add_argument('--shorten-retention', action='store_true',
+                        help='allow --retention-days to lower the retention already configured in MongoDB')
+    parser.add_argument('--archive-dir', default=None,
+                        help='write each completed day of raw rows to a gzipped JSON lines file here')
+    parser.add_argument('--store-index', default=None,
+                        help=f'index of the Store module, for getStoredFiles queries (default {STORE_INDEX})')
+    args = parser.parse_args()
+
+    server = WebSocketServer(RabbitMQFanout() if args.scale_out else None, args.retention_days, args.archive_dir,
+                             args.store_index, args.shorten_retention)
+    asyncio.run(server.start(args.host, args.port))
@@ -0,0 +1,168 @@
+import json
+import re
+from datetime import datetime
+from functools import lru_cache
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; every client then falls back to JSON
+    msgpack = None
+
+from status_record import parse_timestamp
+
+# WebSocket subprotocols a client can offer in its handshake; no subprotocol means JSON
+JSON_SUBPROTOCOL = 'dashboard.json'
+MSGPACK_SUBPROTOCOL = 'dashboard.msgpack'
+
+# Fields sent as integer epoch seconds in compact frames
+TIME_FIELDS = {'time', 'received_time', 'processed_time'}
+# Fields holding 64-char hex ids, sent as 32 raw bytes in compact frames
+ID_FIELDS = {'job_id', 'content_id'}
+HEX_ID = re.compile(r'^[0-9a-f]{64}$')
+
+
+def available_subprotocols():
+    """Subprotocols to offer in the handshake, most compact first."""
+    if msgpack is None:
+        return [JSON_SUBPROTOCOL]
+    return [MSGPACK_SUBPROTOCOL, JSON_SUBPROTOCOL]
+
+
+class KeyDictionary:
+    """Append-only server-wide mapping from field names to small integers."""
+
+    def __init__(self):
+        self.codes = {}
+        self.keys = []
+
+    def code(self, key):
+        code = self.codes.get(key)
+        if code is None:
+            code = len(self.keys)
+            self.codes[key] = code
+            self.keys.append(key)
+        return code
+
+
+@lru_cache(maxsize=4096)
+def _epoch_seconds(value):
+    # Status timestamps have one-second resolution, so consecutive messages mostly hit the cache
+    parsed = parse_timestamp(value)
+    return int(parsed.timestamp()) if parsed is not None else None
+
+
+def compact(value, dictionary, key=None):
+    """Rewrite a frame for MessagePack: integer keys, epoch timestamps and binary ids."""
+    if isinstance(value, dict):
+        return {dictionary.code(k): compact(v, dictionary, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [compact(item, dictionary) for item in value]
+    if key in TIME_FIELDS and isinstance(value, str):
+        epoch = _epoch_seconds(value)
+        if epoch is not None:
+            return epoch
+    if key in ID_FIELDS and isinstance(value, str) and HEX_ID.match(value):
+        return bytes.fromhex(value)
+    return value
+
+
+class FrameEncoder:
+    """Encodes outgoing frames per connection, serialising each frame at most once per encoding.
+
+    MessagePack frames are two concatenated objects: a header [first_code, new_keys] that extends the
+    client's key table, then the payload with integer keys. The key dictionary is shared by all
+    connections; each connection only tracks how much of it has been sent.
+    """
+
+    def __init__(self):
+        self.dictionary = KeyDictionary()
+        # websocket -> number of dictionary keys that connection already knows
+        self.known_keys = {}
+
+    def register(self, websocket):
+        if msgpack is not None and getattr(websocket, 'subprotocol', None) == MSGPACK_SUBPROTOCOL:
+            self.known_keys[websocket] = 0
+
+    def unregister(self, websocket):
+        self.known_keys.pop(websocket, None)
+
+    def encode_for(self, websocket, message, cache=None):
+        """Encode `message` for one client; pass the same `cache` dict when broadcasting one message."""
+        if cache is None:
+            cache = {}
+        if websocket not in self.known_keys:
+            if 'json' not in cache:
+                cache['json'] = json.dumps(message)
+            return cache['json']
+
+        if 'msgpack' not in cache:
+            cache['msgpack'] = msgpack.packb(compact(message, self.dictionary), use_bin_type=True)
+        return self._key_header(websocket) + cache['msgpack']
+
+    def encode_list_frame(self, websocket, frame, field, entries, cache):
+        """Encode `frame` plus a list `field` assembled from per-item serialisations.
+
+        `entries` are [item, {encoding: serialised item}] pairs; missing serialisations are filled in,
+        so unchanged items are never serialised twice. `cache` holds the assembled payloads.
+        """
+        encoding = 'msgpack' if websocket in self.known_keys else 'json'
+        if encoding not in cache:
+            for item, pieces in entries:
+                if encoding not in pieces:
+                    pieces[encoding] = (json.dumps(item) if encoding == 'json' else
+                                        msgpack.packb(compact(item, self.dictionary), use_bin_type=True))
+            if encoding == 'json':
+                head = json.dumps(frame)[:-1] + (', ' if frame else '')
+                items = ', '.join(pieces['json'] for _, pieces in entries)
+                cache['json'] = f'{head}{json.dumps(field)}: [{items}]}}'
+            else:
+                packer = msgpack.Packer(use_bin_type=True)
+                payload = [packer.pack_map_header(len(frame) + 1)]
+                for key, value in frame.items():
+                    payload.append(packer.pack(self.dictionary.code(key)))
+                    payload.append(packer.pack(compact(value, self.dictionary, key)))
+                payload.append(packer.pack(self.dictionary.code(field)))
+                payload.append(packer.pack_array_header(len(entries)))
+                payload.extend(pieces['msgpack'] for _, pieces in entries)
+                cache['msgpack'] = b''.join(payload)
+        if encoding == 'json':
+            return cache['json']
+        return self._key_header(websocket) + cache['msgpack']
+
+    def _key_header(self, websocket):
+        # Dictionary keys added since this connection's last frame
+        known = self.known_keys[websocket]
+        total = len(self.dictionary.keys)
+        self.known_keys[websocket] = total
+        return msgpack.packb([known, self.dictionary.keys[known:total]], use_bin_type=True)
+
+    def decode_incoming(self, data):
+        """Client requests are JSON text, or MessagePack binary from compact clients."""
+        if isinstance(data, bytes) and msgpack is not None:
+            return msgpack.unpackb(data, raw=False)
+        return json.loads(data)
+
+
+class FrameDecoder:
+    """Client-side decoder for MessagePack frames (used by Python clients and tests)."""
+
+    def __init__(self):
+        self.keys = []
+
+    def expand(self, value, key=None):
+        if isinstance(value, dict):
+            return {self.keys[code]: self.expand(v, self.keys[code]) for code, v in value.items()}
+        if isinstance(value, list):
+            return [self.expand(item) for item in value]
+        if key in ID_FIELDS and isinstance(value, bytes):
+            return value.hex()
+        if key in TIME_FIELDS and isinstance(value, int):
+            return datetime.fromtimestamp(value)
+        return value
+
+    def decode(self, data):
+        unpacker = msgpack.Unpacker(raw=False, strict_map_key=False)
+        unpacker.feed(data)
+        first_code, new_keys = next(unpacker)
+        self.keys[first_code:first_code + len(new_keys)] = new_keys
+        return self.expand(next(unpacker))
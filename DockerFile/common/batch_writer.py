@@ -0,0 +1,248 @@
+import collections
+import os
+import queue
+import threading
+import time
+import zlib
+
+# When written files are made durable before their messages are acked:
+#   'batch'  - one fsync pass per batch of up to batch_size messages (group commit)
+#   'always' - every message is its own batch
+#   'none'   - no fsync; acked once the data is in the page cache
+FSYNC_POLICIES = ('batch', 'always', 'none')
+
+FileWrite = collections.namedtuple('FileWrite', 'path buffers offset truncate_to rename_to link_to')
+FileWrite.__new__.__defaults__ = (None, None, None, None)
+FileWrite.__doc__ = """One file operation of a message: write `buffers` to `path` in one vectored call.
+
+With an `offset` the buffers are written there into an existing (or new) file, as for a streamed
+chunk; otherwise the file is replaced. `truncate_to` and `rename_to` finish a reassembled file once
+it is durable. `link_to` then gives the (renamed) file a second name as a hard link, replacing any
+file there; with `buffers` None an existing file is only linked.
+"""
+
+
+def _write_all(fd, buffers, offset):
+    views = [memoryview(buffer) for buffer in buffers if len(buffer)]
+    while views:
+        if hasattr(os, 'pwritev'):
+            written = os.pwritev(fd, views, offset)
+        else:
+            os.lseek(fd, offset, os.SEEK_SET)
+            written = os.write(fd, views[0])
+        offset += written
+        # Drop what was written; a short write leaves the rest of a buffer for the next call
+        while views and written >= len(views[0]):
+            written -= len(views[0])
+            views.pop(0)
+        if views and written:
+            views[0] = views[0][written:]
+
+
+def _fsync_directory(path):
+    if os.name == 'nt':
+        # Directories cannot be opened for fsync on Windows; NTFS journals the entries itself
+        return
+    fd = os.open(path or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class BatchWriter:
+    """Writes the files of consumed messages on a pool of writer threads, off the pika connection thread.
+
+    Each message is submitted as a list of FileWrite operations with a callback. A writer takes the
+    messages waiting in its queue (up to batch_size, or batch_bytes of payload), writes every file
+    with one vectored pwritev call, then makes the whole batch durable with one fsync pass over its
+    files and their directories, and only then calls the callbacks, which ack the messages. Each
+    callback gets its own message's result, so one bad file does not fail the rest of its batch.
+    Messages with the same key (e.g. the chunks of one file) always go to the same writer, in order.
+
+    `on_batch`, if given, is called on the writer thread with the `record` of every durable message
+    of a batch before any callback runs, so an index can commit a whole batch in one transaction.
+    """
+
+    def __init__(self, writers=4, batch_size=64, batch_bytes=64 * 1024 * 1024, max_delay=0.005,
+                 fsync='batch', on_batch=None):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync policy must be one of {FSYNC_POLICIES}, not {fsync!r}")
+        self.batch_size = 1 if fsync == 'always' else batch_size
+        self.batch_bytes = batch_bytes
+        self.max_delay = max_delay
+        self.fsync = fsync
+        self.on_batch = on_batch
+        # Directories known to exist, so each is created (and made durable) once
+        self.directories = set()
+        self.queues = [queue.Queue() for _ in range(writers)]
+        self.stats_lock = threading.Lock()
+        self.stats = {'messages': 0, 'files': 0, 'bytes': 0, 'batches': 0, 'write_s': 0.0, 'fsync_s': 0.0,
+                      'errors': 0}
+        self.started = time.monotonic()
+        self.threads = [threading.Thread(target=self._run, args=(q,), name=f'batch-writer-{i}', daemon=True)
+                        for i, q in enumerate(self.queues)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, key, writes, callback, record=None):
+        """Queue a message's writes; `callback(error)` runs on a writer thread once they are durable."""
+        index = zlib.crc32(str(key).encode()) % len(self.queues)
+        self.queues[index].put((writes, callback, record))
+
+    def close(self):
+        """Write everything already submitted, then stop the writers."""
+        for q in self.queues:
+            q.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    @staticmethod
+    def _size(writes):
+        return sum(len(buffer) for write in writes for buffer in write.buffers or ())
+
+    def _take_batch(self, q, first):
+        batch, size = [first], self._size(first[0])
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.batch_size and size < self.batch_bytes:
+            try:
+                entry = q.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if entry is None:
+                # Stop after this batch
+                q.put(None)
+                break
+            batch.append(entry)
+            size += self._size(entry[0])
+        return batch, size
+
+    def _run(self, q):
+        while True:
+            first = q.get()
+            if first is None:
+                return
+            batch, _ = self._take_batch(q, first)
+            errors = self._write_batch(batch)
+            durable = [entry for entry, error in zip(batch, errors) if error is None]
+            if self.on_batch is not None and durable:
+                try:
+                    self.on_batch([record for _, _, record in durable if record is not None])
+                except Exception as e:
+                    # Their files are on disk but not indexed, so none of them may be acked
+                    errors = [error or e for error in errors]
+                    durable = []
+            with self.stats_lock:
+                self.stats['batches'] += 1
+                self.stats['messages'] += len(batch)
+                self.stats['files'] += sum(len(writes) for writes, _, _ in durable)
+                self.stats['bytes'] += sum(self._size(writes) for writes, _, _ in durable)
+                self.stats['errors'] += len(batch) - len(durable)
+            for (_, callback, _), error in zip(batch, errors):
+                callback(error)
+
+    def _makedirs(self, directory):
+        """Create `directory` unless known to exist; True if this call may have created it."""
+        if not directory or directory in self.directories:
+            return False
+        os.makedirs(directory, exist_ok=True)
+        self.directories.add(directory)
+        return True
+
+    def _write_batch(self, batch):
+        """Write a batch and make it durable; returns each message's error, None for those now durable.
+
+        A failure only fails the messages it concerns: the one whose file could not be written,
+        synced or renamed, or those with a file in a directory that could not be synced.
+        """
+        errors = [None] * len(batch)
+        opened = []
+        # Directory -> messages with a new name in it, which is only durable once the directory is
+        directories = collections.defaultdict(set)
+
+        def touch(directory, index, created):
+            directories[directory].add(index)
+            if created:
+                directories[os.path.dirname(directory)].add(index)
+
+        started = time.monotonic()
+        try:
+            for index, (writes, _, _) in enumerate(batch):
+                try:
+                    for write in writes:
+                        if write.buffers is None:
+                            continue
+                        directory = os.path.dirname(write.path)
+                        touch(directory, index, self._makedirs(directory))
+                        flags = os.O_WRONLY | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+                        if write.offset is None:
+                            flags |= os.O_TRUNC
+                        fd = os.open(write.path, flags, 0o644)
+                        opened.append((index, fd))
+                        _write_all(fd, write.buffers, write.offset or 0)
+                        if write.truncate_to is not None:
+                            os.ftruncate(fd, write.truncate_to)
+                        if write.rename_to:
+                            touch(os.path.dirname(write.rename_to), index, False)
+                except Exception as e:
+                    errors[index] = e
+            synced = time.monotonic()
+            if self.fsync != 'none':
+                for index, fd in opened:
+                    if errors[index] is None:
+                        try:
+                            os.fsync(fd)
+                        except Exception as e:
+                            errors[index] = e
+        finally:
+            for _, fd in opened:
+                os.close(fd)
+        for index, (writes, _, _) in enumerate(batch):
+            if errors[index] is not None:
+                continue
+            try:
+                for write in writes:
+                    if write.rename_to:
+                        os.replace(write.path, write.rename_to)
+                    if write.link_to:
+                        directory = os.path.dirname(write.link_to)
+                        touch(directory, index, self._makedirs(directory))
+                        self._link(write.rename_to or write.path, write.link_to)
+            except Exception as e:
+                errors[index] = e
+        if self.fsync != 'none':
+            for directory, indexes in directories.items():
+                if all(errors[index] is not None for index in indexes):
+                    continue
+                try:
+                    _fsync_directory(directory)
+                except Exception as e:
+                    for index in indexes:
+                        errors[index] = errors[index] or e
+        with self.stats_lock:
+            self.stats['write_s'] += synced - started
+            self.stats['fsync_s'] += time.monotonic() - synced
+        return errors
+
+    def _link(self, target, link):
+        try:
+            if os.path.samefile(target, link):
+                # Already linked (a redelivery); renaming a link over itself would leave the temporary behind
+                return
+        except FileNotFoundError:
+            pass
+        # Linked under a temporary name and renamed over, so an existing name is replaced atomically
+        temporary = f"{link}.{threading.get_ident()}.link"
+        os.link(target, temporary)
+        os.replace(temporary, link)
+
+    def report(self):
+        """Throughput since the writer started (or the last report), and resets the counters."""
+        with self.stats_lock:
+            stats, self.stats = self.stats, dict.fromkeys(self.stats, 0)
+            now = time.monotonic()
+            elapsed, self.started = max(now - self.started, 1e-9), now
+        batches = stats['batches'] or 1
+        return (f"{stats['messages'] / elapsed:.1f} msg/s, {stats['bytes'] / 2 ** 20 / elapsed:.1f} MB/s, "
+                f"{stats['messages'] / batches:.1f} msg/batch, fsync {stats['fsync_s'] * 1000 / batches:.1f} ms/batch "
+                f"({self.fsync}), {stats['errors']} failed")
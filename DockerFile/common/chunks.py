@@ -0,0 +1,201 @@
+"""Reassembly of items streamed in chunks (see item_chunks in Main_Server/upload_client.py)."""
+import os
+import struct
+import threading
+import time
+from batch_writer import _fsync_directory
+
+# Each received chunk index is appended to the item's .chunks file as one record
+RECORD = struct.Struct('<I')
+# Recorded once the file has been moved into place, so a redelivered chunk does not start it again
+DONE = 0xFFFFFFFF
+# Parts not written to for this long belong to abandoned uploads
+STALE_AFTER = 24 * 3600
+SWEEP_INTERVAL = 3600
+
+
+def rechunk(body, path):
+    """Chunk messages (dicts) carrying the file at `path` again, for one of its item's chunks `body`.
+
+    Lets a consumer send a reassembled item on, e.g. to a retry queue, in chunks no larger than it
+    arrived in, instead of putting the whole file in one message. Only one chunk is read at a time.
+    """
+    size, count = body['Chunk']['TotalSize'], body['Chunk']['Count']
+    chunk_size = max(1, -(-size // count))
+    count = max(1, -(-size // chunk_size))
+    header = {key: value for key, value in body.items() if key not in ('Payload', 'Chunk')}
+    with open(path, 'rb') as f:
+        for index in range(count):
+            yield {**header, 'Payload': f.read(chunk_size),
+                   'Chunk': {'Index': index, 'Count': count, 'Offset': index * chunk_size, 'TotalSize': size}}
+
+
+class ChunkAssembler:
+    """Reassembles streamed items in `directory`, keeping each item's progress next to its data.
+
+    An item's chunks are written at their offsets into <content id>.part, and the index of every
+    written chunk is appended to <content id>.part.chunks. The progress therefore survives a restart
+    of the consumer: the chunks it acked are not redelivered, but they are already recorded, so the
+    item still completes once the rest arrive. Files are named after the content ID, not the file
+    name, so concurrent jobs uploading a file of the same name do not write into one part.
+
+    The caller moves a complete item into place with `finish`, and calls `discard` once the last
+    chunk is acked. Parts of uploads that never complete are removed by `sweep`.
+    """
+
+    def __init__(self, directory='.', fsync=True, stale_after=STALE_AFTER):
+        self.directory = directory
+        # Whether a chunk is on disk (data and record) before write/record return
+        self.fsync = fsync
+        self.stale_after = stale_after
+        # Content id -> chunk indexes recorded (with DONE once finished), loaded from disk on first use
+        self.items = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(body, id_field):
+        # basename, so an id can never point outside the directory
+        return os.path.basename(str(body.get(id_field) or body['FileName']))
+
+    def part_path(self, key):
+        return os.path.join(self.directory, f'{key}.part')
+
+    def _received(self, key):
+        received = self.items.get(key)
+        if received is None:
+            received = set()
+            try:
+                with open(self.part_path(key) + '.chunks', 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                data = b''
+            # A record cut short by a crash is ignored; its chunk was never acked
+            for offset in range(0, len(data) - RECORD.size + 1, RECORD.size):
+                received.add(RECORD.unpack_from(data, offset)[0])
+            self.items[key] = received
+        return received
+
+    def _append(self, key, index):
+        path = self.part_path(key) + '.chunks'
+        new = not os.path.exists(path)
+        with open(path, 'ab') as f:
+            f.write(RECORD.pack(index))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        if new and self.fsync:
+            # Makes the names of the records and of the part they describe durable
+            _fsync_directory(self.directory)
+
+    def is_done(self, body, id_field):
+        with self.lock:
+            return DONE in self._received(self.key(body, id_field))
+
+    def plan(self, body, id_field):
+        """Where a caller writing the chunk itself puts it, as (path, payload, offset).
+
+        None if the item is already finished (a redelivered chunk). The chunk counts once `record`ed.
+        """
+        if self.is_done(body, id_field):
+            return None
+        return self.part_path(self.key(body, id_field)), body['Payload'], body['Chunk']['Offset']
+
+    def record(self, body, id_field):
+        """Record a chunk whose payload is on disk; True once every chunk of its item is."""
+        chunk = body['Chunk']
+        key = self.key(body, id_field)
+        with self.lock:
+            received = self._received(key)
+            if DONE in received:
+                return True
+            if chunk['Index'] not in received:
+                self._append(key, chunk['Index'])
+                received.add(chunk['Index'])
+            return len(received) >= chunk['Count']
+
+    def write(self, body, id_field):
+        """Write a chunk at its offset and record it; True once every chunk of its item is written."""
+        planned = self.plan(body, id_field)
+        if planned is None:
+            return True
+        path, payload, offset = planned
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+        try:
+            os.pwrite(fd, payload, offset)
+            if self.fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        return self.record(body, id_field)
+
+    def finish(self, body, id_field, path):
+        """Move a complete item's file to `path` (once; a redelivered last chunk finds it there)."""
+        key = self.key(body, id_field)
+        with self.lock:
+            received = self._received(key)
+            if DONE in received:
+                return path
+            part = self.part_path(key)
+            fd = os.open(part, os.O_WRONLY | getattr(os, 'O_BINARY', 0))
+            try:
+                # Drops any tail left by an earlier, larger upload of the same content
+                os.ftruncate(fd, body['Chunk']['TotalSize'])
+                if self.fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+            os.replace(part, path)
+            if self.fsync:
+                _fsync_directory(os.path.dirname(path))
+            self._append(key, DONE)
+            received.add(DONE)
+        return path
+
+    def discard(self, body, id_field):
+        """Forget a finished item, once its last chunk has been acked."""
+        key = self.key(body, id_field)
+        with self.lock:
+            self.items.pop(key, None)
+            for path in (self.part_path(key), self.part_path(key) + '.chunks'):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def sweep(self, now=None):
+        """Remove items not written to for stale_after seconds, part and records; returns how many."""
+        now = time.time() if now is None else now
+        removed = 0
+        with self.lock:
+            # An item is as fresh as the newer of its two files
+            touched = {}
+            for name in os.listdir(self.directory or '.'):
+                if name.endswith('.part.chunks'):
+                    key = name[:-len('.part.chunks')]
+                elif name.endswith('.part'):
+                    key = name[:-len('.part')]
+                else:
+                    continue
+                try:
+                    mtime = os.path.getmtime(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                touched[key] = max(touched.get(key, mtime), mtime)
+            for key, mtime in touched.items():
+                if now - mtime < self.stale_after:
+                    continue
+                self.items.pop(key, None)
+                for path in (self.part_path(key), self.part_path(key) + '.chunks'):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                removed += 1
+        return removed
+
+    def sweep_every(self, connection, interval=SWEEP_INTERVAL):
+        """Sweep on a pika connection's thread every `interval` seconds while it runs."""
+        removed = self.sweep()
+        if removed:
+            print(f"Removed {removed} abandoned partial uploads from {self.directory or '.'}")
+        connection.call_later(interval, lambda: self.sweep_every(connection, interval))
@@ -0,0 +1,42 @@
+"""Message conventions shared by every module: trace headers and the small item priority lane.
+
+Modules run from their own directories and add this one to sys.path; like
+Exchange_Set_Up/topology.json, it is the single copy each module ships with.
+"""
+import secrets
+import time
+
+# Items up to this size go through the content queues' priority lane (x-max-priority in
+# Exchange_Set_Up/topology.json), so small documents are not stuck behind large uploads
+SMALL_ITEM_BYTES = 1024 * 1024
+SMALL_ITEM_PRIORITY = 1
+
+
+def message_priority(message):
+    """Message priority of an item: the priority lane for small items, None (normal) otherwise.
+
+    Items read from a local file at send time carry their size in 'Size' instead of a payload.
+    """
+    size = message['Size'] if 'Size' in message else len(message.get('Payload') or b'')
+    return SMALL_ITEM_PRIORITY if size <= SMALL_ITEM_BYTES else None
+
+
+def trace_headers(parent, stage, received_at=None, kind=None):
+    """AMQP headers for a message published by `stage`, continuing the trace in `parent` (None starts one).
+
+    Every hop records when it was enqueued; the consumer of a hop adds when it was dequeued, so the
+    dashboard can rebuild per-item timelines and per-stage latencies.
+    """
+    parent = parent or {}
+    hops = [dict(hop) for hop in parent.get('hops') or []]
+    if received_at is not None and hops:
+        hops[-1].update(dequeued=received_at, consumer=stage)
+    hop = {'stage': stage, 'span_id': secrets.token_hex(8), 'enqueued': time.time()}
+    if kind:
+        hop['kind'] = kind
+    return {
+        'trace_id': parent.get('trace_id') or secrets.token_hex(16),
+        'parent_span_id': parent.get('span_id', ''),
+        'span_id': hop['span_id'],
+        'hops': hops + [hop]
+    }
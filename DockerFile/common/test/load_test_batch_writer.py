@@ -0,0 +1,61 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from batch_writer import BatchWriter, FileWrite
+
+
+def message_files(root, i, size):
+    # The four files the Store receiver writes for one document
+    payload = os.urandom(size)
+    base = os.path.join(root, f'job{i % 50}', f'{i}')
+    return [FileWrite(base + '.pdf', [payload]), FileWrite(base + ' Meta.txt', [b'meta' * 64]),
+            FileWrite(base + ' Summary.txt', [b'summary' * 128]), FileWrite(base + ' Keywords.txt', [b'kw' * 64])]
+
+
+def synchronous(root, messages, size):
+    # What the receiver did in its pika callback: open, write and (for durability) fsync each file
+    start = time.perf_counter()
+    for i in range(messages):
+        for write in message_files(root, i, size):
+            os.makedirs(os.path.dirname(write.path), exist_ok=True)
+            with open(write.path, 'wb') as f:
+                f.write(b''.join(write.buffers))
+                f.flush()
+                os.fsync(f.fileno())
+    return time.perf_counter() - start
+
+
+def batched(root, messages, size, writers, fsync):
+    done = threading.Semaphore(0)
+    writer = BatchWriter(writers=writers, fsync=fsync)
+    start = time.perf_counter()
+    for i in range(messages):
+        writer.submit(f'job{i % 50}', message_files(root, i, size), lambda error: done.release())
+    for _ in range(messages):
+        done.acquire()
+    elapsed = time.perf_counter() - start
+    print(f"  {writer.report()}")
+    writer.close()
+    return elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare synchronous per-file writes with the batch writer.')
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--size-kb', type=int, default=64)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--dir', help='directory on the disk to test (default: a temporary directory)')
+    args = parser.parse_args()
+    size = args.size_kb * 1024
+    total_mb = args.messages * size / 2 ** 20
+
+    for label, run in (('synchronous, fsync per file', lambda root: synchronous(root, args.messages, size)),
+                       ('batch writer, fsync per batch', lambda root: batched(root, args.messages, size, args.writers, 'batch')),
+                       ('batch writer, no fsync', lambda root: batched(root, args.messages, size, args.writers, 'none'))):
+        with tempfile.TemporaryDirectory(dir=args.dir) as root:
+            seconds = run(root)
+        print(f"{label:32} {args.messages / seconds:9.1f} msg/s  {total_mb / seconds:8.1f} MB/s")
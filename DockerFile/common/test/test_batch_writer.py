@@ -0,0 +1,128 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import unittest.mock
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from batch_writer import BatchWriter, FileWrite
+
+
+class Results:
+    '''Collects writer callbacks and lets a test wait for a number of them.'''
+
+    def __init__(self, expected):
+        self.errors = []
+        self.expected = expected
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+
+    def __call__(self, error):
+        with self.lock:
+            self.errors.append(error)
+            if len(self.errors) == self.expected:
+                self.done.set()
+
+
+class TestBatchWriter(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    '''
+        purpose: To verify that queued messages are written together and made durable with one fsync per file.
+        process: Submits 20 messages of two files each (one with several buffers) to a single writer with fsync counted.
+        validation: Ensures every file holds its bytes, callbacks come after the writes, in fewer batches than messages.
+    '''
+    def test_batches_are_written_and_synced(self):
+        results = Results(20)
+        writer = BatchWriter(writers=1, max_delay=0.2)
+        with unittest.mock.patch('os.fsync', wraps=os.fsync) as fsync:
+            for i in range(20):
+                job_dir = os.path.join(self.root, f'job{i % 2}')
+                writer.submit(f'job{i % 2}', [FileWrite(os.path.join(job_dir, f'{i}.pdf'), [b'%PDF', b'-', str(i).encode()]),
+                                              FileWrite(os.path.join(job_dir, f'{i} Meta.txt'), [b'meta'])], results)
+            self.assertTrue(results.done.wait(10))
+            writer.close()
+            file_syncs = 40
+            self.assertGreaterEqual(fsync.call_count, file_syncs)
+            self.assertLess(fsync.call_count, file_syncs + 10)
+        self.assertEqual(results.errors, [None] * 20)
+        with open(os.path.join(self.root, 'job1', '7.pdf'), 'rb') as f:
+            self.assertEqual(f.read(), b'%PDF-7')
+        self.assertLess(writer.stats['batches'], 20)
+        self.assertIn('msg/s', writer.report())
+
+    '''
+        purpose: To verify that chunks written at their offsets are reassembled and renamed once complete.
+        process: Submits three chunks out of order, the last one truncating a longer leftover file and renaming it.
+        validation: Ensures the final file holds exactly the original bytes and no .part file is left.
+    '''
+    def test_chunks_reassemble(self):
+        path = os.path.join(self.root, 'x.png')
+        with open(path + '.part', 'wb') as f:
+            f.write(b'z' * 100)
+        results = Results(3)
+        writer = BatchWriter(writers=2)
+        writer.submit('pic', [FileWrite(path + '.part', [b'cd'], 2)], results)
+        writer.submit('pic', [FileWrite(path + '.part', [b'ab'], 0)], results)
+        writer.submit('pic', [FileWrite(path + '.part', [b'e'], 4, 5, path)], results)
+        self.assertTrue(results.done.wait(10))
+        writer.close()
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'abcde')
+        self.assertFalse(os.path.exists(path + '.part'))
+
+    '''
+        purpose: To verify that a failed write is reported to its own message only, instead of being acked.
+        process: Submits, in one batch, a good message, a write whose parent directory is a regular file, and another good message.
+        validation: Ensures only the failed message's callback receives the error, only the good records are indexed and one failure is counted.
+    '''
+    def test_write_error_is_reported(self):
+        blocker = os.path.join(self.root, 'file')
+        open(blocker, 'wb').close()
+        errors, indexed = {}, []
+        done = threading.Event()
+
+        def callback(name):
+            def durable(error):
+                errors[name] = error
+                if len(errors) == 3:
+                    done.set()
+            return durable
+
+        writer = BatchWriter(writers=1, max_delay=0.2, on_batch=indexed.extend)
+        writer.submit('job', [FileWrite(os.path.join(self.root, 'a.pdf'), [b'a'])], callback('a'), 'a')
+        writer.submit('job', [FileWrite(os.path.join(blocker, 'b.pdf'), [b'b'])], callback('b'), 'b')
+        writer.submit('job', [FileWrite(os.path.join(self.root, 'c.pdf'), [b'c'])], callback('c'), 'c')
+        self.assertTrue(done.wait(10))
+        writer.close()
+        self.assertEqual(writer.stats['batches'], 1)
+        self.assertIsNone(errors['a'])
+        self.assertIsInstance(errors['b'], OSError)
+        self.assertIsNone(errors['c'])
+        self.assertEqual(indexed, ['a', 'c'])
+        self.assertEqual(writer.stats['errors'], 1)
+
+    '''
+        purpose: To verify the fsync policies.
+        process: Writes with the 'none' policy with fsync mocked, and creates a writer with an unknown policy.
+        validation: Ensures 'none' never calls fsync and an unknown policy raises ValueError.
+    '''
+    def test_fsync_policies(self):
+        results = Results(1)
+        with unittest.mock.patch('os.fsync') as fsync:
+            writer = BatchWriter(writers=1, fsync='none')
+            writer.submit('job', [FileWrite(os.path.join(self.root, 'a.pdf'), [b'x'])], results)
+            self.assertTrue(results.done.wait(10))
+            writer.close()
+            fsync.assert_not_called()
+        with self.assertRaises(ValueError):
+            BatchWriter(fsync='sometimes')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from chunks import ChunkAssembler, rechunk
+
+
+def chunk_bodies(content_id, data, chunk_size):
+    # The chunk messages upload_client's item_chunks sends for one item
+    count = -(-len(data) // chunk_size)
+    return [{'ID': 'job', 'DocumentId': content_id, 'FileName': 'report.pdf',
+             'Payload': data[offset:offset + chunk_size],
+             'Chunk': {'Index': index, 'Count': count, 'Offset': offset, 'TotalSize': len(data)}}
+            for index, offset in enumerate(range(0, len(data), chunk_size))]
+
+
+class TestChunkAssembler(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def target(self, name):
+        return os.path.join(self.root, name)
+
+    '''
+        purpose: To verify that an item whose first chunks were acked before a restart still completes.
+        process: Writes two of three chunks with one assembler, then the last one with a new assembler on the same directory.
+        validation: Ensures the new assembler reports the item complete and the finished file holds every chunk.
+    '''
+    def test_progress_survives_restart(self):
+        bodies = chunk_bodies('doc1', b'abcdefgh', 3)
+        before = ChunkAssembler(self.root)
+        self.assertFalse(before.write(bodies[1], 'DocumentId'))
+        self.assertFalse(before.write(bodies[0], 'DocumentId'))
+
+        after = ChunkAssembler(self.root)
+        self.assertTrue(after.write(bodies[2], 'DocumentId'))
+        after.finish(bodies[2], 'DocumentId', self.target('report.pdf'))
+        with open(self.target('report.pdf'), 'rb') as f:
+            self.assertEqual(f.read(), b'abcdefgh')
+
+    '''
+        purpose: To verify that concurrent uploads of the same file name do not share a part.
+        process: Interleaves the chunks of two items named report.pdf with different content IDs.
+        validation: Ensures each item is reassembled from its own chunks only.
+    '''
+    def test_parts_are_keyed_by_content_id(self):
+        chunks = ChunkAssembler(self.root)
+        first, second = chunk_bodies('doc1', b'1111aaaa', 4), chunk_bodies('doc2', b'2222bbbb', 4)
+        for one, other in zip(first, second):
+            chunks.write(one, 'DocumentId')
+            chunks.write(other, 'DocumentId')
+        for bodies, expected in ((first, b'1111aaaa'), (second, b'2222bbbb')):
+            target = self.target(bodies[0]['DocumentId'] + '.pdf')
+            chunks.finish(bodies[-1], 'DocumentId', target)
+            with open(target, 'rb') as f:
+                self.assertEqual(f.read(), expected)
+
+    '''
+        purpose: To verify that a redelivered chunk of a finished item neither rewrites nor restarts it.
+        process: Finishes an item, redelivers its last chunk before discarding it, then discards it.
+        validation: Ensures the redelivery reports it complete without a new part, and discard leaves no state behind.
+    '''
+    def test_redelivered_chunk_of_finished_item(self):
+        chunks = ChunkAssembler(self.root)
+        bodies = chunk_bodies('doc1', b'abcdef', 3)
+        for body in bodies:
+            chunks.write(body, 'DocumentId')
+        chunks.finish(bodies[-1], 'DocumentId', self.target('report.pdf'))
+
+        redelivered = ChunkAssembler(self.root)
+        self.assertIsNone(redelivered.plan(bodies[-1], 'DocumentId'))
+        self.assertTrue(redelivered.write(bodies[-1], 'DocumentId'))
+        redelivered.finish(bodies[-1], 'DocumentId', self.target('report.pdf'))
+        self.assertFalse(os.path.exists(redelivered.part_path('doc1')))
+        redelivered.discard(bodies[-1], 'DocumentId')
+        self.assertEqual(os.listdir(self.root), ['report.pdf'])
+
+    '''
+        purpose: To verify that chunks only count once recorded, for callers writing them themselves.
+        process: Plans every chunk of an item, writes them as a writer would and records all but one.
+        validation: Ensures the item is complete only after the last chunk is recorded.
+    '''
+    def test_chunks_count_once_recorded(self):
+        chunks = ChunkAssembler(self.root, fsync=False)
+        bodies = chunk_bodies('pic1', b'abcdef', 2)
+        for body in bodies:
+            path, payload, offset = chunks.plan(body, 'DocumentId')
+            with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+                f.seek(offset)
+                f.write(payload)
+        self.assertFalse(chunks.record(bodies[0], 'DocumentId'))
+        self.assertFalse(chunks.record(bodies[2], 'DocumentId'))
+        self.assertFalse(chunks.record(bodies[2], 'DocumentId'))
+        self.assertTrue(chunks.record(bodies[1], 'DocumentId'))
+
+    '''
+        purpose: To verify that abandoned uploads are swept and active ones kept.
+        process: Starts two items, ages the files of one past stale_after and sweeps.
+        validation: Ensures only the abandoned item's part and records are removed.
+    '''
+    def test_sweep_removes_abandoned_parts(self):
+        chunks = ChunkAssembler(self.root, stale_after=3600)
+        chunks.write(chunk_bodies('old', b'abcdef', 3)[0], 'DocumentId')
+        chunks.write(chunk_bodies('new', b'abcdef', 3)[0], 'DocumentId')
+        hours_ago = time.time() - 2 * 3600
+        for name in ('old.part', 'old.part.chunks'):
+            os.utime(os.path.join(self.root, name), (hours_ago, hours_ago))
+
+        self.assertEqual(chunks.sweep(), 1)
+        self.assertEqual(sorted(os.listdir(self.root)), ['new.part', 'new.part.chunks'])
+        self.assertNotIn('old', chunks.items)
+
+    '''
+        purpose: To verify that a reassembled item can be sent on in chunks that reassemble to the same file.
+        process: Re-chunks a 5-byte file described by a 4-chunk header and reassembles the result in another directory.
+        validation: Ensures no chunk is larger than the originals, the count matches the chunks produced and the file is identical.
+    '''
+    def test_rechunk_round_trip(self):
+        source = self.target('report.pdf')
+        with open(source, 'wb') as f:
+            f.write(b'abcde')
+        last = chunk_bodies('doc1', b'abcde', 2)[-1]
+        last['Chunk']['Count'] = 4
+        parts = list(rechunk(last, source))
+        self.assertEqual([part['Chunk']['Count'] for part in parts], [3, 3, 3])
+        self.assertTrue(all(len(part['Payload']) <= 2 and part['FileName'] == 'report.pdf' for part in parts))
+
+        with tempfile.TemporaryDirectory() as other:
+            chunks = ChunkAssembler(other)
+            self.assertEqual([chunks.write(part, 'DocumentId') for part in reversed(parts)], [False, False, True])
+            chunks.finish(parts[0], 'DocumentId', os.path.join(other, 'copy.pdf'))
+            with open(os.path.join(other, 'copy.pdf'), 'rb') as f:
+                self.assertEqual(f.read(), b'abcde')
+
+
+if __name__ == '__main__':
+    unittest.main()
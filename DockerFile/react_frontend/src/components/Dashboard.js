@@ -9,11 +9,24 @@ const MetricCard = ({title, value}) => (
         <p>{value}</p>
     </div>
 );
+// Merge an analytics delta pushed by the server into the current stats
+const mergeDeep = (target, delta) => {
+    const merged = {...target};
+    Object.entries(delta || {}).forEach(([key, value]) => {
+        merged[key] = value && typeof value === 'object' && !Array.isArray(value)
+            ? mergeDeep(target?.[key] || {}, value)
+            : value;
+    });
+    return merged;
+};
+
 const Dashboard = () => {
     const [messages, setMessages] = useState([]);
     const [loading, setLoading] = useState(true);
     const [isConnected, setIsConnected] = useState(false);
     const socket = useRef(null);
+    // Last broadcast sequence seen; sent on reconnect so the server replays only the gap
+    const lastSeq = useRef(null);
 
     const [expandedJobIds, setExpandedJobIds] = useState([]);
 
@@ -86,8 +99,6 @@ const Dashboard = () => {
     useEffect(() => {
         if (showAnalytics) {
             requestAnalytics();
-            const interval = setInterval(requestAnalytics, 5000);
-            return () => clearInterval(interval);
         }
     }, [showAnalytics]);
 
@@ -142,12 +153,18 @@ const Dashboard = () => {
     }, [searchTerm, selectedContentType, itemsPerPage]);
 
     useEffect(() => {
+        let closing = false;
+        let reconnectTimer = null;
+
         const connectWebSocket = () => {
-            socket.current = new WebSocket('ws://localhost:5001');
+            const resume = lastSeq.current === null ? '' : `/?lastSeq=${lastSeq.current}`;
+            socket.current = new WebSocket(`ws://localhost:5001${resume}`);
 
             socket.current.onopen = () => {
                 console.log('WebSocket connected');
                 setIsConnected(true);
+                // The server pushes analytics deltas on its own cadence; no polling needed
+                socket.current.send(JSON.stringify({type: 'subscribeAnalytics', fields: ['performanceStats']}));
             };
 
             socket.current.onmessage = (event) => {
@@ -159,25 +176,35 @@ const Dashboard = () => {
                         ...prevStats,
                         ...analyticsData.performanceStats
                     }));
+                } else if (data.type === 'analyticsDelta') {
+                    setPerformanceStats(prevStats => mergeDeep(prevStats, data.data?.performanceStats));
                 } else if (data.type === 'initialMessages') {
+                    lastSeq.current = data.seq ?? lastSeq.current;
                     setMessages(prevMessages => [...data.data]);
                     setLoading(false);
+                } else if (data.type === 'replay') {
+                    // Messages missed while disconnected, oldest first
+                    lastSeq.current = data.seq;
+                    setMessages(prevMessages => [...[...data.data].reverse(), ...prevMessages]);
                 } else if (data.type === 'newMessage') {
+                    lastSeq.current = Math.max(lastSeq.current ?? 0, data.seq ?? 0);
                     setMessages(prevMessages => [data.data, ...prevMessages]);
                 }
             };
+
+            socket.current.onclose = () => {
+                setIsConnected(false);
+                if (!closing) {
+                    reconnectTimer = setTimeout(connectWebSocket, 2000);
+                }
+            };
         };
 
         connectWebSocket();
 
-        const analyticsInterval = setInterval(() => {
-            if (socket.current?.readyState === WebSocket.OPEN) {
-                socket.current.send(JSON.stringify({type: 'getAnalytics'}));
-            }
-        }, 5000);
-
         return () => {
-            clearInterval(analyticsInterval);
+            closing = true;
+            clearTimeout(reconnectTimer);
             if (socket.current) {
                 socket.current.close();
             }